@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Offline throughput benchmark for the paper fetcher
+Measures fetch_papers (against the synthetic replay server), dedup, ranking,
+rendering and send_email (against the local SMTP server) for 10 to 10,000
+papers, without touching the live APIs
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from digest_renderer import render_digest
+from paper_fetcher import PaperFetcher
+from replay_server import ReplayServer, make_papers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+SEARCH_TERMS = ["generative recommendation", "llm ranking", "semantic retrieval", "diffusion graph"]
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def timed(func: Callable, repeat: int = 1) -> float:
+    """Best wall time of `repeat` runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def make_fetcher(workdir: str, replay: ReplayServer, smtp_port: int, per_query: int) -> PaperFetcher:
+    config = {
+        "search_terms": SEARCH_TERMS,
+        "days_back": 30,
+        "max_results": per_query,
+        "request_interval": 0,
+        "sources": replay.sources_config(),
+        "ranking": {"enabled": True, "top_n": None},
+        "http": {"cache_enabled": False, "pool_maxsize": 16},
+        "email": {
+            "use_local_server": True,
+            "local_server_host": "localhost",
+            "local_server_port": smtp_port,
+            "smtp_server": "localhost",
+            "smtp_port": smtp_port,
+            "sender_email": "benchmark@localhost",
+            "sender_password": "",
+            "recipient_email": "benchmark@localhost",
+            "use_tls": False,
+            "timeout": 30
+        }
+    }
+    config_file = os.path.join(workdir, 'benchmark_config.json')
+    with open(config_file, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    return PaperFetcher(config_file)
+
+
+def run_benchmark(sizes: List[int], latency: float = 0.0, error_rate: float = 0.0,
+                  repeat: int = 3, include_send: bool = True) -> List[Dict]:
+    workdir = tempfile.mkdtemp(prefix='paper_fetcher_bench_')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    results = []
+    replay = ReplayServer(os.path.join(workdir, 'fixtures'), latency=latency,
+                          error_rate=error_rate, synthetic_papers=0).start()
+    smtp_port = free_port()
+    fetcher = None
+    try:
+        for n in sizes:
+            # Each (term, source) query returns n / (terms * sources) papers
+            per_query = max(1, n // (len(SEARCH_TERMS) * len(replay.upstreams)))
+            replay.synthetic_papers = per_query
+            fetcher = make_fetcher(workdir, replay, smtp_port, per_query)
+
+            stage_times = {'fetch_papers': timed(fetcher.fetch_papers, repeat)}
+
+            # Dedup and ranking on n papers, a fifth of them duplicates
+            papers = make_papers(n - n // 5) + make_papers(n // 5)
+            stage_times['remove_duplicates'] = timed(lambda: fetcher.remove_duplicates(papers), repeat)
+            unique = fetcher.remove_duplicates(papers)
+            stage_times['rank_papers'] = timed(lambda: fetcher.rank_papers(list(unique)), repeat)
+            stage_times['render_digest'] = timed(lambda: render_digest(unique, 30), repeat)
+
+            if include_send:
+                fetcher.papers = unique
+                fetcher.start_local_smtp_server()
+                ok = []
+                stage_times['send_email'] = timed(lambda: ok.append(fetcher.send_email()), repeat)
+                if not all(ok):
+                    stage_times['send_email'] = float('nan')
+
+                fetcher.smtp_server_manager.stop()
+
+            for stage, seconds in stage_times.items():
+                results.append({'stage': stage, 'papers': n, 'seconds': seconds,
+                                'papers_per_second': n / seconds if seconds else float('inf')})
+    finally:
+        replay.stop()
+        if fetcher is not None and hasattr(fetcher, 'smtp_server_manager'):
+            fetcher.smtp_server_manager.stop()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def print_results(results: List[Dict]):
+    print(f"{'stage':<20}{'papers':>8}{'seconds':>12}{'papers/s':>14}")
+    print('-' * 54)
+    for r in results:
+        print(f"{r['stage']:<20}{r['papers']:>8}{r['seconds']:>12.4f}{r['papers_per_second']:>14.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline throughput benchmark for paper_fetcher')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Paper counts to benchmark')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated source latency (seconds)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of source requests failing with 503')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per stage (best time is reported)')
+    parser.add_argument('--no-send', action='store_true', help='Skip the send_email stage')
+    parser.add_argument('--json', help='Also write results to this JSON file')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = run_benchmark(args.sizes, args.latency, args.error_rate, args.repeat, not args.no_send)
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
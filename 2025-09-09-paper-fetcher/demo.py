@@ -50,7 +50,7 @@ def demo_arxiv_search():
     
     # Remove duplicates
     unique_papers = fetcher.remove_duplicates(all_papers)
-    unique_papers.sort(key=lambda x: x['published'], reverse=True)
+    unique_papers.sort(key=lambda x: x.published, reverse=True)
     
     fetcher.papers = unique_papers
     
@@ -59,13 +59,13 @@ def demo_arxiv_search():
     if unique_papers:
         print("=== 论文列表预览 ===")
         for i, paper in enumerate(unique_papers[:5], 1):  # Show first 5 papers
-            print(f"{i}. {paper['title']}")
-            authors = ', '.join(paper['authors'][:3])
-            if len(paper['authors']) > 3:
+            print(f"{i}. {paper.title}")
+            authors = ', '.join(paper.authors[:3])
+            if len(paper.authors) > 3:
                 authors += ' et al.'
             print(f"   作者: {authors}")
-            print(f"   发表日期: {paper['published']}")
-            print(f"   链接: {paper['url']}")
+            print(f"   发表日期: {paper.published}")
+            print(f"   链接: {paper.url}")
             print()
         
         if len(unique_papers) > 5:
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Digest renderer for the paper fetcher
+Renders the plain text and HTML versions of a paper list in one pass,
+using precompiled templates and streaming output into io.StringIO buffers
+"""
+
+import io
+from datetime import datetime
+from html import escape
+from string import Template
+from typing import List, Tuple
+
+from sources import Paper
+
+DIGEST_TITLE = "Recent Papers: Generative AI Recommendation Systems"
+MAX_AUTHORS = 5
+MAX_SUMMARY_CHARS = 500
+
+HTML_HEADER = Template("""
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <style>
+                body { font-family: Arial, sans-serif; margin: 20px; }
+                h1 { color: #333; }
+                h2 { color: #666; margin-top: 30px; }
+                .paper { margin-bottom: 25px; padding: 15px; border-left: 3px solid #007acc; background-color: #f9f9f9; }
+                .title { font-weight: bold; font-size: 16px; color: #007acc; margin-bottom: 5px; }
+                .authors { color: #666; margin-bottom: 5px; }
+                .meta { color: #888; font-size: 12px; margin-bottom: 10px; }
+                .summary { line-height: 1.4; }
+                .url { margin-top: 10px; }
+                .url a { color: #007acc; text-decoration: none; }
+                .url a:hover { text-decoration: underline; }
+            </style>
+        </head>
+        <body>
+            <h1>$title</h1>
+            <p>Found $count papers from the last $days_back days</p>
+            <p>Generated on: $generated</p>
+        """)
+
+HTML_PAPER = Template("""
+            <div class="paper">
+                <div class="title">$index. $title</div>
+                <div class="authors">Authors: $authors</div>
+                <div class="meta">Published: $published | Source: $source</div>
+                <div class="summary">$summary</div>
+                <div class="url"><a href="$url" target="_blank">Read Paper</a></div>
+            </div>
+            """)
+
+HTML_FOOTER = """
+        </body>
+        </html>
+        """
+
+TEXT_HEADER = Template("""$title
+Found $count papers from the last $days_back days
+Generated on: $generated
+
+""")
+
+TEXT_PAPER = Template("""$index. $title
+Authors: $authors
+Published: $published | Source: $source
+Summary: $summary
+URL: $url
+
+$separator
+
+""")
+
+EMPTY_HTML = "<p>No recent papers found.</p>"
+EMPTY_TEXT = "No recent papers found."
+
+
+def format_authors(authors: List[str]) -> str:
+    """Join the first few authors, adding 'et al.' when truncated"""
+    authors_str = ', '.join(authors[:MAX_AUTHORS])
+    if len(authors) > MAX_AUTHORS:
+        authors_str += ' et al.'
+    return authors_str
+
+
+def truncate_summary(summary: str) -> str:
+    """Shorten long abstracts for the digest"""
+    summary = summary or ''
+    return summary[:MAX_SUMMARY_CHARS] + '...' if len(summary) > MAX_SUMMARY_CHARS else summary
+
+
+def render_digest(papers: List[Paper], days_back: int, title: str = DIGEST_TITLE,
+                  generated: datetime = None) -> Tuple[str, str]:
+    """Render (text, html) for the given papers in a single pass"""
+    if not papers:
+        return EMPTY_TEXT, EMPTY_HTML
+
+    header = {
+        'title': title,
+        'count': len(papers),
+        'days_back': days_back,
+        'generated': (generated or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+    }
+    text_out = io.StringIO()
+    html_out = io.StringIO()
+    text_out.write(TEXT_HEADER.substitute(header))
+    html_out.write(HTML_HEADER.substitute(header, title=escape(title)))
+
+    separator = '=' * 80
+    for i, paper in enumerate(papers, 1):
+        authors_str = format_authors(paper.authors)
+        summary = truncate_summary(paper.summary)
+
+        text_out.write(TEXT_PAPER.substitute(
+            index=i,
+            title=paper.title,
+            authors=authors_str,
+            published=paper.published,
+            source=paper.source,
+            summary=summary,
+            url=paper.url,
+            separator=separator
+        ))
+        html_out.write(HTML_PAPER.substitute(
+            index=i,
+            title=escape(paper.title),
+            authors=escape(authors_str),
+            published=escape(paper.published),
+            source=escape(paper.source),
+            summary=escape(summary),
+            url=escape(paper.url, quote=True)
+        ))
+
+    html_out.write(HTML_FOOTER)
+    return text_out.getvalue(), html_out.getvalue()
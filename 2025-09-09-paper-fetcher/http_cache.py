@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+HTTP helpers for the paper fetcher
+Provides a pooled requests.Session and an on-disk response cache with
+TTL and conditional-request (ETag/Last-Modified) revalidation
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+# Response headers worth keeping alongside a cached body
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+def create_session(pool_connections: int = 10, pool_maxsize: int = 10,
+                   user_agent: str = None) -> requests.Session:
+    """Create a requests.Session with pooled keep-alive connections"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if user_agent:
+        session.headers['User-Agent'] = user_agent
+    return session
+
+
+class HTTPCache:
+    """On-disk cache of GET responses keyed by URL and query parameters"""
+
+    def __init__(self, cache_dir: str = ".http_cache", ttl_seconds: int = 3600):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(url: str, params: Dict = None) -> str:
+        """Build a stable cache key from the URL and sorted query parameters"""
+        items = sorted((str(k), str(v)) for k, v in (params or {}).items())
+        raw = json.dumps([url, items], ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _tmp_suffix() -> str:
+        """Per-writer temp suffix so concurrent fetches never share a temp file"""
+        return f".{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key)
+        return base + '.json', base + '.body'
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached entry metadata (with body) or None"""
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            with open(body_path, 'rb') as f:
+                entry['body'] = f.read()
+            return entry
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def is_fresh(self, entry: Dict) -> bool:
+        """Check whether an entry is still within its TTL"""
+        return time.time() - entry.get('stored_at', 0) < self.ttl_seconds
+
+    def put(self, key: str, response: requests.Response):
+        """Store a successful response body and its validators"""
+        meta_path, body_path = self._paths(key)
+        entry = {
+            'url': response.url,
+            'status_code': response.status_code,
+            'headers': {h: response.headers[h] for h in CACHED_HEADERS if h in response.headers},
+            'stored_at': time.time()
+        }
+        # Write to temp files first so a crash never leaves a half-written entry
+        suffix = self._tmp_suffix()
+        with open(body_path + suffix, 'wb') as f:
+            f.write(response.content)
+        with open(meta_path + suffix, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(body_path + suffix, body_path)
+        os.replace(meta_path + suffix, meta_path)
+
+    def touch(self, key: str, entry: Dict):
+        """Mark a revalidated (304) entry as fresh again"""
+        meta_path, _ = self._paths(key)
+        meta = {k: v for k, v in entry.items() if k != 'body'}
+        meta['stored_at'] = time.time()
+        suffix = self._tmp_suffix()
+        with open(meta_path + suffix, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + suffix, meta_path)
+
+    @staticmethod
+    def to_response(entry: Dict) -> requests.Response:
+        """Rebuild a requests.Response from a cached entry"""
+        response = requests.Response()
+        response.status_code = entry.get('status_code', 200)
+        response.url = entry.get('url', '')
+        response.headers = CaseInsensitiveDict(entry.get('headers', {}))
+        response._content = entry['body']
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+
+def cached_get(session: requests.Session, url: str, params: Dict = None,
+               headers: Dict = None, timeout: int = 30,
+               cache: Optional[HTTPCache] = None,
+               before_request: Optional[Callable[[], None]] = None) -> requests.Response:
+    """GET through the session, serving fresh hits from the cache and
+    revalidating stale entries with If-None-Match/If-Modified-Since
+
+    before_request (e.g. a rate limiter wait) runs only when the request
+    actually goes to the network, so fresh cache hits are not throttled.
+    """
+    if cache is None:
+        if before_request:
+            before_request()
+        return session.get(url, params=params, headers=headers, timeout=timeout)
+
+    key = cache.make_key(url, params)
+    entry = cache.get(key)
+    if entry and cache.is_fresh(entry):
+        logger.debug(f"HTTP cache hit: {url}")
+        return cache.to_response(entry)
+
+    request_headers = dict(headers or {})
+    if entry:
+        validators = entry.get('headers', {})
+        if 'ETag' in validators:
+            request_headers['If-None-Match'] = validators['ETag']
+        if 'Last-Modified' in validators:
+            request_headers['If-Modified-Since'] = validators['Last-Modified']
+
+    if before_request:
+        before_request()
+    response = session.get(url, params=params, headers=request_headers, timeout=timeout)
+
+    if response.status_code == 304 and entry:
+        logger.debug(f"HTTP cache revalidated: {url}")
+        cache.touch(key, entry)
+        return cache.to_response(entry)
+
+    if response.status_code == 200:
+        cache.put(key, response)
+
+    return response
@@ -2,162 +2,432 @@
 """
 Local SMTP Server for testing email functionality
 Creates a temporary SMTP server that saves emails to files instead of sending them
+Two engines are available: "threaded" (one thread per connection) and
+"asyncio" (one event loop with a connection limit, idle timeouts and
+graceful shutdown)
 """
 
+import asyncio
+import itertools
+import queue
 import socket
+import tempfile
 import threading
 import time
 import os
 from datetime import datetime
-import email
+from email.parser import BytesParser
 import logging
 
+from mail_transport import wait_for_smtp
+from mailbox_index import MAILBOX_DB, MailboxAPIServer, MailboxIndex
+
 logger = logging.getLogger(__name__)
 
+RECV_SIZE = 65536
+MAX_MESSAGE_SIZE = 35 * 1024 * 1024
+MAX_COMMAND_LENGTH = 4096
+PREVIEW_CHARS = 1000
+PREVIEW_READ_BYTES = 64 * 1024
+
+def parse_path(argument):
+    """Split '<addr> KEY=VALUE ...' into the address and its ESMTP parameters"""
+    argument = argument.strip()
+    if argument.startswith('<'):
+        end = argument.find('>')
+        if end < 0:
+            return None, {}
+        address, rest = argument[1:end], argument[end + 1:]
+    else:
+        address, _, rest = argument.partition(' ')
+    params = {}
+    for token in rest.split():
+        key, _, value = token.partition('=')
+        params[key.upper()] = value
+    return address, params
+
+def decode_preview(content, truncated):
+    """Decode a UTF-8 preview, tolerating a character cut off by a bounded read"""
+    try:
+        return content.decode('utf-8')
+    except UnicodeDecodeError as e:
+        if truncated and e.start >= len(content) - 3:
+            return content[:e.start].decode('utf-8')
+        raise
+
+class SMTPSession:
+    """SMTP protocol state for one connection, shared by both server engines
+    
+    feed() takes bytes as they arrive and returns the replies to send.
+    Commands are framed on CRLF from a buffer, so pipelined commands and
+    a terminator split across packets are handled, and DATA is copied in
+    bulk between dot-stuffed lines, into a bytearray or, with spool_dir,
+    straight into a temp file there. When a message is complete, feed()
+    stops with `pending` set to (mail_from, rcpt_to, body); the engine
+    takes ownership of the body, saves it and calls delivered().
+    """
+    
+    def __init__(self, hostname='localhost', max_message_size=MAX_MESSAGE_SIZE, spool_dir=None):
+        self.hostname = hostname
+        self.max_message_size = max_message_size
+        self.spool_dir = spool_dir
+        self.body = None
+        self.buffer = bytearray()
+        self.data_mode = False
+        self.at_line_start = True
+        self.discard_line = False
+        self.closed = False
+        self.pending = None
+        self.reset()
+    
+    def reset(self):
+        self.discard_body()
+        self.mail_from = None
+        self.rcpt_to = []
+        self.body_size = 0
+        self.oversized = False
+    
+    def new_body(self):
+        if self.spool_dir is None:
+            return bytearray()
+        return tempfile.NamedTemporaryFile(dir=self.spool_dir, prefix='.incoming_', suffix='.tmp', delete=False)
+    
+    def discard_body(self):
+        """Drop the body of an abandoned or rejected message"""
+        if self.body is not None and self.spool_dir is not None:
+            self.body.close()
+            try:
+                os.remove(self.body.name)
+            except FileNotFoundError:
+                pass
+        self.body = None
+    
+    def close(self):
+        """Release resources when the connection ends"""
+        if self.pending is None:
+            self.discard_body()
+    
+    @property
+    def in_transaction(self):
+        return self.mail_from is not None
+    
+    def greeting(self):
+        return f"220 {self.hostname} SMTP Server Ready\r\n".encode('ascii')
+    
+    def feed(self, data=b""):
+        """Consume received bytes and return the reply bytes"""
+        self.buffer += data
+        replies = bytearray()
+        pos = 0
+        while pos < len(self.buffer) and not self.closed and self.pending is None:
+            if self.data_mode:
+                pos = self.read_data(pos)
+                if self.data_mode:
+                    break
+                if self.oversized:
+                    replies += b"552 Message size exceeds fixed maximum message size\r\n"
+                    self.reset()
+                else:
+                    self.pending = (self.mail_from, self.rcpt_to, self.body)
+                continue
+            
+            eol = self.buffer.find(b"\n", pos)
+            if eol < 0:
+                if len(self.buffer) - pos > MAX_COMMAND_LENGTH:
+                    if not self.discard_line:
+                        replies += b"500 Line too long\r\n"
+                    self.discard_line = True
+                    pos = len(self.buffer)
+                break
+            line = bytes(self.buffer[pos:eol]).rstrip(b"\r")
+            pos = eol + 1
+            if self.discard_line:
+                self.discard_line = False
+                continue
+            replies += self.handle_command(line.decode('utf-8', errors='replace'))
+        
+        del self.buffer[:pos]
+        return bytes(replies)
+    
+    def read_data(self, pos):
+        """Copy DATA bytes into the body until the terminating '.' line
+        
+        Returns the new buffer position; clears data_mode at the end of the
+        message. Text between lines that start with '.' is copied in one
+        slice, so large messages are received in linear time.
+        """
+        buffer = self.buffer
+        end = len(buffer)
+        while pos < end:
+            if self.at_line_start and buffer[pos] == 0x2e:  # '.'
+                rest = bytes(buffer[pos + 1:pos + 3])
+                if rest[:1] == b"\n" or rest == b"\r\n":
+                    self.data_mode = False
+                    return pos + 1 + (1 if rest[:1] == b"\n" else 2)
+                if rest in (b"", b"\r"):
+                    return pos  # wait for the rest of the line
+                # Dot-unstuffing: drop the leading '.'
+                pos += 1
+                self.at_line_start = False
+            
+            next_dot = buffer.find(b"\n.", pos)
+            stop = next_dot + 1 if next_dot >= 0 else end
+            self.write_body(buffer[pos:stop])
+            self.at_line_start = buffer[stop - 1] == 0x0a
+            pos = stop
+        return pos
+    
+    def write_body(self, chunk):
+        if self.oversized:
+            return
+        if self.body_size + len(chunk) > self.max_message_size:
+            self.oversized = True
+            self.discard_body()
+            return
+        self.body_size += len(chunk)
+        if self.spool_dir is None:
+            self.body += chunk
+        else:
+            self.body.write(chunk)
+    
+    def delivered(self, ok=True):
+        """Finish the pending message and continue with buffered commands"""
+        self.pending = None
+        self.body = None
+        self.reset()
+        reply = b"250 Message accepted\r\n" if ok else b"451 Requested action aborted: error saving message\r\n"
+        return reply + self.feed()
+    
+    def handle_command(self, line):
+        verb, _, argument = line.partition(' ')
+        verb = verb.upper()
+        
+        if verb == "EHLO":
+            self.reset()
+            return (f"250-{self.hostname} Hello {argument.strip()}\r\n"
+                    f"250-PIPELINING\r\n"
+                    f"250-SIZE {self.max_message_size}\r\n"
+                    f"250 8BITMIME\r\n").encode('utf-8')
+        if verb == "HELO":
+            self.reset()
+            return f"250 {self.hostname} Hello\r\n".encode('utf-8')
+        if verb == "MAIL":
+            if not argument.upper().startswith("FROM:"):
+                return b"501 Syntax: MAIL FROM:<address>\r\n"
+            if self.in_transaction:
+                return b"503 Sender already specified\r\n"
+            address, params = parse_path(argument[5:])
+            if address is None:
+                return b"501 Syntax: MAIL FROM:<address>\r\n"
+            size = params.get('SIZE', '0')
+            if not size.isdigit():
+                return b"501 Invalid SIZE parameter\r\n"
+            if int(size) > self.max_message_size:
+                return b"552 Message size exceeds fixed maximum message size\r\n"
+            self.mail_from = address
+            return b"250 OK\r\n"
+        if verb == "RCPT":
+            if not self.in_transaction:
+                return b"503 Need MAIL before RCPT\r\n"
+            if not argument.upper().startswith("TO:"):
+                return b"501 Syntax: RCPT TO:<address>\r\n"
+            address, _ = parse_path(argument[3:])
+            if not address:
+                return b"501 Syntax: RCPT TO:<address>\r\n"
+            self.rcpt_to.append(address)
+            return b"250 OK\r\n"
+        if verb == "DATA":
+            if not self.rcpt_to:
+                return b"503 Need RCPT before DATA\r\n"
+            self.data_mode = True
+            self.at_line_start = True
+            self.discard_body()
+            self.body = self.new_body()
+            return b"354 Start mail input; end with <CRLF>.<CRLF>\r\n"
+        if verb == "RSET":
+            self.reset()
+            return b"250 OK\r\n"
+        if verb == "NOOP":
+            return b"250 OK\r\n"
+        if verb == "VRFY":
+            return b"252 Cannot verify user, but will accept message\r\n"
+        if verb == "QUIT":
+            self.closed = True
+            return b"221 Bye\r\n"
+        return b"502 Command not implemented\r\n"
+
 class LocalSMTPServer:
     """Simple local SMTP server that saves emails to files"""
     
-    def __init__(self, host='localhost', port=1025, output_dir="emails"):
+    def __init__(self, host='localhost', port=1025, output_dir="emails", backlog=128,
+                 max_message_size=MAX_MESSAGE_SIZE, index=True):
         self.host = host
         self.port = port
         self.output_dir = output_dir
+        self.backlog = backlog
+        self.max_message_size = max_message_size
         self.running = False
         self.server_socket = None
+        self.sequence = itertools.count()
+        self.summary_queue = queue.Queue()
+        self.summary_thread = None
         os.makedirs(output_dir, exist_ok=True)
+        self.mailbox = MailboxIndex(os.path.join(output_dir, MAILBOX_DB)) if index else None
         logger.info(f"Local SMTP server initialized on {host}:{port}")
         logger.info(f"Emails will be saved to: {os.path.abspath(output_dir)}")
     
     def handle_client(self, client_socket, client_address):
         """Handle SMTP client connection"""
+        session = SMTPSession(max_message_size=self.max_message_size, spool_dir=self.output_dir)
         try:
-            # Send greeting
-            client_socket.send(b"220 localhost SMTP Server Ready\r\n")
-            
-            mail_from = ""
-            rcpt_to = []
-            data_mode = False
-            email_data = b""
+            client_socket.sendall(session.greeting())
             
-            while True:
-                try:
-                    data = client_socket.recv(1024)
-                    if not data:
-                        break
-                    
-                    command = data.decode('utf-8', errors='ignore').strip()
-                    
-                    if data_mode:
-                        if command == ".":
-                            # End of email data
-                            data_mode = False
-                            self.save_email(mail_from, rcpt_to, email_data)
-                            client_socket.send(b"250 Message accepted\r\n")
-                            email_data = b""
-                            mail_from = ""
-                            rcpt_to = []
-                        else:
-                            email_data += data
-                    else:
-                        # Parse SMTP commands
-                        if command.upper().startswith("HELO") or command.upper().startswith("EHLO"):
-                            client_socket.send(b"250 Hello\r\n")
-                        elif command.upper().startswith("MAIL FROM:"):
-                            mail_from = command[10:].strip().strip('<>')
-                            client_socket.send(b"250 OK\r\n")
-                        elif command.upper().startswith("RCPT TO:"):
-                            rcpt_to.append(command[8:].strip().strip('<>'))
-                            client_socket.send(b"250 OK\r\n")
-                        elif command.upper() == "DATA":
-                            client_socket.send(b"354 Start mail input; end with <CRLF>.<CRLF>\r\n")
-                            data_mode = True
-                        elif command.upper() == "QUIT":
-                            client_socket.send(b"221 Bye\r\n")
-                            break
-                        else:
-                            client_socket.send(b"250 OK\r\n")
-                            
-                except Exception as e:
-                    logger.error(f"Error handling client command: {e}")
+            while not session.closed:
+                data = client_socket.recv(RECV_SIZE)
+                if not data:
                     break
+                
+                # Pipelined commands are answered in one write
+                reply = session.feed(data)
+                while session.pending:
+                    reply += session.delivered(self.save_email(*session.pending))
+                if reply:
+                    client_socket.sendall(reply)
                     
+        except ConnectionError as e:
+            logger.debug(f"Client {client_address} disconnected: {e}")
         except Exception as e:
             logger.error(f"Error handling client {client_address}: {e}")
         finally:
+            session.close()
             client_socket.close()
     
     def save_email(self, mail_from, rcpt_to, email_data):
-        """Save email to file"""
+        """Store a received message and queue its summary; returns whether it was stored
+        
+        email_data is either the spooled temp file, which is renamed into
+        place, or the message bytes, which are written to a temp file first,
+        so a reader never sees a half-written .eml file.
+        """
         try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
-            filename = f"email_{timestamp}.eml"
+            filename = f"email_{timestamp}_{next(self.sequence):04d}.eml"
             filepath = os.path.join(self.output_dir, filename)
             
-            # Save raw email
-            with open(filepath, 'wb') as f:
-                f.write(email_data)
-            
-            # Parse email for summary
-            try:
-                msg = email.message_from_bytes(email_data)
-                subject = msg.get('Subject', 'No Subject')
-            except:
-                subject = 'Parse Error'
-            
-            # Create readable summary
-            summary_file = filepath.replace('.eml', '_summary.txt')
-            with open(summary_file, 'w', encoding='utf-8') as f:
-                f.write(f"Email Summary\n")
-                f.write(f"=" * 50 + "\n")
-                f.write(f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"From: {mail_from}\n")
-                f.write(f"To: {', '.join(rcpt_to)}\n")
-                f.write(f"Subject: {subject}\n")
-                f.write(f"Raw file: {filename}\n")
-                f.write(f"\nContent Preview:\n")
-                f.write("-" * 30 + "\n")
-                
-                # Extract text content
-                try:
-                    msg = email.message_from_bytes(email_data)
-                    if msg.is_multipart():
-                        for part in msg.walk():
-                            if part.get_content_type() == "text/plain":
-                                content = part.get_payload(decode=True)
-                                if content:
-                                    try:
-                                        text_content = content.decode('utf-8')[:1000]
-                                        f.write(text_content)
-                                        if len(content) > 1000:
-                                            f.write("\n... (truncated)")
-                                    except:
-                                        f.write("(Binary or unreadable content)")
-                                break
-                    else:
-                        content = msg.get_payload(decode=True)
-                        if content:
-                            try:
-                                text_content = content.decode('utf-8')[:1000]
-                                f.write(text_content)
-                                if len(content) > 1000:
-                                    f.write("\n... (truncated)")
-                            except:
-                                f.write("(Binary or unreadable content)")
-                except Exception as e:
-                    f.write(f"Error parsing email: {e}")
+            if hasattr(email_data, 'name'):
+                email_data.close()
+                os.replace(email_data.name, filepath)
+            else:
+                with tempfile.NamedTemporaryFile(dir=self.output_dir, prefix='.incoming_', suffix='.tmp',
+                                                 delete=False) as f:
+                    f.write(email_data)
+                os.replace(f.name, filepath)
             
             logger.info(f"Email received and saved: {filename}")
-            logger.info(f"Subject: {subject}")
-            logger.info(f"From: {mail_from} To: {', '.join(rcpt_to)}")
-            
-            print(f"\n📧 Email received!")
-            print(f"Subject: {subject}")
-            print(f"From: {mail_from}")
-            print(f"To: {', '.join(rcpt_to)}")
-            print(f"Saved to: {filepath}")
-            print(f"Summary: {summary_file}")
+            self.summary_queue.put((filepath, mail_from, list(rcpt_to), datetime.now()))
+            return True
             
         except Exception as e:
             logger.error(f"Error saving email: {e}")
+            return False
+    
+    def start_summary_worker(self):
+        if self.summary_thread is None or not self.summary_thread.is_alive():
+            self.summary_thread = threading.Thread(target=self.summary_worker, daemon=True)
+            self.summary_thread.start()
+    
+    def stop_summary_worker(self, timeout=10):
+        """Finish queued summaries and stop the worker"""
+        if self.summary_thread is not None and self.summary_thread.is_alive():
+            self.summary_queue.put(None)
+            self.summary_thread.join(timeout)
+        self.summary_thread = None
+    
+    def summary_worker(self):
+        while True:
+            job = self.summary_queue.get()
+            if job is None:
+                break
+            try:
+                self.write_summary(*job)
+            except Exception as e:
+                logger.error(f"Error writing summary for {job[0]}: {e}")
+    
+    @staticmethod
+    def read_message(filepath):
+        """Parse a stored message once: headers only, plus the body when needed
+        
+        Returns (headers, text/plain content or None, truncated). Only
+        multipart messages are parsed in full; for single-part messages the
+        payload is decoded from the first PREVIEW_READ_BYTES of the body.
+        """
+        with open(filepath, 'rb') as f:
+            header_block = bytearray()
+            for line in f:
+                header_block += line
+                if line in (b"\r\n", b"\n"):
+                    break
+            headers = BytesParser().parsebytes(bytes(header_block), headersonly=True)
+            
+            if headers.get_content_maintype() == 'multipart':
+                f.seek(0)
+                msg = BytesParser().parse(f)
+                for part in msg.walk():
+                    if part.get_content_type() == "text/plain":
+                        return headers, part.get_payload(decode=True), False
+                return headers, None, False
+            
+            raw = f.read(PREVIEW_READ_BYTES + 1)
+            truncated = len(raw) > PREVIEW_READ_BYTES
+            headers.set_payload(raw[:PREVIEW_READ_BYTES].decode('ascii', 'surrogateescape'))
+            return headers, headers.get_payload(decode=True), truncated
+    
+    def write_summary(self, filepath, mail_from, rcpt_to, received_at):
+        """Write the readable _summary.txt next to a stored message and index it"""
+        filename = os.path.basename(filepath)
+        try:
+            headers, content, truncated = self.read_message(filepath)
+            subject = headers.get('Subject', 'No Subject')
+            error = None
+        except Exception as e:
+            headers, subject, content, truncated, error = None, 'Parse Error', None, False, e
+        
+        summary_file = filepath.replace('.eml', '_summary.txt')
+        with open(summary_file + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(f"Email Summary\n")
+            f.write(f"=" * 50 + "\n")
+            f.write(f"Timestamp: {received_at.strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"From: {mail_from}\n")
+            f.write(f"To: {', '.join(rcpt_to)}\n")
+            f.write(f"Subject: {subject}\n")
+            f.write(f"Raw file: {filename}\n")
+            f.write(f"\nContent Preview:\n")
+            f.write("-" * 30 + "\n")
+            
+            if error is not None:
+                f.write(f"Error parsing email: {error}")
+            elif content:
+                try:
+                    text_content = decode_preview(content, truncated)
+                    f.write(text_content[:PREVIEW_CHARS])
+                    if truncated or len(text_content) > PREVIEW_CHARS:
+                        f.write("\n... (truncated)")
+                except UnicodeDecodeError:
+                    f.write("(Binary or unreadable content)")
+        os.replace(summary_file + '.tmp', summary_file)
+        
+        if self.mailbox is not None:
+            self.mailbox.add(filepath, mail_from, rcpt_to, received_at, headers)
+        
+        logger.info(f"Subject: {subject}")
+        logger.info(f"From: {mail_from} To: {', '.join(rcpt_to)}")
+        
+        print(f"\n📧 Email received!")
+        print(f"Subject: {subject}")
+        print(f"From: {mail_from}")
+        print(f"To: {', '.join(rcpt_to)}")
+        print(f"Saved to: {filepath}")
+        print(f"Summary: {summary_file}")
     
     def start(self):
         """Start the SMTP server"""
@@ -165,8 +435,9 @@ class LocalSMTPServer:
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             self.server_socket.bind((self.host, self.port))
-            self.server_socket.listen(5)
+            self.server_socket.listen(self.backlog)
             self.running = True
+            self.start_summary_worker()
             
             logger.info(f"SMTP server listening on {self.host}:{self.port}")
             
@@ -189,6 +460,7 @@ class LocalSMTPServer:
         finally:
             if self.server_socket:
                 self.server_socket.close()
+            self.stop_summary_worker()
     
     def stop(self):
         """Stop the SMTP server"""
@@ -196,13 +468,134 @@ class LocalSMTPServer:
         if self.server_socket:
             self.server_socket.close()
 
+class AsyncSMTPServer(LocalSMTPServer):
+    """asyncio SMTP server with bounded connections
+
+    Connections beyond max_connections get "421 Too many connections",
+    sessions idle for idle_timeout seconds are closed, and stop() stops
+    accepting, closes idle sessions and lets in-flight transactions finish
+    (up to drain_timeout seconds) before shutting down.
+    """
+    
+    def __init__(self, host='localhost', port=1025, output_dir="emails", backlog=128,
+                 max_message_size=MAX_MESSAGE_SIZE, index=True, max_connections=100, idle_timeout=300,
+                 drain_timeout=10):
+        super().__init__(host, port, output_dir, backlog, max_message_size, index)
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.drain_timeout = drain_timeout
+        self.loop = None
+        self.shutdown_event = None
+        self.sessions = {}
+    
+    async def handle_session(self, reader, writer):
+        """Handle one SMTP client connection"""
+        task = asyncio.current_task()
+        session = SMTPSession(max_message_size=self.max_message_size, spool_dir=self.output_dir)
+        self.sessions[task] = session
+        
+        try:
+            writer.write(session.greeting())
+            await writer.drain()
+            
+            while not session.closed:
+                data = await asyncio.wait_for(reader.read(RECV_SIZE), self.idle_timeout)
+                if not data:
+                    break
+                reply = session.feed(data)
+                while session.pending:
+                    ok = await self.loop.run_in_executor(None, self.save_email, *session.pending)
+                    reply += session.delivered(ok)
+                writer.write(reply)
+                if self.shutdown_event.is_set() and not session.in_transaction:
+                    writer.write(b"421 Server shutting down\r\n")
+                    break
+                await writer.drain()
+        except asyncio.TimeoutError:
+            writer.write(b"421 Idle timeout, closing connection\r\n")
+        except asyncio.CancelledError:
+            writer.write(b"421 Server shutting down\r\n")
+        except ConnectionError as e:
+            logger.debug(f"Client connection ended: {e}")
+        except Exception as e:
+            logger.error(f"Error handling client: {e}")
+        finally:
+            session.close()
+            self.sessions.pop(task, None)
+            try:
+                await asyncio.wait_for(writer.drain(), 1)
+            except (Exception, asyncio.CancelledError):
+                pass
+            writer.close()
+    
+    async def accept(self, reader, writer):
+        if len(self.sessions) >= self.max_connections:
+            writer.write(b"421 Too many connections, try again later\r\n")
+            try:
+                await writer.drain()
+            finally:
+                writer.close()
+            return
+        await self.handle_session(reader, writer)
+    
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.shutdown_event = asyncio.Event()
+        server = await asyncio.start_server(self.accept, self.host, self.port, backlog=self.backlog)
+        self.running = True
+        self.start_summary_worker()
+        logger.info(f"SMTP server (asyncio) listening on {self.host}:{self.port}")
+        
+        await self.shutdown_event.wait()
+        
+        # Stop accepting, close idle sessions, let open transactions finish
+        server.close()
+        for task, session in list(self.sessions.items()):
+            if not session.in_transaction:
+                task.cancel()
+        deadline = self.loop.time() + self.drain_timeout
+        while self.sessions and self.loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        for task in list(self.sessions):
+            task.cancel()
+        if self.sessions:
+            await asyncio.wait(list(self.sessions), timeout=1)
+        await server.wait_closed()
+    
+    def start(self):
+        """Run the server until stop() is called (blocking)"""
+        try:
+            asyncio.run(self.serve())
+        except Exception as e:
+            logger.error(f"Error starting SMTP server: {e}")
+        finally:
+            self.running = False
+            self.stop_summary_worker()
+    
+    def stop(self):
+        """Request a graceful shutdown (safe to call from any thread)"""
+        if self.loop and self.shutdown_event and not self.loop.is_closed():
+            try:
+                self.loop.call_soon_threadsafe(self.shutdown_event.set)
+            except RuntimeError:
+                pass
+
+SERVER_ENGINES = {
+    'threaded': LocalSMTPServer,
+    'asyncio': AsyncSMTPServer
+}
+
 class SMTPServerManager:
     """Manager for the local SMTP server"""
     
-    def __init__(self, host='localhost', port=1025, output_dir="emails"):
+    def __init__(self, host='localhost', port=1025, output_dir="emails", engine='threaded', **server_options):
+        if engine not in SERVER_ENGINES:
+            raise ValueError(f"Unknown SMTP server engine: {engine}")
         self.host = host
         self.port = port
         self.output_dir = output_dir
+        self.engine = engine
+        self.server_options = server_options
         self.server = None
         self.server_thread = None
         self.running = False
@@ -214,7 +607,7 @@ class SMTPServerManager:
             return True
         
         try:
-            self.server = LocalSMTPServer(self.host, self.port, self.output_dir)
+            self.server = SERVER_ENGINES[self.engine](self.host, self.port, self.output_dir, **self.server_options)
             
             def run_server():
                 try:
@@ -227,8 +620,13 @@ class SMTPServerManager:
             self.server_thread.start()
             self.running = True
             
-            # Give server time to start
-            time.sleep(0.5)
+            # Readiness probe instead of a fixed sleep: wait for the 220 greeting
+            probe_host = '127.0.0.1' if self.host in ('', '0.0.0.0') else self.host
+            if not wait_for_smtp(probe_host, self.port, timeout=5) or not self.server_thread.is_alive():
+                logger.error(f"SMTP server on {self.host}:{self.port} did not become ready")
+                self.server.stop()
+                self.running = False
+                return False
             
             logger.info(f"SMTP server started on {self.host}:{self.port}")
             return True
@@ -246,6 +644,9 @@ class SMTPServerManager:
         try:
             if self.server:
                 self.server.stop()
+            if isinstance(self.server, AsyncSMTPServer) and self.server_thread:
+                # Wait for in-flight sessions to drain
+                self.server_thread.join(self.server.drain_timeout + 2)
             self.running = False
             logger.info("SMTP server stopped")
         except Exception as e:
@@ -255,6 +656,11 @@ class SMTPServerManager:
         """Check if server is running"""
         return self.running
     
+    @property
+    def mailbox(self):
+        """Index of received messages (query / wait_for), if enabled"""
+        return self.server.mailbox if self.server else None
+    
     def get_config(self):
         """Get configuration for email client"""
         return {
@@ -273,6 +679,10 @@ def main():
     parser.add_argument('--host', default='localhost', help='Server host')
     parser.add_argument('--port', type=int, default=1025, help='Server port')
     parser.add_argument('--output', default='emails', help='Output directory for emails')
+    parser.add_argument('--engine', choices=sorted(SERVER_ENGINES), default='threaded', help='Server engine')
+    parser.add_argument('--max-connections', type=int, default=100, help='Concurrent sessions (asyncio engine)')
+    parser.add_argument('--idle-timeout', type=float, default=300, help='Idle session timeout in seconds (asyncio engine)')
+    parser.add_argument('--api-port', type=int, help='Also serve the mailbox query API on this port')
     
     args = parser.parse_args()
     
@@ -283,13 +693,19 @@ def main():
     print(f"Emails will be saved to: {os.path.abspath(args.output)}")
     print("Press Ctrl+C to stop the server")
     
-    server_manager = SMTPServerManager(args.host, args.port, args.output)
+    options = {}
+    if args.engine == 'asyncio':
+        options = {'max_connections': args.max_connections, 'idle_timeout': args.idle_timeout}
+    server_manager = SMTPServerManager(args.host, args.port, args.output, args.engine, **options)
     
     try:
         if server_manager.start():
             print("✅ Server started successfully!")
             print(f"Configure your email client to use: {args.host}:{args.port}")
             print("No authentication required")
+            if args.api_port:
+                api = MailboxAPIServer(server_manager.mailbox, args.host, args.api_port).start()
+                print(f"Mailbox API: {api.base_url}/messages")
             
             # Keep server running
             while server_manager.is_running():
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Reusable SMTP transport for the paper fetcher
+Keeps one authenticated SMTP session open across messages, resets it with
+RSET between messages and reconnects when the server drops it, so batches
+of digests pay for the connect/STARTTLS/login handshake once
+"""
+
+import logging
+import smtplib
+import socket
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def wait_for_smtp(host: str, port: int, timeout: float = 5.0, interval: float = 0.05) -> bool:
+    """Readiness probe: poll until the server answers with a 220 greeting"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=1) as s:
+                if s.recv(3) == b"220":
+                    s.sendall(b"QUIT\r\n")
+                    return True
+        except OSError:
+            pass
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+
+
+class MailTransport:
+    """A persistent SMTP connection shared by every message of a run
+
+    The first send connects (with STARTTLS and login when configured);
+    later sends reuse the session and issue RSET first, which also
+    detects a connection the server has closed. Dropped connections and
+    421 replies trigger a reconnect and retry, up to reconnect_attempts.
+    Permanent per-message failures (refused recipients, 5xx replies) are
+    raised to the caller and leave the session usable.
+    """
+
+    def __init__(self, host: str, port: int, username: str = "", password: str = "",
+                 use_tls: bool = False, timeout: float = 60, reconnect_attempts: int = 2,
+                 max_messages_per_connection: int = None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.reconnect_attempts = reconnect_attempts
+        self.max_messages_per_connection = max_messages_per_connection
+        self.server: Optional[smtplib.SMTP] = None
+        self.sent_on_connection = 0
+        self.stats = {'connections': 0, 'messages': 0, 'reconnects': 0}
+
+    def connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            if self.use_tls:
+                server.starttls()
+                server.ehlo()
+            if self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+        self.sent_on_connection = 0
+        self.stats['connections'] += 1
+        logger.debug(f"SMTP connection opened to {self.host}:{self.port}")
+        return server
+
+    def close(self):
+        """QUIT the session if it is still open"""
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+        self.server = None
+
+    def drop(self):
+        """Forget a broken connection without talking to the server"""
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+    def send(self, msg, from_addr: str = None, to_addrs: List[str] = None) -> Dict:
+        """Send one message; returns smtplib's dict of refused recipients"""
+        for attempt in range(self.reconnect_attempts + 1):
+            try:
+                if self.server is None:
+                    self.connect()
+                elif self.sent_on_connection:
+                    self.server.rset()
+                refused = self.server.send_message(msg, from_addr, to_addrs)
+            except smtplib.SMTPRecipientsRefused:
+                raise
+            except smtplib.SMTPResponseException as e:
+                # Only 421 (service closing) means the session is gone; other
+                # replies are about this message and leave the session usable
+                if e.smtp_code != 421:
+                    raise
+                error = e
+            except smtplib.SMTPServerDisconnected as e:
+                error = e
+            except smtplib.SMTPException:
+                raise
+            except OSError as e:
+                # SMTPException subclasses OSError, so this must come last
+                error = e
+            else:
+                self.sent_on_connection += 1
+                self.stats['messages'] += 1
+                if self.max_messages_per_connection and self.sent_on_connection >= self.max_messages_per_connection:
+                    self.close()
+                return refused
+
+            self.drop()
+            if attempt >= self.reconnect_attempts:
+                raise error
+            self.stats['reconnects'] += 1
+            logger.warning(f"SMTP connection lost ({error}), reconnecting")
+            time.sleep(min(2 ** attempt * 0.5, 5))
+
+    def __enter__(self) -> 'MailTransport':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Indexed mailbox for the local SMTP server
+Keeps one SQLite row per stored message (envelope, headers, size and file)
+so tests can query by recipient, subject or time range and wait for a
+message to arrive instead of sleeping and globbing emails/
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from email.header import decode_header, make_header
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger(__name__)
+
+MAILBOX_DB = 'mailbox.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT UNIQUE NOT NULL,
+    received_at REAL NOT NULL,
+    mail_from TEXT,
+    subject TEXT,
+    message_id TEXT,
+    size INTEGER,
+    headers TEXT
+);
+CREATE TABLE IF NOT EXISTS recipients (
+    message INTEGER NOT NULL REFERENCES messages(id),
+    address TEXT NOT NULL COLLATE NOCASE
+);
+CREATE INDEX IF NOT EXISTS recipients_address ON recipients(address);
+CREATE INDEX IF NOT EXISTS messages_received_at ON messages(received_at);
+"""
+
+
+def decode_subject(value: Optional[str]) -> str:
+    """Decode RFC 2047 encoded words ('=?utf-8?b?...?=') in a header"""
+    if not value:
+        return ''
+    try:
+        return str(make_header(decode_header(value)))
+    except Exception:
+        return value
+
+
+def to_timestamp(value) -> Optional[float]:
+    """Accept epoch seconds, datetimes or ISO strings"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return datetime.fromisoformat(value).timestamp()
+
+
+class MailboxIndex:
+    """SQLite index of the messages in an emails/ directory
+
+    Writers (the server's summary worker) and readers may live in
+    different threads or processes; WAL mode lets queries run while
+    messages are being added, and wait_for() wakes up immediately for
+    messages added in this process and polls for the others.
+    """
+
+    def __init__(self, db_path: str = os.path.join("emails", MAILBOX_DB)):
+        self.db_path = db_path
+        self.directory = os.path.dirname(os.path.abspath(db_path))
+        self.arrived = threading.Condition()
+        os.makedirs(self.directory, exist_ok=True)
+        conn = self.connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add(self, filepath: str, mail_from: str, rcpt_to: List[str], received_at=None,
+            headers=None) -> int:
+        """Index a stored message; returns its id"""
+        received_at = to_timestamp(received_at) or time.time()
+        header_items = list(headers.items()) if headers is not None else []
+        conn = self.connect()
+        try:
+            with conn:
+                # INSERT OR REPLACE gives a re-indexed message a new id; drop the old recipient rows
+                conn.execute('DELETE FROM recipients WHERE message IN '
+                             '(SELECT id FROM messages WHERE filename = ?)', (os.path.basename(filepath),))
+                cursor = conn.execute(
+                    'INSERT OR REPLACE INTO messages (filename, received_at, mail_from, subject, '
+                    'message_id, size, headers) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (os.path.basename(filepath), received_at, mail_from,
+                     decode_subject(headers.get('Subject')) if headers is not None else '',
+                     headers.get('Message-ID', '') if headers is not None else '',
+                     os.path.getsize(filepath),
+                     json.dumps([[k, str(v)] for k, v in header_items], ensure_ascii=False)))
+                message = cursor.lastrowid
+                conn.executemany('INSERT INTO recipients (message, address) VALUES (?, ?)',
+                                 [(message, address) for address in rcpt_to])
+        finally:
+            conn.close()
+        with self.arrived:
+            self.arrived.notify_all()
+        return message
+
+    def query(self, recipient: str = None, subject: str = None, sender: str = None,
+              since=None, until=None, limit: int = 100) -> List[Dict]:
+        """Messages matching all given filters, oldest first
+
+        recipient and sender match addresses exactly (case-insensitive),
+        subject is a case-insensitive substring, and since/until bound the
+        arrival time (epoch seconds, datetime or ISO string).
+        """
+        clauses, params = [], []
+        if recipient:
+            clauses.append('id IN (SELECT message FROM recipients WHERE address = ?)')
+            params.append(recipient)
+        if subject:
+            clauses.append("subject LIKE ? ESCAPE '\\'")
+            params.append('%' + subject.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        if sender:
+            clauses.append('mail_from = ? COLLATE NOCASE')
+            params.append(sender)
+        if since is not None:
+            clauses.append('received_at >= ?')
+            params.append(to_timestamp(since))
+        if until is not None:
+            clauses.append('received_at < ?')
+            params.append(to_timestamp(until))
+        where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+
+        conn = self.connect()
+        try:
+            rows = conn.execute(f'SELECT * FROM messages{where} ORDER BY received_at, id LIMIT ?',
+                                params + [limit]).fetchall()
+            recipients = {}
+            if rows:
+                ids = [row['id'] for row in rows]
+                for message, address in conn.execute(
+                        f"SELECT message, address FROM recipients WHERE message IN ({','.join('?' * len(ids))})", ids):
+                    recipients.setdefault(message, []).append(address)
+        finally:
+            conn.close()
+        return [self.to_dict(row, recipients.get(row['id'], [])) for row in rows]
+
+    def to_dict(self, row: sqlite3.Row, recipients: List[str]) -> Dict:
+        return {
+            'id': row['id'],
+            'filename': row['filename'],
+            'path': os.path.join(self.directory, row['filename']),
+            'received_at': row['received_at'],
+            'mail_from': row['mail_from'],
+            'recipients': recipients,
+            'subject': row['subject'],
+            'message_id': row['message_id'],
+            'size': row['size'],
+            'headers': json.loads(row['headers'] or '[]')
+        }
+
+    def wait_for(self, timeout: float = 10.0, poll_interval: float = 0.1, **filters) -> Optional[Dict]:
+        """Block until a message matching the filters exists; None on timeout
+
+        Pass since=<time before sending> to ignore older matches.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.arrived:
+                found = self.query(limit=1, **filters)
+                if found:
+                    return found[0]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.arrived.wait(min(poll_interval, remaining))
+
+    def load(self, message: Dict):
+        """Parse the stored message file"""
+        with open(message['path'], 'rb') as f:
+            return BytesParser().parse(f)
+
+    def reindex(self) -> int:
+        """Index .eml files in the directory that are not indexed yet
+
+        Envelope data is not stored in the files, so From and To/Cc
+        headers stand in for it.
+        """
+        conn = self.connect()
+        try:
+            known = {row[0] for row in conn.execute('SELECT filename FROM messages')}
+        finally:
+            conn.close()
+        added = 0
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith('.eml') or filename in known:
+                continue
+            filepath = os.path.join(self.directory, filename)
+            with open(filepath, 'rb') as f:
+                headers = BytesParser().parse(f, headersonly=True)
+            recipients = [a.strip() for field in ('To', 'Cc') for a in (headers.get(field) or '').split(',') if a.strip()]
+            self.add(filepath, headers.get('From', ''), recipients, os.path.getmtime(filepath), headers)
+            added += 1
+        return added
+
+
+class MailboxAPIServer:
+    """Small local HTTP API over a MailboxIndex
+
+    GET /messages?recipient=&subject=&sender=&since=&until=&limit=
+    GET /messages/wait?...&timeout=   (404 if nothing arrives in time)
+    GET /messages/<id>/raw
+    """
+
+    def __init__(self, index: MailboxIndex, host: str = 'localhost', port: int = 8025):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.httpd = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.httpd.server_port}"
+
+    def start(self) -> 'MailboxAPIServer':
+        index = self.index
+
+        class MailboxHandler(BaseHTTPRequestHandler):
+            def send_body(self, status, body, content_type='application/json'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_json(self, status, data):
+                self.send_body(status, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                params = dict(parse_qsl(parts.query))
+                path = parts.path.rstrip('/')
+                try:
+                    filters = {key: params[key] for key in ('recipient', 'subject', 'sender') if key in params}
+                    for key in ('since', 'until'):
+                        if key in params:
+                            value = params[key]
+                            filters[key] = float(value) if value.replace('.', '', 1).isdigit() else value
+                    if path == '/messages':
+                        self.send_json(200, index.query(limit=int(params.get('limit', 100)), **filters))
+                    elif path == '/messages/wait':
+                        message = index.wait_for(timeout=float(params.get('timeout', 10)), **filters)
+                        self.send_json(200 if message else 404, message or {'error': 'timeout'})
+                    elif path.startswith('/messages/') and path.endswith('/raw'):
+                        message_id = int(path.split('/')[2])
+                        conn = index.connect()
+                        try:
+                            row = conn.execute('SELECT filename FROM messages WHERE id = ?', (message_id,)).fetchone()
+                        finally:
+                            conn.close()
+                        if row is None:
+                            self.send_json(404, {'error': 'not found'})
+                        else:
+                            with open(os.path.join(index.directory, row[0]), 'rb') as f:
+                                self.send_body(200, f.read(), 'message/rfc822')
+                    else:
+                        self.send_json(404, {'error': 'not found'})
+                except ValueError as e:
+                    self.send_json(400, {'error': str(e)})
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self.httpd = ThreadingHTTPServer((self.host, self.port), MailboxHandler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        logger.info(f"Mailbox API listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the local SMTP server mailbox')
+    parser.add_argument('--dir', default='emails', help='Emails directory')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    query = subparsers.add_parser('query', help='List matching messages')
+    wait = subparsers.add_parser('wait', help='Wait for a matching message')
+    wait.add_argument('--timeout', type=float, default=30, help='Seconds to wait')
+    for sub in (query, wait):
+        sub.add_argument('--recipient', help='Envelope recipient')
+        sub.add_argument('--subject', help='Subject substring')
+        sub.add_argument('--sender', help='Envelope sender')
+        sub.add_argument('--since', help='Received at or after (ISO time)')
+        sub.add_argument('--until', help='Received before (ISO time)')
+    subparsers.add_parser('reindex', help='Index .eml files missing from the index')
+    serve = subparsers.add_parser('serve', help='Serve the HTTP query API')
+    serve.add_argument('--host', default='localhost', help='API host')
+    serve.add_argument('--port', type=int, default=8025, help='API port')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    index = MailboxIndex(os.path.join(args.dir, MAILBOX_DB))
+
+    if args.command == 'reindex':
+        print(f"Indexed {index.reindex()} messages")
+    elif args.command == 'serve':
+        server = MailboxAPIServer(index, args.host, args.port).start()
+        print(f"Mailbox API running at {server.base_url}/messages")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.stop()
+    else:
+        filters = {key: getattr(args, key) for key in ('recipient', 'subject', 'sender', 'since', 'until')
+                   if getattr(args, key)}
+        if args.command == 'wait':
+            message = index.wait_for(timeout=args.timeout, **filters)
+            messages = [message] if message else []
+        else:
+            messages = index.query(**filters)
+        for m in messages:
+            received = datetime.fromtimestamp(m['received_at']).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"{m['id']:>5}  {received}  {m['mail_from']} -> {', '.join(m['recipients'])}  "
+                  f"{m['subject']}  ({m['size']} bytes, {m['filename']})")
+        if args.command == 'wait' and not messages:
+            raise SystemExit("Timed out waiting for a message")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,18 +5,26 @@ Fetches recent papers from arXiv and sends them via email
 """
 
 import requests
-import xml.etree.ElementTree as ET
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
 import argparse
 import logging
-from typing import List, Dict
+from typing import Callable, List, Dict, Tuple
 import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from local_smtp_server import SMTPServerManager
+from mail_transport import MailTransport
+from http_cache import HTTPCache, cached_get, create_session
+from digest_renderer import DIGEST_TITLE, render_digest
+from ranking import BM25Index, create_reranker, rank_papers
+from sources import HostRateLimiter, Paper, SourceError, create_sources
+from pdf_downloader import PDFDownloader
+from paper_index import open_index
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -27,6 +35,13 @@ class PaperFetcher:
         """Initialize the paper fetcher with configuration"""
         self.config = self.load_config(config_file)
         self.papers = []
+        self.source_stats = {}
+        self.stats_lock = threading.Lock()
+        self._rendered = (None, 0, None)
+        self._index = None
+        self.transport = None
+        self.init_http()
+        self.init_sources()
         
     def load_config(self, config_file: str) -> Dict:
         """Load configuration from file or use defaults"""
@@ -40,16 +55,73 @@ class PaperFetcher:
             ],
             "days_back": 30,
             "max_results": 50,
+            "fetch_workers": 4,
+            "request_interval": 1.0,
+            "sources": {
+                "arxiv": {"enabled": True},
+                "semantic_scholar": {"enabled": True}
+            },
+            "ranking": {
+                "enabled": True,
+                "top_n": 30,
+                "min_score": 0.0,
+                "k1": 1.5,
+                "b": 0.75,
+                "title_weight": 2,
+                "embedding_rerank": {
+                    "enabled": False,
+                    "candidates": 50,
+                    "weight": 0.5,
+                    "model": "BAAI/bge-m3",
+                    "base_url": "https://api.siliconflow.cn/v1",
+                    "api_key_env": "SILICONFLOW_API_KEY"
+                }
+            },
+            "http": {
+                "pool_connections": 10,
+                "pool_maxsize": 10,
+                "cache_enabled": True,
+                "cache_dir": ".http_cache",
+                "cache_ttl_seconds": 3600
+            },
+            "pdf_download": {
+                "enabled": False,
+                "directory": "papers",
+                "max_workers": 4,
+                "chunk_size": 65536,
+                "min_interval": 1.0,
+                "timeout": 60,
+                "max_retries": 2
+            },
+            "archive_index": {
+                "enabled": False,
+                "directory": "paper_index",
+                "embedder": "hashing",
+                "dim": 256,
+                "model": "BAAI/bge-m3",
+                "base_url": "https://api.siliconflow.cn/v1",
+                "api_key_env": "SILICONFLOW_API_KEY",
+                "batch_size": 32,
+                "nlist": None,
+                "nprobe": 8,
+                "ivf_min_papers": 20000
+            },
             "email": {
                 "use_local_server": True,
                 "local_server_host": "localhost",
                 "local_server_port": 1025,
+                "local_server_engine": "asyncio",
+                "local_server_max_connections": 100,
+                "local_server_idle_timeout": 300,
                 "smtp_server": "localhost",
                 "smtp_port": 1025,
                 "sender_email": "paper-fetcher@localhost",
                 "sender_password": "",
                 "recipient_email": "recipient@localhost",
-                "use_tls": False
+                "use_tls": False,
+                "timeout": 60,
+                "reconnect_attempts": 2,
+                "max_messages_per_connection": None
             }
         }
         
@@ -63,171 +135,198 @@ class PaperFetcher:
         
         return default_config
     
-    def search_arxiv(self, query: str, max_results: int = 50) -> List[Dict]:
-        """Search arXiv for papers matching the query"""
-        logger.info(f"Searching arXiv for: {query}")
-        
-        # Calculate date threshold
-        date_threshold = datetime.now() - timedelta(days=self.config['days_back'])
-        
-        # Construct arXiv API query
-        base_url = "http://export.arxiv.org/api/query"
-        search_query = f'all:"{query}"'
-        
-        params = {
-            'search_query': search_query,
-            'start': 0,
-            'max_results': max_results,
-            'sortBy': 'submittedDate',
-            'sortOrder': 'descending'
-        }
-        
+    def init_http(self):
+        """Create the shared HTTP session and optional response cache"""
+        http_config = self.config.get('http', {})
+        self.session = create_session(
+            pool_connections=http_config.get('pool_connections', 10),
+            pool_maxsize=http_config.get('pool_maxsize', 10)
+        )
+        self.http_cache = None
+        if http_config.get('cache_enabled', True):
+            self.http_cache = HTTPCache(
+                http_config.get('cache_dir', '.http_cache'),
+                http_config.get('cache_ttl_seconds', 3600)
+            )
+    
+    def http_get(self, url: str, params: Dict = None, headers: Dict = None, timeout: int = 30,
+                 before_request: Callable[[], None] = None) -> requests.Response:
+        """GET a URL through the pooled session and the on-disk cache"""
+        return cached_get(self.session, url, params=params, headers=headers,
+                          timeout=timeout, cache=self.http_cache, before_request=before_request)
+    
+    def init_sources(self):
+        """Create the configured source adapters sharing one per-host rate limiter"""
+        self.rate_limiter = HostRateLimiter(self.config.get('request_interval', 1.0))
+        self.sources = create_sources(self.config.get('sources', {}), self.http_get,
+                                      self.rate_limiter, self.config['days_back'])
+    
+    def download_pdfs(self, papers: List[Paper] = None) -> Dict[str, str]:
+        """Download full-text PDFs for papers (the fetched list by default)"""
+        pdf_config = self.config.get('pdf_download', {})
+        downloader = PDFDownloader(
+            self.session,
+            self.rate_limiter,
+            download_dir=pdf_config.get('directory', 'papers'),
+            max_workers=pdf_config.get('max_workers', 4),
+            chunk_size=pdf_config.get('chunk_size', 65536),
+            timeout=pdf_config.get('timeout', 60),
+            max_retries=pdf_config.get('max_retries', 2),
+            min_interval=pdf_config.get('min_interval', 1.0)
+        )
+        return downloader.download_all(self.papers if papers is None else papers)
+    
+    def search_source(self, name: str, query: str, max_results: int = 50) -> List[Paper]:
+        """Search one source, logging and counting failures instead of raising"""
         try:
-            response = requests.get(base_url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            # Parse XML response
-            root = ET.fromstring(response.content)
-            namespace = {'atom': 'http://www.w3.org/2005/Atom'}
-            
-            papers = []
-            for entry in root.findall('atom:entry', namespace):
-                # Extract paper information
-                paper_id = entry.find('atom:id', namespace).text
-                title = entry.find('atom:title', namespace).text.strip()
-                summary = entry.find('atom:summary', namespace).text.strip()
-                
-                # Get authors
-                authors = []
-                for author in entry.findall('atom:author', namespace):
-                    name = author.find('atom:name', namespace).text
-                    authors.append(name)
-                
-                # Get publication date
-                published = entry.find('atom:published', namespace).text
-                pub_date = datetime.strptime(published[:10], '%Y-%m-%d')
-                
-                # Only include papers from the last month
-                if pub_date >= date_threshold:
-                    papers.append({
-                        'id': paper_id,
-                        'title': title,
-                        'authors': authors,
-                        'summary': summary,
-                        'published': pub_date.strftime('%Y-%m-%d'),
-                        'url': paper_id,
-                        'source': 'arXiv'
-                    })
-            
-            logger.info(f"Found {len(papers)} recent papers for query: {query}")
-            return papers
-            
-        except requests.RequestException as e:
-            logger.error(f"Error searching arXiv: {e}")
-            return []
-        except ET.ParseError as e:
-            logger.error(f"Error parsing arXiv response: {e}")
+            return self.sources[name].search(query, max_results)
+        except SourceError as e:
+            logger.error(str(e))
+            self.record_source_error(name)
             return []
     
-    def search_semantic_scholar(self, query: str, max_results: int = 50) -> List[Dict]:
+    def search_arxiv(self, query: str, max_results: int = 50) -> List[Paper]:
+        """Search arXiv for papers matching the query"""
+        return self.search_source('arXiv', query, max_results)
+    
+    def search_semantic_scholar(self, query: str, max_results: int = 50) -> List[Paper]:
         """Search Semantic Scholar for papers (requires API key for full access)"""
-        logger.info(f"Searching Semantic Scholar for: {query}")
-        
-        base_url = "https://api.semanticscholar.org/graph/v1/paper/search"
-        
-        # Calculate date threshold
-        date_threshold = datetime.now() - timedelta(days=self.config['days_back'])
-        year_threshold = date_threshold.year
-        
-        params = {
-            'query': query,
-            'limit': max_results,
-            'fields': 'paperId,title,authors,abstract,year,publicationDate,url',
-            'year': f'{year_threshold}-'
-        }
+        return self.search_source('Semantic Scholar', query, max_results)
+    
+    def record_source_error(self, source: str):
+        """Count a failed query against a source for the current fetch"""
+        with self.stats_lock:
+            if source in self.source_stats:
+                self.source_stats[source]['errors'] += 1
+    
+    def fetch_papers(self, sources: List[str] = None) -> List[Paper]:
+        """Fetch papers from all configured sources (or only the given ones)
         
-        headers = {
-            'User-Agent': 'Academic Paper Fetcher (your-email@example.com)'
-        }
+        Queries run concurrently on a bounded thread pool; requests to the
+        same host are still spaced by the shared rate limiter. Per-source
+        query counts, errors, latency and paper counts for this fetch are
+        recorded in self.source_stats.
+        """
+        logger.info("Starting paper fetch process...")
+        names = [name for name in self.sources if sources is None or name in sources]
+        self.source_stats = {name: {'queries': 0, 'errors': 0, 'papers': 0, 'latency': 0.0}
+                             for name in names}
         
-        try:
-            response = requests.get(base_url, params=params, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
-            papers = []
-            
-            for paper in data.get('data', []):
-                # Check if paper is recent enough
-                pub_date_str = paper.get('publicationDate')
-                if pub_date_str:
-                    try:
-                        pub_date = datetime.strptime(pub_date_str, '%Y-%m-%d')
-                        if pub_date < date_threshold:
-                            continue
-                    except ValueError:
-                        continue
-                
-                authors = [author.get('name', '') for author in paper.get('authors', [])]
-                
-                papers.append({
-                    'id': paper.get('paperId', ''),
-                    'title': paper.get('title', ''),
-                    'authors': authors,
-                    'summary': paper.get('abstract', ''),
-                    'published': pub_date_str or '',
-                    'url': paper.get('url', ''),
-                    'source': 'Semantic Scholar'
-                })
-            
-            logger.info(f"Found {len(papers)} recent papers from Semantic Scholar")
+        def run_query(name: str, search_term: str) -> List[Paper]:
+            start = time.time()
+            papers = self.search_source(name, search_term, self.config['max_results'])
+            with self.stats_lock:
+                stats = self.source_stats[name]
+                stats['queries'] += 1
+                stats['papers'] += len(papers)
+                stats['latency'] += time.time() - start
             return papers
-            
-        except requests.RequestException as e:
-            logger.error(f"Error searching Semantic Scholar: {e}")
-            return []
-        except json.JSONDecodeError as e:
-            logger.error(f"Error parsing Semantic Scholar response: {e}")
-            return []
-    
-    def fetch_papers(self) -> List[Dict]:
-        """Fetch papers from all configured sources"""
-        logger.info("Starting paper fetch process...")
-        all_papers = []
         
-        for search_term in self.config['search_terms']:
-            # Search arXiv
-            arxiv_papers = self.search_arxiv(search_term, self.config['max_results'])
-            all_papers.extend(arxiv_papers)
-            
-            # Add delay to be respectful to APIs
-            time.sleep(1)
-            
-            # Search Semantic Scholar
-            ss_papers = self.search_semantic_scholar(search_term, self.config['max_results'])
-            all_papers.extend(ss_papers)
-            
-            time.sleep(1)
+        # Keep submission order so results (and dedup winners) are deterministic
+        tasks = [(name, term) for term in self.get_search_terms() for name in names]
+        all_papers = []
+        with ThreadPoolExecutor(max_workers=self.config.get('fetch_workers', 4)) as executor:
+            for papers in executor.map(lambda task: run_query(*task), tasks):
+                all_papers.extend(papers)
         
         # Remove duplicates based on title similarity
         unique_papers = self.remove_duplicates(all_papers)
         
         # Sort by publication date (newest first)
-        unique_papers.sort(key=lambda x: x['published'], reverse=True)
+        unique_papers.sort(key=lambda x: x.published, reverse=True)
+        
+        # Archive everything fetched, before the relevance cut
+        if self.config.get('archive_index', {}).get('enabled', False):
+            self.index_papers(unique_papers)
+        
+        # Keep only the most relevant papers for the configured search terms;
+        # with subscribers, ranking happens per digest on the shared results
+        if not self.get_subscribers():
+            unique_papers = self.rank_papers(unique_papers)
         
         self.papers = unique_papers
         logger.info(f"Total unique papers found: {len(unique_papers)}")
         
         return unique_papers
     
-    def remove_duplicates(self, papers: List[Dict]) -> List[Dict]:
+    def get_index(self):
+        """The local archive search index, opened on first use"""
+        if self._index is None:
+            self._index = open_index(self.config.get('archive_index', {}))
+        return self._index
+    
+    def index_papers(self, papers: List[Paper]) -> int:
+        """Add papers to the archive index without failing the fetch"""
+        try:
+            return self.get_index().add(papers)
+        except Exception as e:
+            logger.error(f"Error indexing papers: {e}")
+            return 0
+    
+    def search_archive(self, query: str, k: int = 10, since: str = None,
+                       method: str = 'auto', nprobe: int = None) -> List[Tuple[Paper, float]]:
+        """Semantic search over archived papers, without hitting the APIs"""
+        return self.get_index().search(query, k=k, since=since, method=method, nprobe=nprobe)
+    
+    def get_subscribers(self) -> List[Dict]:
+        """Configured digest subscribers (empty for single-recipient mode)"""
+        return self.config.get('subscribers') or []
+    
+    def get_search_terms(self) -> List[str]:
+        """Search terms to fetch: the union over all subscribers, or the global list"""
+        subscribers = self.get_subscribers()
+        if not subscribers:
+            return list(self.config['search_terms'])
+        
+        terms = {}
+        for subscriber in subscribers:
+            for term in subscriber.get('search_terms') or self.config['search_terms']:
+                terms.setdefault(term.strip().lower(), term.strip())
+        return list(terms.values())
+    
+    def build_digests(self) -> List[Tuple[Dict, List[Paper]]]:
+        """Filter and rank the shared papers for each subscriber"""
+        ranking_config = self.config.get('ranking', {})
+        if not ranking_config.get('enabled', True):
+            return [(subscriber, list(self.papers)) for subscriber in self.get_subscribers()]
+        if not hasattr(self, 'reranker'):
+            self.reranker = create_reranker(ranking_config)
+        
+        # One index over the shared results serves every subscriber's query
+        index = BM25Index(self.papers, k1=ranking_config.get('k1', 1.5), b=ranking_config.get('b', 0.75),
+                          title_weight=ranking_config.get('title_weight', 2))
+        
+        digests = []
+        for subscriber in self.get_subscribers():
+            search_terms = subscriber.get('search_terms') or self.config['search_terms']
+            subscriber_config = dict(ranking_config, top_n=subscriber.get('top_n', ranking_config.get('top_n')))
+            papers = rank_papers(self.papers, search_terms, subscriber_config,
+                                 index=index, reranker=self.reranker)
+            digests.append((subscriber, papers))
+        return digests
+    
+    def rank_papers(self, papers: List[Paper], search_terms: List[str] = None) -> List[Paper]:
+        """Rank papers by BM25 relevance to the search terms and keep the top N"""
+        ranking_config = self.config.get('ranking', {})
+        if not ranking_config.get('enabled', True):
+            return papers
+        
+        if not hasattr(self, 'reranker'):
+            self.reranker = create_reranker(ranking_config)
+        
+        ranked = rank_papers(papers, search_terms or self.config['search_terms'],
+                             ranking_config, reranker=self.reranker)
+        logger.info(f"Ranked {len(papers)} papers, keeping {len(ranked)} most relevant")
+        return ranked
+    
+    def remove_duplicates(self, papers: List[Paper]) -> List[Paper]:
         """Remove duplicate papers based on title similarity"""
         unique_papers = []
         seen_titles = set()
         
         for paper in papers:
             # Normalize title for comparison
-            normalized_title = re.sub(r'[^\w\s]', '', paper['title'].lower())
+            normalized_title = re.sub(r'[^\w\s]', '', paper.title.lower())
             normalized_title = ' '.join(normalized_title.split())
             
             if normalized_title not in seen_titles:
@@ -236,87 +335,21 @@ class PaperFetcher:
         
         return unique_papers
     
+    def render_papers(self) -> Tuple[str, str]:
+        """Render (text, html) digests once and reuse them until self.papers changes"""
+        rendered_for, count, rendered = self._rendered
+        if rendered is None or rendered_for is not self.papers or count != len(self.papers):
+            rendered = render_digest(self.papers, self.config['days_back'])
+            self._rendered = (self.papers, len(self.papers), rendered)
+        return rendered
+    
     def format_papers_html(self) -> str:
         """Format papers as HTML for email"""
-        if not self.papers:
-            return "<p>No recent papers found.</p>"
-        
-        html = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                h1 {{ color: #333; }}
-                h2 {{ color: #666; margin-top: 30px; }}
-                .paper {{ margin-bottom: 25px; padding: 15px; border-left: 3px solid #007acc; background-color: #f9f9f9; }}
-                .title {{ font-weight: bold; font-size: 16px; color: #007acc; margin-bottom: 5px; }}
-                .authors {{ color: #666; margin-bottom: 5px; }}
-                .meta {{ color: #888; font-size: 12px; margin-bottom: 10px; }}
-                .summary {{ line-height: 1.4; }}
-                .url {{ margin-top: 10px; }}
-                .url a {{ color: #007acc; text-decoration: none; }}
-                .url a:hover {{ text-decoration: underline; }}
-            </style>
-        </head>
-        <body>
-            <h1>Recent Papers: Generative AI Recommendation Systems</h1>
-            <p>Found {len(self.papers)} papers from the last {self.config['days_back']} days</p>
-            <p>Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-        """
-        
-        for i, paper in enumerate(self.papers, 1):
-            authors_str = ', '.join(paper['authors'][:5])  # Limit to first 5 authors
-            if len(paper['authors']) > 5:
-                authors_str += ' et al.'
-            
-            summary = paper['summary'][:500] + '...' if len(paper['summary']) > 500 else paper['summary']
-            
-            html += f"""
-            <div class="paper">
-                <div class="title">{i}. {paper['title']}</div>
-                <div class="authors">Authors: {authors_str}</div>
-                <div class="meta">Published: {paper['published']} | Source: {paper['source']}</div>
-                <div class="summary">{summary}</div>
-                <div class="url"><a href="{paper['url']}" target="_blank">Read Paper</a></div>
-            </div>
-            """
-        
-        html += """
-        </body>
-        </html>
-        """
-        
-        return html
+        return self.render_papers()[1]
     
     def format_papers_text(self) -> str:
         """Format papers as plain text for email"""
-        if not self.papers:
-            return "No recent papers found."
-        
-        text = f"""Recent Papers: Generative AI Recommendation Systems
-Found {len(self.papers)} papers from the last {self.config['days_back']} days
-Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-"""
-        
-        for i, paper in enumerate(self.papers, 1):
-            authors_str = ', '.join(paper['authors'][:5])
-            if len(paper['authors']) > 5:
-                authors_str += ' et al.'
-            
-            summary = paper['summary'][:500] + '...' if len(paper['summary']) > 500 else paper['summary']
-            
-            text += f"""{i}. {paper['title']}
-Authors: {authors_str}
-Published: {paper['published']} | Source: {paper['source']}
-Summary: {summary}
-URL: {paper['url']}
-
-{'='*80}
-
-"""
-        
-        return text
+        return self.render_papers()[0]
     
     def start_local_smtp_server(self):
         """Start local SMTP server if configured"""
@@ -325,13 +358,19 @@ URL: {paper['url']}
             if not hasattr(self, 'smtp_server_manager'):
                 host = email_config.get('local_server_host', 'localhost')
                 port = email_config.get('local_server_port', 1025)
-                self.smtp_server_manager = SMTPServerManager(host, port)
+                engine = email_config.get('local_server_engine', 'asyncio')
+                options = {}
+                if engine == 'asyncio':
+                    options = {
+                        'max_connections': email_config.get('local_server_max_connections', 100),
+                        'idle_timeout': email_config.get('local_server_idle_timeout', 300)
+                    }
+                self.smtp_server_manager = SMTPServerManager(host, port, engine=engine, **options)
                 
             if not self.smtp_server_manager.is_running():
+                host, port = self.smtp_server_manager.host, self.smtp_server_manager.port
                 logger.info("Starting local SMTP server...")
-                print("Starting local SMTP server...")
                 success = self.smtp_server_manager.start()
-                print("Starting local SMTP server...----------")
                 if success:
                     logger.info(f"Local SMTP server started on {host}:{port}")
                     print(f"📧 Local email server started on {host}:{port}")
@@ -343,6 +382,41 @@ URL: {paper['url']}
             return True
         return True
     
+    def build_message(self, recipient: str, text_content: str, html_content: str,
+                      subject: str = DIGEST_TITLE) -> MIMEMultipart:
+        """Build the multipart (plain text + HTML) digest message"""
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = f"{subject} ({datetime.now().strftime('%Y-%m-%d')})"
+        msg['From'] = self.config['email']['sender_email']
+        msg['To'] = recipient
+        
+        # Attach parts
+        msg.attach(MIMEText(text_content, 'plain', 'utf-8'))
+        msg.attach(MIMEText(html_content, 'html', 'utf-8'))
+        return msg
+    
+    def get_transport(self) -> MailTransport:
+        """The SMTP transport shared by every message of this fetcher"""
+        if self.transport is None:
+            email_config = self.config['email']
+            self.transport = MailTransport(
+                email_config['smtp_server'],
+                email_config['smtp_port'],
+                username=email_config['sender_email'],
+                password=email_config['sender_password'],
+                # Only use TLS for external servers
+                use_tls=email_config.get('use_tls', True) and not email_config.get('use_local_server', False),
+                timeout=email_config.get('timeout', 60),
+                reconnect_attempts=email_config.get('reconnect_attempts', 2),
+                max_messages_per_connection=email_config.get('max_messages_per_connection')
+            )
+        return self.transport
+    
+    def close_transport(self):
+        """Close the shared SMTP connection, if open"""
+        if self.transport is not None:
+            self.transport.close()
+    
     def send_email(self, recipient_email: str = None) -> bool:
         """Send the paper list via email"""
         email_config = self.config['email']
@@ -358,34 +432,12 @@ URL: {paper['url']}
             return False
         
         try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = f"Recent Papers: Generative AI Recommendation Systems ({datetime.now().strftime('%Y-%m-%d')})"
-            msg['From'] = email_config['sender_email']
-            msg['To'] = recipient
-            
             # Create both plain text and HTML versions
-            text_content = self.format_papers_text()
-            html_content = self.format_papers_html()
+            text_content, html_content = self.render_papers()
+            msg = self.build_message(recipient, text_content, html_content)
             
-            # Attach parts
-            part1 = MIMEText(text_content, 'plain', 'utf-8')
-            part2 = MIMEText(html_content, 'html', 'utf-8')
-            
-            msg.attach(part1)
-            msg.attach(part2)
-            
-            # Send email
-            with smtplib.SMTP(email_config['smtp_server'], email_config['smtp_port']) as server:
-                # Only use TLS for external servers
-                if email_config.get('use_tls', True) and not email_config.get('use_local_server', False):
-                    server.starttls()
-                
-                # Only login if password is provided
-                if email_config['sender_password']:
-                    server.login(email_config['sender_email'], email_config['sender_password'])
-                
-                server.send_message(msg)
+            # Send email over the shared connection
+            self.get_transport().send(msg)
             
             logger.info(f"Email sent successfully to {recipient}")
             if email_config.get('use_local_server', False):
@@ -396,15 +448,62 @@ URL: {paper['url']}
             logger.error(f"Error sending email: {e}")
             return False
     
-    def save_to_file(self, filename: str = None) -> str:
-        """Save papers to a file"""
+    def send_digests(self, digests: List[Tuple[Dict, List[Paper]]] = None) -> Dict[str, bool]:
+        """Send every subscriber their own digest over the shared SMTP connection"""
+        email_config = self.config['email']
+        if digests is None:
+            digests = self.build_digests()
+        results = {subscriber['email']: False for subscriber, _ in digests}
+        
+        # Start local server if needed
+        if email_config.get('use_local_server', False):
+            if not self.start_local_smtp_server():
+                return results
+        
+        if not email_config['sender_email']:
+            logger.error("Email configuration incomplete")
+            return results
+        
+        transport = self.get_transport()
+        try:
+            for subscriber, papers in digests:
+                recipient = subscriber['email']
+                if not papers:
+                    logger.info(f"No relevant papers for {recipient}, skipping digest")
+                    results[recipient] = True
+                    continue
+                
+                text_content, html_content = render_digest(
+                    papers, self.config['days_back'], title=subscriber.get('title', DIGEST_TITLE))
+                msg = self.build_message(recipient, text_content, html_content,
+                                         subject=subscriber.get('title', DIGEST_TITLE))
+                try:
+                    transport.send(msg)
+                    results[recipient] = True
+                    logger.info(f"Digest with {len(papers)} papers sent to {recipient}")
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                    logger.error(f"Could not send digest to {recipient}: {e}")
+        except Exception as e:
+            logger.error(f"Error sending digests: {e}")
+        
+        sent = sum(results.values())
+        logger.info(f"Sent {sent}/{len(results)} digests")
+        return results
+    
+    def save_to_file(self, filename: str = None, papers: List[Paper] = None) -> str:
+        """Save papers (the fetched list by default) to a file"""
         if not filename:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f"generative_ai_papers_{timestamp}.html"
         
+        if papers is None:
+            html_content = self.format_papers_html()
+        else:
+            html_content = render_digest(papers, self.config['days_back'])[1]
+        
         try:
             with open(filename, 'w', encoding='utf-8') as f:
-                f.write(self.format_papers_html())
+                f.write(html_content)
             
             logger.info(f"Papers saved to {filename}")
             return filename
@@ -419,33 +518,87 @@ def main():
     parser.add_argument('--email', '-e', help='Recipient email address')
     parser.add_argument('--save-only', '-s', action='store_true', help='Save to file only, do not send email')
     parser.add_argument('--output', '-o', help='Output filename')
+    parser.add_argument('--daemon', '-d', action='store_true', help='Run as a long-running scheduler')
+    parser.add_argument('--schedule', action='append',
+                        help='Cron expression for daemon runs, e.g. "0 9 * * 1-5" (repeatable)')
+    parser.add_argument('--run-now', action='store_true', help='In daemon mode, run once immediately')
+    parser.add_argument('--download-pdfs', action='store_true', help='Download full-text PDFs of fetched papers')
+    
+    subparsers = parser.add_subparsers(dest='command')
+    search_parser = subparsers.add_parser('search', help='Search the local paper archive index')
+    search_parser.add_argument('query', help='Free-text query')
+    search_parser.add_argument('--top-k', '-k', type=int, default=10, help='Number of results')
+    search_parser.add_argument('--since', help='Only papers published on or after YYYY-MM-DD')
+    search_parser.add_argument('--method', choices=['auto', 'flat', 'ivf'], default='auto',
+                               help='Brute force (flat) or IVF search')
+    search_parser.add_argument('--nprobe', type=int, help='IVF lists to scan')
     
     args = parser.parse_args()
     
+    if args.command == 'search':
+        fetcher = PaperFetcher(args.config)
+        start = time.perf_counter()
+        results = fetcher.search_archive(args.query, args.top_k, args.since, args.method, args.nprobe)
+        elapsed = (time.perf_counter() - start) * 1000
+        for i, (paper, score) in enumerate(results, 1):
+            print(f"{i}. [{score:.3f}] {paper.title}")
+            print(f"   {paper.published} | {paper.source} | {paper.url}")
+        print(f"{len(results)} results from {fetcher.get_index().count} archived papers in {elapsed:.1f} ms")
+        return
+    
+    if args.daemon:
+        from scheduler import run_daemon
+        run_daemon(args.config, args.schedule, args.run_now)
+        return
+    
     # Initialize fetcher
     fetcher = PaperFetcher(args.config)
+    try:
+        # Fetch papers
+        papers = fetcher.fetch_papers()
     
-    # Fetch papers
-    papers = fetcher.fetch_papers()
+        if not papers:
+            logger.warning("No papers found")
+            return
     
-    if not papers:
-        logger.warning("No papers found")
-        return
+        # Archive full texts
+        if args.download_pdfs or fetcher.config.get('pdf_download', {}).get('enabled', False):
+            downloaded = fetcher.download_pdfs()
+            print(f"PDFs archived: {len(downloaded)}/{len(papers)}")
     
-    # Save to file
-    if args.save_only or args.output:
-        filename = fetcher.save_to_file(args.output)
-        print(f"Papers saved to: {filename}")
-    else:
-        # Send email
-        success = fetcher.send_email(args.email)
-        if success:
-            print("Email sent successfully!")
+        # Save to file
+        if args.save_only or args.output:
+            filename = fetcher.save_to_file(args.output)
+            print(f"Papers saved to: {filename}")
+        elif fetcher.get_subscribers() and not args.email:
+            # Send one digest per subscriber from the shared results
+            digests = fetcher.build_digests()
+            results = fetcher.send_digests(digests)
+            for subscriber, subscriber_papers in digests:
+                recipient = subscriber['email']
+                if results[recipient]:
+                    continue
+                # Save failed digests to file as backup
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                safe_name = re.sub(r'[^\w.-]', '_', recipient)
+                filename = fetcher.save_to_file(f"digest_{safe_name}_{timestamp}.html", subscriber_papers)
+                print(f"Failed to send digest to {recipient}, saved to backup file: {filename}")
+            print(f"Digests sent: {sum(results.values())}/{len(results)}")
         else:
-            print("Failed to send email. Check configuration and try again.")
-            # Save to file as backup
-            filename = fetcher.save_to_file()
-            print(f"Papers saved to backup file: {filename}")
+            if fetcher.get_subscribers():
+                # fetch_papers leaves ranking to the digests when subscribers exist
+                fetcher.papers = fetcher.rank_papers(fetcher.papers)
+            # Send email
+            success = fetcher.send_email(args.email)
+            if success:
+                print("Email sent successfully!")
+            else:
+                print("Failed to send email. Check configuration and try again.")
+                # Save to file as backup
+                filename = fetcher.save_to_file()
+                print(f"Papers saved to backup file: {filename}")
+    finally:
+        fetcher.close_transport()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Local semantic search index over the accumulated paper archive
+Title + abstract embeddings are appended incrementally to a memory-mapped
+float32 matrix and searched top-k either brute force or through an IVF
+(inverted file) partition, so archive queries never touch the source APIs
+"""
+
+import json
+import logging
+import os
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ranking import tokenize
+from sources import Paper
+
+logger = logging.getLogger(__name__)
+
+META_FILE = 'meta.json'
+PAPERS_FILE = 'papers.jsonl'
+EMBEDDINGS_FILE = 'embeddings.f32'
+DATES_FILE = 'dates.i32'
+OFFSETS_FILE = 'offsets.i64'
+CENTROIDS_FILE = 'ivf_centroids.f32'
+ASSIGNMENTS_FILE = 'ivf_lists.i32'
+
+# Rows scored per matrix product, bounding memory for large archives
+SEARCH_BLOCK_ROWS = 65536
+
+
+def paper_text(paper: Paper) -> str:
+    return f"{paper.title}\n{paper.summary}"
+
+
+def date_to_int(published: str) -> int:
+    """'2025-09-09' -> 20250909 (0 when unknown)"""
+    digits = (published or '').replace('-', '')[:8]
+    return int(digits) if len(digits) == 8 and digits.isdigit() else 0
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class HashingEmbedder:
+    """Offline embedder: signed feature hashing of word unigrams and bigrams"""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                h = zlib.crc32(feature.encode('utf-8'))
+                matrix[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return normalize_rows(matrix)
+
+
+class APIEmbedder:
+    """Embedder backed by an OpenAI-compatible embeddings API (SiliconFlow by default)"""
+
+    def __init__(self, model: str = "BAAI/bge-m3", base_url: str = "https://api.siliconflow.cn/v1",
+                 api_key_env: str = "SILICONFLOW_API_KEY", batch_size: int = 32):
+        from openai import OpenAI
+
+        self.name = model
+        self.model = model
+        self.batch_size = batch_size
+        self.client = OpenAI(api_key=os.getenv(api_key_env, ""), base_url=base_url)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            response = self.client.embeddings.create(model=self.model, input=texts[start:start + self.batch_size])
+            vectors.extend(item.embedding for item in response.data)
+        return normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+
+def create_embedder(config: Dict):
+    """Build the embedder from the archive_index config ("api" or "hashing")"""
+    if config.get('embedder', 'hashing') == 'api':
+        try:
+            return APIEmbedder(
+                model=config.get('model', 'BAAI/bge-m3'),
+                base_url=config.get('base_url', 'https://api.siliconflow.cn/v1'),
+                api_key_env=config.get('api_key_env', 'SILICONFLOW_API_KEY'),
+                batch_size=config.get('batch_size', 32)
+            )
+        except ImportError:
+            logger.warning("openai package not installed, falling back to the hashing embedder")
+    return HashingEmbedder(config.get('dim', 256))
+
+
+class PaperIndex:
+    """Append-only vector index of archived papers
+
+    Row i of embeddings.f32 is the unit-normalized embedding of line i of
+    papers.jsonl; dates.i32 and offsets.i64 hold its publication date and
+    byte offset so searches never parse the whole archive. meta.json is
+    written last on every append and its count is the source of truth, so
+    a crash mid-append only leaves bytes that the next append truncates.
+    """
+
+    def __init__(self, index_dir: str = "paper_index", embedder=None, nlist: int = None,
+                 nprobe: int = 8, ivf_min_papers: int = 20000):
+        self.index_dir = index_dir
+        self.embedder = embedder or HashingEmbedder()
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ivf_min_papers = ivf_min_papers
+        os.makedirs(index_dir, exist_ok=True)
+        self.meta = self.load_meta()
+        if self.meta.get('embedder', self.embedder.name) != self.embedder.name:
+            raise ValueError(f"Index at {index_dir} was built with {self.meta['embedder']}, "
+                             f"not {self.embedder.name}; use a separate directory")
+        self._ids = None
+        self._lists = None
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def load_meta(self) -> Dict:
+        try:
+            with open(self.path(META_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'count': 0}
+
+    def save_meta(self):
+        with open(self.path(META_FILE) + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(self.path(META_FILE) + '.tmp', self.path(META_FILE))
+
+    @property
+    def count(self) -> int:
+        return self.meta['count']
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self.meta.get('dim')
+
+    def _array(self, name: str, dtype, shape) -> np.ndarray:
+        if not shape[0]:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.path(name), dtype=dtype, mode='r', shape=shape)
+
+    def embeddings(self) -> np.ndarray:
+        return self._array(EMBEDDINGS_FILE, np.float32, (self.count, self.dim or 0))
+
+    def dates(self) -> np.ndarray:
+        return self._array(DATES_FILE, np.int32, (self.count,))
+
+    def offsets(self) -> np.ndarray:
+        return self._array(OFFSETS_FILE, np.int64, (self.count,))
+
+    def ids(self) -> set:
+        """Ids of indexed papers (read from the archive on first use)"""
+        if self._ids is None:
+            self._ids = set()
+            if self.count:
+                with open(self.path(PAPERS_FILE), 'rb') as f:
+                    for offset in self.offsets():
+                        f.seek(int(offset))
+                        self._ids.add(json.loads(f.readline())['id'])
+        return self._ids
+
+    def _truncate(self, name: str, size: int):
+        """Drop bytes left behind by an interrupted append"""
+        path = self.path(name)
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            os.truncate(path, size)
+
+    def add(self, papers: List[Paper]) -> int:
+        """Embed and append papers that are not indexed yet; returns how many were added"""
+        ids = self.ids()
+        new = list({p.id: p for p in papers if p.id not in ids}.values())
+        if not new:
+            return 0
+
+        vectors = self.embedder.embed([paper_text(p) for p in new])
+        if self.dim is None:
+            self.meta.update(dim=int(vectors.shape[1]), embedder=self.embedder.name)
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+
+        n = self.count
+        papers_size = 0
+        if n:
+            last = self.offsets()[-1]
+            with open(self.path(PAPERS_FILE), 'rb') as f:
+                f.seek(int(last))
+                papers_size = int(last) + len(f.readline())
+        self._truncate(PAPERS_FILE, papers_size)
+        self._truncate(EMBEDDINGS_FILE, n * self.dim * 4)
+        self._truncate(DATES_FILE, n * 4)
+        self._truncate(OFFSETS_FILE, n * 8)
+
+        offsets = []
+        with open(self.path(PAPERS_FILE), 'ab') as f:
+            for paper in new:
+                offsets.append(f.tell())
+                f.write(json.dumps(paper.to_dict(), ensure_ascii=False).encode('utf-8') + b'\n')
+        with open(self.path(EMBEDDINGS_FILE), 'ab') as f:
+            f.write(vectors.tobytes())
+        with open(self.path(DATES_FILE), 'ab') as f:
+            f.write(np.array([date_to_int(p.published) for p in new], dtype=np.int32).tobytes())
+        with open(self.path(OFFSETS_FILE), 'ab') as f:
+            f.write(np.array(offsets, dtype=np.int64).tobytes())
+
+        ivf = self.meta.get('ivf')
+        if ivf:
+            self._truncate(ASSIGNMENTS_FILE, n * 4)
+            with open(self.path(ASSIGNMENTS_FILE), 'ab') as f:
+                f.write(self.assign(vectors).tobytes())
+            self._lists = None
+
+        self.meta['count'] = n + len(new)
+        self.save_meta()
+        ids.update(p.id for p in new)
+        logger.info(f"Indexed {len(new)} new papers ({self.count} total)")
+
+        # (Re)partition once the archive is big enough, and again after it quadruples
+        if self.count >= self.ivf_min_papers and (not ivf or self.count >= 4 * ivf['trained_count']):
+            self.train_ivf(self.nlist)
+        return len(new)
+
+    def centroids(self) -> np.ndarray:
+        return self._array(CENTROIDS_FILE, np.float32, (self.meta['ivf']['nlist'], self.dim))
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Nearest IVF list for each row"""
+        centroids = np.asarray(self.centroids())
+        return np.concatenate([
+            np.argmax(vectors[start:start + SEARCH_BLOCK_ROWS] @ centroids.T, axis=1).astype(np.int32)
+            for start in range(0, len(vectors), SEARCH_BLOCK_ROWS)
+        ]) if len(vectors) else np.zeros(0, dtype=np.int32)
+
+    def train_ivf(self, nlist: int = None, iterations: int = 10, seed: int = 0):
+        """Partition the archive with spherical k-means on a sample of rows"""
+        if not self.count:
+            return
+        nlist = min(nlist or max(1, int(np.sqrt(self.count))), self.count)
+        rng = np.random.default_rng(seed)
+        embeddings = self.embeddings()
+        sample_rows = np.sort(rng.choice(self.count, size=min(self.count, nlist * 64), replace=False))
+        sample = np.asarray(embeddings[sample_rows])
+
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        with open(self.path(CENTROIDS_FILE) + '.tmp', 'wb') as f:
+            f.write(centroids.astype(np.float32).tobytes())
+        os.replace(self.path(CENTROIDS_FILE) + '.tmp', self.path(CENTROIDS_FILE))
+        self.meta['ivf'] = {'nlist': nlist, 'trained_count': self.count}
+        assignments = self.assign(embeddings)
+        with open(self.path(ASSIGNMENTS_FILE) + '.tmp', 'wb') as f:
+            f.write(assignments.tobytes())
+        os.replace(self.path(ASSIGNMENTS_FILE) + '.tmp', self.path(ASSIGNMENTS_FILE))
+        self.save_meta()
+        self._lists = None
+        logger.info(f"Trained IVF index with {nlist} lists over {self.count} papers")
+
+    def inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows sorted by list, list boundaries) built once per process"""
+        if self._lists is None:
+            assignments = self._array(ASSIGNMENTS_FILE, np.int32, (self.count,))
+            order = np.argsort(assignments, kind='stable')
+            bounds = np.searchsorted(assignments[order], np.arange(self.meta['ivf']['nlist'] + 1))
+            self._lists = (order, bounds)
+        return self._lists
+
+    def search(self, query: str, k: int = 10, since: str = None, method: str = 'auto',
+               nprobe: int = None) -> List[Tuple[Paper, float]]:
+        """Top-k archived papers by cosine similarity to the query
+
+        method is 'flat' (exact brute force), 'ivf' (scan the nprobe
+        closest lists) or 'auto' (IVF when the index has been partitioned).
+        since ('YYYY-MM-DD') keeps only papers published on or after it.
+        """
+        if not self.count:
+            return []
+        if method == 'auto':
+            method = 'ivf' if self.meta.get('ivf') else 'flat'
+        if method == 'ivf' and not self.meta.get('ivf'):
+            raise ValueError("IVF search requested but the index has not been partitioned")
+
+        q = self.embedder.embed([query])[0]
+        embeddings = self.embeddings()
+        min_date = date_to_int(since) if since else 0
+
+        if method == 'ivf':
+            probes = np.argsort(-(self.centroids() @ q))[:nprobe or self.nprobe]
+            order, bounds = self.inverted_lists()
+            rows = np.sort(np.concatenate([order[bounds[c]:bounds[c + 1]] for c in probes]))
+            if min_date:
+                rows = rows[self.dates()[rows] >= min_date]
+            scores = embeddings[rows] @ q if len(rows) else np.zeros(0, dtype=np.float32)
+        else:
+            rows = None
+            scores = np.concatenate([embeddings[start:start + SEARCH_BLOCK_ROWS] @ q
+                                     for start in range(0, self.count, SEARCH_BLOCK_ROWS)])
+            if min_date:
+                scores[self.dates() < min_date] = -np.inf
+
+        k = min(k, len(scores))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+        return [(paper, float(scores[i])) for paper, i in
+                zip(self.load_papers(top if rows is None else rows[top]), top)]
+
+    def load_papers(self, rows: np.ndarray) -> List[Paper]:
+        offsets = self.offsets()
+        papers = []
+        with open(self.path(PAPERS_FILE), 'rb') as f:
+            for row in rows:
+                f.seek(int(offsets[row]))
+                papers.append(Paper.from_dict(json.loads(f.readline())))
+        return papers
+
+
+def open_index(config: Dict) -> PaperIndex:
+    """Open the archive index described by the archive_index config section"""
+    return PaperIndex(
+        config.get('directory', 'paper_index'),
+        create_embedder(config),
+        nlist=config.get('nlist'),
+        nprobe=config.get('nprobe', 8),
+        ivf_min_papers=config.get('ivf_min_papers', 20000)
+    )
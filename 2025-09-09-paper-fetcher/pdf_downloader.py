@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Full-text PDF download stage for the paper fetcher
+Streams PDFs to disk in chunks on a bounded worker pool, resumes partial
+downloads with HTTP Range requests, deduplicates by content hash and spaces
+requests per host with the fetcher's rate limiter
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from sources import HostRateLimiter, Paper
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = 'index.json'
+
+
+class PDFDownloader:
+    """Download paper PDFs into a directory with a content-hash index
+
+    index.json maps paper ids to their file and SHA-256, and hashes to the
+    first file with that content, so re-runs skip finished papers and the
+    same PDF served under two ids is stored once.
+    """
+
+    def __init__(self, session: requests.Session, rate_limiter: HostRateLimiter,
+                 download_dir: str = "papers", max_workers: int = 4, chunk_size: int = 64 * 1024,
+                 timeout: int = 60, max_retries: int = 2, min_interval: float = None):
+        self.session = session
+        self.rate_limiter = rate_limiter
+        self.download_dir = download_dir
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.failed: Dict[str, str] = {}
+        os.makedirs(download_dir, exist_ok=True)
+        self.index = self.load_index()
+
+    def load_index(self) -> Dict:
+        try:
+            with open(os.path.join(self.download_dir, INDEX_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'papers': {}, 'hashes': {}}
+
+    def save_index(self):
+        """Persist the index atomically (caller holds the lock)"""
+        path = os.path.join(self.download_dir, INDEX_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def filename_for(paper: Paper) -> str:
+        """Filesystem-safe name derived from the paper id"""
+        paper_id = paper.id.rsplit('/abs/', 1)[-1] or paper.title
+        return re.sub(r'[^\w.-]', '_', paper_id)[:150] + '.pdf'
+
+    def is_done(self, paper: Paper) -> bool:
+        with self.lock:
+            entry = self.index['papers'].get(paper.id)
+        return bool(entry) and os.path.exists(os.path.join(self.download_dir, entry['path']))
+
+    def download_all(self, papers: List[Paper]) -> Dict[str, str]:
+        """Download every paper with a PDF link; returns paper id -> file path"""
+        todo = [p for p in papers if p.pdf_url and not self.is_done(p)]
+        self.failed = {}
+        if self.min_interval is not None:
+            for host in {urlparse(p.pdf_url).netloc for p in todo}:
+                self.rate_limiter.set_interval(host, self.min_interval)
+
+        logger.info(f"Downloading {len(todo)} PDFs ({len(papers) - len(todo)} skipped) "
+                    f"with {self.max_workers} workers")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(self.download, todo))
+        if self.failed:
+            logger.warning(f"{len(self.failed)} PDFs failed to download: {', '.join(sorted(self.failed))}")
+
+        with self.lock:
+            return {p.id: os.path.join(self.download_dir, self.index['papers'][p.id]['path'])
+                    for p in papers if p.id in self.index['papers']}
+
+    def download(self, paper: Paper) -> Optional[str]:
+        """Download one PDF, retrying transient failures; returns its path
+
+        A connection dropped mid-body is retried from the .part file with a
+        Range request. A paper that still fails is recorded in self.failed
+        instead of aborting the batch.
+        """
+        filename = self.filename_for(paper)
+        for attempt in range(self.max_retries + 1):
+            try:
+                sha256 = self.fetch_to_part(paper.pdf_url, os.path.join(self.download_dir, filename + '.part'))
+                if sha256 is None:
+                    return None
+                return self.finish(paper, filename, sha256)
+            except (requests.RequestException, OSError) as e:
+                status = getattr(getattr(e, 'response', None), 'status_code', None)
+                if attempt >= self.max_retries or (status and status < 500 and status != 429):
+                    logger.error(f"Failed to download {paper.pdf_url}: {e}")
+                    with self.lock:
+                        self.failed[paper.id] = str(e)
+                    return None
+                delay = 2 ** attempt
+                logger.warning(f"Download of {paper.pdf_url} failed ({e}), retrying in {delay}s")
+                time.sleep(delay)
+        return None
+
+    def fetch_to_part(self, url: str, part_path: str) -> Optional[str]:
+        """Stream url into part_path, resuming from its current size
+
+        Returns the SHA-256 of the complete file, or None if the response
+        is not a PDF.
+        """
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+        self.rate_limiter.wait(url)
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416 and offset:
+                # Nothing left to fetch: the partial file is already complete
+                return self.hash_file(part_path)
+            response.raise_for_status()
+
+            if response.status_code == 206 and offset:
+                mode = 'ab'
+                digest = self.hash_file(part_path, as_digest=True)
+            else:
+                # Server ignored the Range header: start over
+                mode = 'wb'
+                digest = hashlib.sha256()
+                offset = 0
+
+            chunks = response.iter_content(chunk_size=self.chunk_size)
+            with open(part_path, mode) as f:
+                for chunk in chunks:
+                    if offset == 0 and f.tell() == 0 and not chunk.startswith(b'%PDF'):
+                        logger.warning(f"Not a PDF, skipping: {url}")
+                        break
+                    f.write(chunk)
+                    digest.update(chunk)
+                else:
+                    return digest.hexdigest()
+
+        os.remove(part_path)
+        return None
+
+    def hash_file(self, path: str, as_digest: bool = False):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(self.chunk_size), b''):
+                digest.update(block)
+        return digest if as_digest else digest.hexdigest()
+
+    def finish(self, paper: Paper, filename: str, sha256: str) -> str:
+        """Move a finished download into place, or drop it if the content is known"""
+        part_path = os.path.join(self.download_dir, filename + '.part')
+        with self.lock:
+            existing = self.index['hashes'].get(sha256)
+            if existing and os.path.exists(os.path.join(self.download_dir, existing)):
+                os.remove(part_path)
+                stored = existing
+                logger.info(f"Duplicate PDF for {paper.id}, reusing {existing}")
+            else:
+                os.replace(part_path, os.path.join(self.download_dir, filename))
+                self.index['hashes'][sha256] = filename
+                stored = filename
+                logger.info(f"Downloaded {filename}")
+            self.index['papers'][paper.id] = {
+                'path': stored,
+                'sha256': sha256,
+                'url': paper.pdf_url,
+                'title': paper.title
+            }
+            self.save_index()
+        return os.path.join(self.download_dir, stored)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Relevance ranking for fetched papers
+Scores papers against the configured search terms with BM25 over title and
+abstract (in-memory inverted index), with an optional embedding re-rank of
+the top candidates
+"""
+
+import logging
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from dataclasses import replace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sources import Paper
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'\w+')
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in into is it its of on or that
+the their this to via was we were which with based using towards
+""".split())
+
+
+def normalize_token(token: str) -> str:
+    """Fold simple plurals so 'LLMs' matches 'LLM' and 'systems' matches 'system'"""
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, plural-folded word tokens without stopwords"""
+    return [normalize_token(t) for t in TOKEN_PATTERN.findall((text or '').lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over an in-memory inverted index of title and abstract"""
+
+    def __init__(self, papers: Sequence[Paper], k1: float = 1.5, b: float = 0.75, title_weight: int = 2):
+        self.k1 = k1
+        self.b = b
+        self.num_docs = len(papers)
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+
+        for doc_id, paper in enumerate(papers):
+            # Title tokens are repeated to weight them above the abstract
+            tokens = tokenize(paper.title) * title_weight + tokenize(paper.summary)
+            self.doc_lengths.append(len(tokens))
+            for token, tf in Counter(tokens).items():
+                self.postings[token].append((doc_id, tf))
+
+        self.avg_doc_length = (sum(self.doc_lengths) / self.num_docs) if self.num_docs else 0.0
+
+    def idf(self, token: str) -> float:
+        df = len(self.postings.get(token, ()))
+        return math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+
+    def score(self, query: str) -> List[float]:
+        """BM25 score of every document for one query string"""
+        scores = [0.0] * self.num_docs
+        if not self.num_docs:
+            return scores
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = self.idf(token)
+            for doc_id, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_doc_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def score_queries(self, queries: Sequence[str]) -> List[float]:
+        """Sum of BM25 scores over several queries (one per search term)"""
+        totals = [0.0] * self.num_docs
+        for query in queries:
+            for doc_id, value in enumerate(self.score(query)):
+                totals[doc_id] += value
+        return totals
+
+
+class EmbeddingReranker:
+    """Re-rank BM25 candidates by embedding similarity to the search terms
+    using an OpenAI-compatible embeddings API (SiliconFlow by default)"""
+
+    def __init__(self, model: str = "BAAI/bge-m3", base_url: str = "https://api.siliconflow.cn/v1",
+                 api_key_env: str = "SILICONFLOW_API_KEY", weight: float = 0.5):
+        from openai import OpenAI
+
+        self.model = model
+        self.weight = weight
+        self.client = OpenAI(api_key=os.getenv(api_key_env, ""), base_url=base_url)
+        self._cache: Dict[str, List[float]] = {}
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in one batched call, reusing previously seen texts"""
+        missing = [t for t in dict.fromkeys(texts) if t not in self._cache]
+        if missing:
+            response = self.client.embeddings.create(model=self.model, input=missing)
+            for text, item in zip(missing, response.data):
+                self._cache[text] = self._normalize(item.embedding)
+        return [self._cache[t] for t in texts]
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> List[float]:
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def rerank(self, candidates: List[Tuple[Paper, float]], queries: Sequence[str]) -> List[Tuple[Paper, float]]:
+        """Blend normalized BM25 with the best cosine similarity to any query"""
+        if not candidates:
+            return candidates
+        query_vectors = self.embed(list(queries))
+        doc_vectors = self.embed([f"{p.title}\n{p.summary}" for p, _ in candidates])
+        max_bm25 = max(score for _, score in candidates) or 1.0
+
+        reranked = []
+        for (paper, bm25), doc_vector in zip(candidates, doc_vectors):
+            similarity = max(sum(a * b for a, b in zip(doc_vector, q)) for q in query_vectors)
+            reranked.append((paper, (1 - self.weight) * bm25 / max_bm25 + self.weight * similarity))
+        reranked.sort(key=lambda item: item[1], reverse=True)
+        return reranked
+
+
+def create_reranker(config: Dict) -> Optional[EmbeddingReranker]:
+    """Build the optional embedding re-ranker from the ranking config"""
+    rerank_config = config.get('embedding_rerank', {})
+    if not rerank_config.get('enabled', False):
+        return None
+    try:
+        return EmbeddingReranker(
+            model=rerank_config.get('model', 'BAAI/bge-m3'),
+            base_url=rerank_config.get('base_url', 'https://api.siliconflow.cn/v1'),
+            api_key_env=rerank_config.get('api_key_env', 'SILICONFLOW_API_KEY'),
+            weight=rerank_config.get('weight', 0.5)
+        )
+    except ImportError:
+        logger.warning("openai package not installed, skipping embedding re-rank")
+        return None
+
+
+def rank_papers(papers: List[Paper], queries: Sequence[str], config: Dict,
+                index: BM25Index = None, reranker: EmbeddingReranker = None) -> List[Paper]:
+    """Score papers against the queries and return the top-N most relevant
+
+    Returns copies of the papers with `relevance` set; the input records are
+    not modified. A prebuilt index can be passed to score several query sets against the
+    same papers without re-indexing.
+    """
+    if index is None:
+        index = BM25Index(papers, k1=config.get('k1', 1.5), b=config.get('b', 0.75),
+                          title_weight=config.get('title_weight', 2))
+
+    min_score = config.get('min_score', 0.0)
+    scored = [(paper, score) for paper, score in zip(papers, index.score_queries(queries))
+              if score > min_score]
+    # Stable sort keeps the newest-first order among equal scores
+    scored.sort(key=lambda item: item[1], reverse=True)
+
+    if reranker is not None and scored:
+        candidates = config.get('embedding_rerank', {}).get('candidates', 50)
+        try:
+            head = reranker.rerank(scored[:candidates], queries)
+        except Exception as e:
+            logger.warning(f"Embedding re-rank failed, keeping BM25 order: {e}")
+        else:
+            # Put the tail on the blended scale (BM25 part only, no similarity)
+            # and keep it below the re-ranked head
+            max_bm25 = scored[0][1] or 1.0
+            floor = min(score for _, score in head)
+            tail = [(paper, min(floor, (1 - reranker.weight) * score / max_bm25))
+                    for paper, score in scored[candidates:]]
+            scored = head + tail
+
+    top_n = config.get('top_n')
+    if top_n:
+        scored = scored[:top_n]
+
+    # Copies, so ranking the shared papers for one digest doesn't change another's scores
+    return [replace(paper, relevance=round(score, 4)) for paper, score in scored]
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Record-and-replay HTTP stand-in for the paper sources
+Records real arXiv / Semantic Scholar responses into a fixtures directory and
+serves them back from a local HTTP server, with configurable latency and
+error rate, so the fetcher can be tested and benchmarked offline.
+It can also synthesize responses with any number of papers.
+"""
+
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qsl, urlsplit
+from xml.sax.saxutils import escape
+
+from http_cache import HTTPCache
+from sources import SOURCE_ADAPTERS, Paper
+
+logger = logging.getLogger(__name__)
+
+# Sources that talk HTTP and can be replayed, keyed by URL prefix on the stand-in
+REPLAY_SOURCES = ('arxiv', 'semantic_scholar')
+
+WORDS = ("generative recommendation retrieval language model llm transformer user item "
+         "sequential ranking diffusion graph contrastive embedding semantic tokenizer").split()
+
+
+def make_papers(count: int, seed: int = 0, source: str = 'arXiv', prefix: str = '') -> List[Paper]:
+    """Generate synthetic, recent papers with deterministic content"""
+    rng = random.Random(seed)
+    today = datetime.now().strftime('%Y-%m-%d')
+    papers = []
+    for i in range(count):
+        title_words = rng.sample(WORDS, 6)
+        papers.append(Paper(
+            id=f"{prefix}{seed}-{i}",
+            title=f"{' '.join(title_words).title()} {prefix}{seed}-{i}",
+            authors=[f"Author {rng.randint(1, 500)}" for _ in range(rng.randint(1, 8))],
+            summary=' '.join(rng.choice(WORDS) for _ in range(rng.randint(80, 200))),
+            published=today,
+            url=f"http://example.org/abs/{prefix}{seed}-{i}",
+            source=source
+        ))
+    return papers
+
+
+def make_arxiv_feed(papers: List[Paper]) -> bytes:
+    """Render papers as an arXiv Atom feed"""
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">']
+    for p in papers:
+        authors = ''.join(f"<author><name>{escape(a)}</name></author>" for a in p.authors)
+        parts.append(
+            f"<entry><id>{escape(p.url)}</id><title>{escape(p.title)}</title>"
+            f"<summary>{escape(p.summary)}</summary>{authors}"
+            f"<published>{p.published}T00:00:00Z</published>"
+            f'<link title="pdf" href="{escape(p.url.replace("/abs/", "/pdf/"))}"/></entry>')
+    parts.append('</feed>')
+    return ''.join(parts).encode('utf-8')
+
+
+def make_semantic_scholar_json(papers: List[Paper]) -> bytes:
+    """Render papers as a Semantic Scholar search response"""
+    data = [{
+        'paperId': p.id,
+        'title': p.title,
+        'authors': [{'name': a} for a in p.authors],
+        'abstract': p.summary,
+        'publicationDate': p.published,
+        'url': p.url
+    } for p in papers]
+    return json.dumps({'total': len(data), 'data': data}).encode('utf-8')
+
+
+class ReplayServer:
+    """Local HTTP stand-in serving recorded (or synthetic) source responses
+
+    Requests to /<source>?<params> are mapped back to the real upstream URL
+    and looked up with the same key the HTTP cache uses, so fixtures
+    recorded through HTTPCache replay unchanged.
+    """
+
+    def __init__(self, fixtures_dir: str = "fixtures", host: str = 'localhost', port: int = 0,
+                 latency: float = 0.0, latency_jitter: float = 0.0, error_rate: float = 0.0,
+                 synthetic_papers: int = None, seed: int = 0):
+        self.store = HTTPCache(fixtures_dir, ttl_seconds=float('inf'))
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.synthetic_papers = synthetic_papers
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.upstreams = {key: SOURCE_ADAPTERS[key].base_url for key in REPLAY_SOURCES}
+        self.stats = {'requests': 0, 'hits': 0, 'misses': 0, 'errors': 0}
+        self.lock = threading.Lock()
+        self.httpd = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.httpd.server_port}"
+
+    def sources_config(self, **overrides) -> Dict:
+        """Config for the \"sources\" section that points adapters at this server"""
+        return {key: dict({'base_url': f"{self.base_url}/{key}", 'min_interval': 0,
+                           'retry_backoff_seconds': 0.05}, **overrides)
+                for key in REPLAY_SOURCES}
+
+    def respond(self, source: str, params: Dict) -> tuple:
+        """Return (status, content_type, body) for a request"""
+        if self.synthetic_papers is not None:
+            limit = int(params.get('max_results') or params.get('limit') or self.synthetic_papers)
+            query = params.get('search_query') or params.get('query') or ''
+            seed = self.seed + sum(ord(c) for c in query)
+            if source == 'arxiv':
+                papers = make_papers(min(limit, self.synthetic_papers), seed, 'arXiv')
+                return 200, 'application/atom+xml', make_arxiv_feed(papers)
+            papers = make_papers(min(limit, self.synthetic_papers), seed, 'Semantic Scholar')
+            return 200, 'application/json', make_semantic_scholar_json(papers)
+
+        entry = self.store.get(HTTPCache.make_key(self.upstreams[source], params))
+        if entry is None:
+            with self.lock:
+                self.stats['misses'] += 1
+            return 404, 'text/plain', b'No recorded fixture for this request'
+        with self.lock:
+            self.stats['hits'] += 1
+        content_type = entry.get('headers', {}).get('Content-Type', 'application/octet-stream')
+        return entry.get('status_code', 200), content_type, entry['body']
+
+    def start(self) -> 'ReplayServer':
+        replay = self
+
+        class ReplayHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                source = parts.path.strip('/')
+                with replay.lock:
+                    replay.stats['requests'] += 1
+                    delay = replay.latency + replay.random.uniform(0, replay.latency_jitter)
+                    fail = replay.random.random() < replay.error_rate
+                if delay:
+                    time.sleep(delay)
+
+                if source not in replay.upstreams:
+                    status, content_type, body = 404, 'text/plain', b'Unknown source'
+                elif fail:
+                    with replay.lock:
+                        replay.stats['errors'] += 1
+                    status, content_type, body = 503, 'text/plain', b'Injected error'
+                else:
+                    params = dict(parse_qsl(parts.query, keep_blank_values=True))
+                    status, content_type, body = replay.respond(source, params)
+
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                if status == 503:
+                    self.send_header('Retry-After', '0')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self.httpd = ThreadingHTTPServer((self.host, self.port), ReplayHandler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        logger.info(f"Replay server listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+
+def record_fixtures(config_file: str, fixtures_dir: str) -> int:
+    """Run a real fetch and store every source response as a fixture"""
+    from paper_fetcher import PaperFetcher
+
+    fetcher = PaperFetcher(config_file)
+    # A zero TTL forces a real request for every query while still storing it
+    fetcher.http_cache = HTTPCache(fixtures_dir, ttl_seconds=0)
+    papers = fetcher.fetch_papers()
+    logger.info(f"Recorded fixtures for {len(papers)} papers into {fixtures_dir}")
+    return len(papers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record and replay paper source responses')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record = subparsers.add_parser('record', help='Fetch from the live APIs and record fixtures')
+    record.add_argument('--config', '-c', help='Configuration file path')
+    record.add_argument('--fixtures', default='fixtures', help='Fixtures directory')
+
+    serve = subparsers.add_parser('serve', help='Serve recorded or synthetic responses')
+    serve.add_argument('--fixtures', default='fixtures', help='Fixtures directory')
+    serve.add_argument('--host', default='localhost', help='Server host')
+    serve.add_argument('--port', type=int, default=8800, help='Server port')
+    serve.add_argument('--latency', type=float, default=0.0, help='Added latency per request (seconds)')
+    serve.add_argument('--jitter', type=float, default=0.0, help='Random extra latency up to this many seconds')
+    serve.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    serve.add_argument('--synthetic', type=int, help='Synthesize up to N papers per query instead of replaying')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == 'record':
+        record_fixtures(args.config, args.fixtures)
+        return
+
+    server = ReplayServer(args.fixtures, args.host, args.port, args.latency, args.jitter,
+                          args.error_rate, args.synthetic).start()
+    print(f"Replay server running at {server.base_url}")
+    print("Add this to your config to use it:")
+    print(json.dumps({'sources': server.sources_config()}, indent=2))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
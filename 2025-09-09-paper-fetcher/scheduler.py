@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Scheduler (daemon) mode for the paper fetcher
+Runs fetches on cron-like schedules, backs off failing sources with jittered
+exponential delays, keeps unsent digests in a persistent outbox until they
+are delivered, and exposes run metrics in Prometheus text format
+"""
+
+import email
+import logging
+import os
+import random
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Set
+
+from digest_renderer import DIGEST_TITLE, render_digest
+from paper_fetcher import PaperFetcher
+
+logger = logging.getLogger(__name__)
+
+
+class CronSchedule:
+    """Five-field cron expression: minute hour day-of-month month day-of-week
+
+    Supports '*', lists ('1,15'), ranges ('1-5') and steps ('*/10', '0-30/5').
+    Day of week uses 0-6 with 0 = Sunday (7 is accepted as Sunday too).
+    """
+
+    FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Invalid cron expression (need 5 fields): {expression!r}")
+        self.expression = expression
+        parsed = [self._parse_field(f, lo, hi) for f, (lo, hi) in zip(fields, self.FIELD_RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {d % 7 for d in weekdays}
+        # Cron semantics: if both day fields are restricted, either may match
+        self.day_restricted = fields[2] != '*'
+        self.weekday_restricted = fields[4] != '*'
+
+    @staticmethod
+    def _parse_field(field: str, lo: int, hi: int) -> Set[int]:
+        values = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step_str = part.split('/', 1)
+                step = int(step_str)
+            if part == '*':
+                start, end = lo, hi
+            elif '-' in part:
+                start, end = (int(x) for x in part.split('-', 1))
+            else:
+                start = end = int(part)
+            if start < lo or end > hi or start > end or step < 1:
+                raise ValueError(f"Invalid cron field: {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day_ok = dt.day in self.days
+        # datetime.weekday() is Monday=0; cron is Sunday=0
+        weekday_ok = (dt.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """First matching minute strictly after the given time"""
+        dt = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+                continue
+            if dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+                continue
+            return dt
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+
+class SourceBackoff:
+    """Per-source jittered exponential backoff after failed fetches"""
+
+    def __init__(self, base_seconds: float = 60, max_seconds: float = 3600, jitter: float = 0.5):
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self.jitter = jitter
+        self.failures: Dict[str, int] = {}
+        self.retry_at: Dict[str, float] = {}
+
+    def available(self, source: str, now: float = None) -> bool:
+        return (now or time.time()) >= self.retry_at.get(source, 0)
+
+    def record_success(self, source: str):
+        self.failures.pop(source, None)
+        self.retry_at.pop(source, None)
+
+    def record_failure(self, source: str, now: float = None) -> float:
+        """Register a failure and return the delay before the source is retried"""
+        count = self.failures.get(source, 0) + 1
+        self.failures[source] = count
+        delay = min(self.max_seconds, self.base_seconds * 2 ** (count - 1))
+        delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        self.retry_at[source] = (now or time.time()) + delay
+        return delay
+
+
+class Outbox:
+    """Persistent queue of unsent digests stored as .eml files"""
+
+    def __init__(self, outbox_dir: str = "outbox"):
+        self.outbox_dir = outbox_dir
+        os.makedirs(outbox_dir, exist_ok=True)
+
+    def put(self, msg) -> str:
+        """Write a message to the outbox atomically and return its path"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        safe_to = ''.join(c if c.isalnum() or c in '.-@' else '_' for c in msg['To'])
+        path = os.path.join(self.outbox_dir, f"{timestamp}_{safe_to}.eml")
+        with open(path + '.tmp', 'wb') as f:
+            f.write(msg.as_bytes())
+        os.replace(path + '.tmp', path)
+        return path
+
+    def pending(self) -> List[str]:
+        return sorted(os.path.join(self.outbox_dir, f)
+                      for f in os.listdir(self.outbox_dir) if f.endswith('.eml'))
+
+    def flush(self, fetcher: PaperFetcher) -> int:
+        """Try to deliver every pending message over the fetcher's SMTP transport"""
+        pending = self.pending()
+        if not pending:
+            return 0
+        email_config = fetcher.config['email']
+        if email_config.get('use_local_server', False) and not fetcher.start_local_smtp_server():
+            return 0
+
+        sent = parked = 0
+        transport = fetcher.get_transport()
+        try:
+            for path in pending:
+                with open(path, 'rb') as f:
+                    msg = email.message_from_bytes(f.read())
+                try:
+                    transport.send(msg)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                    if isinstance(e, smtplib.SMTPResponseException) and e.smtp_code < 500:
+                        raise
+                    # Permanent rejection (refused recipients, 5xx such as 552 too large
+                    # or 554): park the message so it doesn't block the queue forever
+                    logger.error(f"Message rejected, moving {os.path.basename(path)} aside: {e}")
+                    os.replace(path, path[:-len('.eml')] + '.rejected')
+                    parked += 1
+                    continue
+                os.remove(path)
+                sent += 1
+        except Exception as e:
+            # Transient or connection failure: keep the rest for the next flush
+            logger.error(f"Outbox delivery failed, {len(pending) - sent - parked} digests left for retry: {e}")
+        finally:
+            # Runs are hours apart; don't hold the session open in between
+            fetcher.close_transport()
+        if sent:
+            logger.info(f"Delivered {sent} digests from outbox")
+        return sent
+
+
+class Metrics:
+    """Run metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.runs = {'success': 0, 'failure': 0}
+        self.last_run_duration = 0.0
+        self.last_run_timestamp = 0.0
+        self.fetch_latency: Dict[str, List[float]] = {}   # source -> [sum, count]
+        self.papers: Dict[str, int] = {}                  # source -> papers in last run
+        self.source_failures: Dict[str, int] = {}
+        self.outbox_pending = 0
+
+    def record_run(self, duration: float, success: bool, source_stats: Dict[str, Dict]):
+        with self.lock:
+            self.runs['success' if success else 'failure'] += 1
+            self.last_run_duration = duration
+            self.last_run_timestamp = time.time()
+            for source, stats in source_stats.items():
+                latency = self.fetch_latency.setdefault(source, [0.0, 0])
+                latency[0] += stats['latency']
+                latency[1] += stats['queries']
+                self.papers[source] = stats['papers']
+                if stats['errors']:
+                    self.source_failures[source] = self.source_failures.get(source, 0) + 1
+
+    def render(self) -> str:
+        with self.lock:
+            lines = [
+                "# HELP paper_fetcher_runs_total Completed scheduled runs.",
+                "# TYPE paper_fetcher_runs_total counter",
+            ]
+            lines += [f'paper_fetcher_runs_total{{status="{k}"}} {v}' for k, v in self.runs.items()]
+            lines += [
+                "# HELP paper_fetcher_run_duration_seconds Duration of the last run.",
+                "# TYPE paper_fetcher_run_duration_seconds gauge",
+                f"paper_fetcher_run_duration_seconds {self.last_run_duration:.3f}",
+                "# HELP paper_fetcher_last_run_timestamp_seconds Unix time of the last run.",
+                "# TYPE paper_fetcher_last_run_timestamp_seconds gauge",
+                f"paper_fetcher_last_run_timestamp_seconds {self.last_run_timestamp:.0f}",
+                "# HELP paper_fetcher_fetch_latency_seconds Per-query fetch latency by source.",
+                "# TYPE paper_fetcher_fetch_latency_seconds summary",
+            ]
+            for source, (total, count) in sorted(self.fetch_latency.items()):
+                lines.append(f'paper_fetcher_fetch_latency_seconds_sum{{source="{source}"}} {total:.3f}')
+                lines.append(f'paper_fetcher_fetch_latency_seconds_count{{source="{source}"}} {count}')
+            lines += [
+                "# HELP paper_fetcher_papers Papers returned per source in the last run.",
+                "# TYPE paper_fetcher_papers gauge",
+            ]
+            lines += [f'paper_fetcher_papers{{source="{s}"}} {n}' for s, n in sorted(self.papers.items())]
+            lines += [
+                "# HELP paper_fetcher_source_failures_total Runs in which a source had errors.",
+                "# TYPE paper_fetcher_source_failures_total counter",
+            ]
+            lines += [f'paper_fetcher_source_failures_total{{source="{s}"}} {n}'
+                      for s, n in sorted(self.source_failures.items())]
+            lines += [
+                "# HELP paper_fetcher_outbox_pending Digests waiting for delivery.",
+                "# TYPE paper_fetcher_outbox_pending gauge",
+                f"paper_fetcher_outbox_pending {self.outbox_pending}",
+            ]
+            return '\n'.join(lines) + '\n'
+
+    def write_file(self, path: str):
+        """Write metrics atomically, e.g. for the node_exporter textfile collector"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(path + '.tmp', path)
+
+    def serve(self, host: str, port: int) -> ThreadingHTTPServer:
+        """Serve /metrics over HTTP from a daemon thread"""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+        return server
+
+
+class PaperScheduler:
+    """Long-running scheduler that fetches and sends digests on cron schedules"""
+
+    def __init__(self, config_file: str = None, schedules: List[str] = None):
+        self.fetcher = PaperFetcher(config_file)
+        scheduler_config = self.fetcher.config.get('scheduler', {})
+        self.config = scheduler_config
+        self.schedules = [CronSchedule(s) for s in
+                          (schedules or scheduler_config.get('schedules') or ['0 9 * * *'])]
+        self.backoff = SourceBackoff(
+            scheduler_config.get('backoff_base_seconds', 60),
+            scheduler_config.get('backoff_max_seconds', 3600),
+            scheduler_config.get('backoff_jitter', 0.5)
+        )
+        self.outbox = Outbox(scheduler_config.get('outbox_dir', 'outbox'))
+        self.outbox_retry_seconds = scheduler_config.get('outbox_retry_seconds', 300)
+        self.metrics = Metrics()
+        self.metrics_file = scheduler_config.get('metrics_file')
+        self.metrics_port = scheduler_config.get('metrics_port')
+        self.metrics_host = scheduler_config.get('metrics_host', 'localhost')
+        self.stop_event = threading.Event()
+
+    def next_run(self, after: datetime) -> datetime:
+        return min(schedule.next_after(after) for schedule in self.schedules)
+
+    def build_messages(self) -> List:
+        """Build the digest messages for this run (one per subscriber, or one)"""
+        fetcher = self.fetcher
+        if fetcher.get_subscribers():
+            messages = []
+            for subscriber, papers in fetcher.build_digests():
+                if not papers:
+                    continue
+                title = subscriber.get('title', DIGEST_TITLE)
+                text_content, html_content = render_digest(papers, fetcher.config['days_back'], title=title)
+                messages.append(fetcher.build_message(subscriber['email'], text_content, html_content, subject=title))
+            return messages
+
+        text_content, html_content = fetcher.render_papers()
+        return [fetcher.build_message(fetcher.config['email']['recipient_email'], text_content, html_content)]
+
+    def run_once(self) -> bool:
+        """Fetch, queue digests in the outbox and try to deliver them"""
+        start = time.time()
+        success = False
+        self.fetcher.source_stats = {}
+        available = [s for s in self.fetcher.sources if self.backoff.available(s)]
+        skipped = set(self.fetcher.sources) - set(available)
+        if skipped:
+            logger.info(f"Skipping sources in backoff: {', '.join(sorted(skipped))}")
+
+        try:
+            if available:
+                papers = self.fetcher.fetch_papers(sources=available)
+                for source, stats in self.fetcher.source_stats.items():
+                    if stats['errors']:
+                        delay = self.backoff.record_failure(source)
+                        logger.warning(f"{source} had {stats['errors']} failed queries, backing off {delay:.0f}s")
+                    else:
+                        self.backoff.record_success(source)
+
+                if papers:
+                    # Queue first so a crash or SMTP failure never loses a digest
+                    for msg in self.build_messages():
+                        self.outbox.put(msg)
+                else:
+                    logger.warning("No papers found")
+            success = True
+        except Exception as e:
+            logger.error(f"Scheduled run failed: {e}")
+
+        self.outbox.flush(self.fetcher)
+        self.metrics.record_run(time.time() - start, success, self.fetcher.source_stats)
+        self.update_outbox_metrics()
+        return success
+
+    def update_outbox_metrics(self):
+        self.metrics.outbox_pending = len(self.outbox.pending())
+        if self.metrics_file:
+            self.metrics.write_file(self.metrics_file)
+
+    def run_forever(self):
+        """Run until stop() is called, retrying the outbox between runs"""
+        if self.metrics_port:
+            self.metrics.serve(self.metrics_host, self.metrics_port)
+
+        next_run = self.next_run(datetime.now())
+        logger.info(f"Scheduler started, next run at {next_run:%Y-%m-%d %H:%M}")
+        while not self.stop_event.is_set():
+            now = datetime.now()
+            if now >= next_run:
+                self.run_once()
+                next_run = self.next_run(datetime.now())
+                logger.info(f"Next run at {next_run:%Y-%m-%d %H:%M}")
+                continue
+
+            wait = (next_run - now).total_seconds()
+            if self.outbox.pending():
+                wait = min(wait, self.outbox_retry_seconds)
+            if self.stop_event.wait(wait):
+                break
+            if self.outbox.pending() and datetime.now() < next_run:
+                self.outbox.flush(self.fetcher)
+                self.update_outbox_metrics()
+
+        logger.info("Scheduler stopped")
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def run_daemon(config_file: str = None, schedules: List[str] = None, run_now: bool = False):
+    """Entry point used by `paper_fetcher.py --daemon`"""
+    scheduler = PaperScheduler(config_file, schedules)
+    try:
+        if run_now:
+            scheduler.run_once()
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        scheduler.stop()
+        print("\nScheduler stopped")
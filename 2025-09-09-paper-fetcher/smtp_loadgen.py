@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Load generator and throughput benchmark for local_smtp_server.py
+Opens N concurrent SMTP sessions that each send messages of configurable
+sizes (optionally pipelining MAIL/RCPT/DATA) and reports messages per
+second, p50/p99 session latency and the server's resident memory.
+It can spawn the local server with either engine or target any running
+SMTP server.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from mail_transport import wait_for_smtp
+
+logger = logging.getLogger(__name__)
+
+SIZE_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)([kmg]?)b?$', re.IGNORECASE)
+SIZE_UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+
+
+def parse_size(text: str) -> int:
+    """'512', '10k', '1.5m' -> bytes"""
+    match = SIZE_PATTERN.match(text.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Invalid size: {text}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).lower()])
+
+
+def make_message(size: int, index: int = 0) -> bytes:
+    """A plain text message of about `size` bytes, ready for DATA (CRLF, no leading dots)"""
+    header = (f"From: loadgen@localhost\r\nTo: sink@localhost\r\n"
+              f"Subject: loadgen message {index} ({size} bytes)\r\n\r\n").encode('ascii')
+    line = b"The quick brown fox jumps over the lazy dog 0123456789 abcdefghijklmnopqrstuv\r\n"
+    body_size = max(0, size - len(header))
+    body = line * (body_size // len(line)) + line[:body_size % len(line)].rstrip(b"\r") + b"\r\n"
+    return header + body
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    rank = min(len(ordered), max(1, math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def read_rss(pid: int) -> Optional[Dict[str, int]]:
+    """Current and peak resident set size of a process, in bytes (Linux /proc)"""
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return {'rss': int(fields['VmRSS'].split()[0]) * 1024,
+                'peak': int(fields['VmHWM'].split()[0]) * 1024}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class SMTPError(Exception):
+    """Unexpected SMTP reply"""
+
+
+class LoadSession:
+    """One client SMTP session sending a batch of messages"""
+
+    def __init__(self, host: str, port: int, messages: List[bytes], pipelining: bool, timeout: float):
+        self.host = host
+        self.port = port
+        self.messages = messages
+        self.pipelining = pipelining
+        self.timeout = timeout
+
+    async def read_reply(self, reader, expect: str) -> str:
+        """Read a (possibly multi-line) reply and check its code"""
+        while True:
+            line = await asyncio.wait_for(reader.readline(), self.timeout)
+            if not line:
+                raise SMTPError("Connection closed by server")
+            text = line.decode('utf-8', errors='replace').rstrip()
+            if len(text) < 4 or text[3] != '-':
+                break
+        if not text.startswith(expect):
+            raise SMTPError(f"Expected {expect}, got: {text}")
+        return text
+
+    async def run(self) -> int:
+        """Run the session; returns bytes sent"""
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        sent = 0
+        try:
+            await self.read_reply(reader, '220')
+            writer.write(b"EHLO loadgen\r\n")
+            await self.read_reply(reader, '250')
+
+            for message in self.messages:
+                envelope = [b"MAIL FROM:<loadgen@localhost> SIZE=%d\r\n" % len(message),
+                            b"RCPT TO:<sink@localhost>\r\n", b"DATA\r\n"]
+                if self.pipelining:
+                    writer.write(b''.join(envelope))
+                    for expect in ('250', '250', '354'):
+                        await self.read_reply(reader, expect)
+                else:
+                    for command, expect in zip(envelope, ('250', '250', '354')):
+                        writer.write(command)
+                        await self.read_reply(reader, expect)
+                writer.write(message)
+                writer.write(b".\r\n")
+                await writer.drain()
+                await self.read_reply(reader, '250')
+                sent += len(message)
+
+            writer.write(b"QUIT\r\n")
+            await self.read_reply(reader, '221')
+        finally:
+            writer.close()
+        return sent
+
+
+async def run_load(host: str, port: int, sessions: int, concurrency: int, messages_per_session: int,
+                   sizes: List[int], pipelining: bool = True, timeout: float = 60.0, seed: int = 0,
+                   server_pid: int = None) -> Dict:
+    """Run `sessions` sessions, at most `concurrency` at a time, and collect statistics"""
+    rng = random.Random(seed)
+    bodies = {size: make_message(size) for size in set(sizes)}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], []
+    totals = {'messages': 0, 'bytes': 0}
+    rss_samples = []
+
+    async def one_session(index: int):
+        messages = [bodies[rng.choice(sizes)] for _ in range(messages_per_session)]
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                sent = await LoadSession(host, port, messages, pipelining, timeout).run()
+            except (OSError, asyncio.TimeoutError, SMTPError) as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                return
+            latencies.append(time.perf_counter() - start)
+            totals['messages'] += len(messages)
+            totals['bytes'] += sent
+
+    async def sample_rss():
+        while True:
+            sample = read_rss(server_pid)
+            if sample:
+                rss_samples.append(sample['rss'])
+            await asyncio.sleep(0.1)
+
+    sampler = asyncio.create_task(sample_rss()) if server_pid else None
+    rss_before = read_rss(server_pid) if server_pid else None
+    start = time.perf_counter()
+    await asyncio.gather(*(one_session(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    if sampler:
+        sampler.cancel()
+    rss_after = read_rss(server_pid) if server_pid else None
+
+    return {
+        'sessions': sessions,
+        'concurrency': concurrency,
+        'messages_per_session': messages_per_session,
+        'sizes': sizes,
+        'pipelining': pipelining,
+        'elapsed_seconds': elapsed,
+        'messages': totals['messages'],
+        'failed_sessions': len(errors),
+        'errors': sorted(set(errors))[:10],
+        'messages_per_second': totals['messages'] / elapsed if elapsed else float('inf'),
+        'megabytes_per_second': totals['bytes'] / elapsed / 1024 ** 2 if elapsed else float('inf'),
+        'latency_p50': percentile(latencies, 50),
+        'latency_p99': percentile(latencies, 99),
+        'server_rss_before': rss_before['rss'] if rss_before else None,
+        'server_rss_max': max(rss_samples + ([rss_after['rss']] if rss_after else [])) if rss_after else None,
+        'server_rss_peak': rss_after['peak'] if rss_after else None
+    }
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+class SpawnedServer:
+    """local_smtp_server.py running in a child process, so its RSS is measured alone"""
+
+    def __init__(self, engine: str, max_connections: int, output_dir: str = None):
+        self.engine = engine
+        self.port = free_port()
+        self.output_dir = output_dir or tempfile.mkdtemp(prefix='smtp_loadgen_')
+        self.cleanup_dir = output_dir is None
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'local_smtp_server.py')
+        command = [sys.executable, script, '--engine', engine, '--port', str(self.port),
+                   '--output', self.output_dir, '--max-connections', str(max_connections)]
+        self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if not wait_for_smtp('localhost', self.port, timeout=10):
+            self.stop()
+            raise RuntimeError(f"{engine} server did not start")
+
+    def stop(self):
+        if self.process.poll() is None:
+            self.process.send_signal(signal.SIGINT)
+            try:
+                self.process.wait(30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.cleanup_dir:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+
+
+def print_report(name: str, result: Dict):
+    mb = lambda value: f"{value / 1024 ** 2:.1f} MB" if value else "n/a"
+    print(f"\n=== {name} ===")
+    print(f"sessions: {result['sessions']} ({result['concurrency']} concurrent, "
+          f"{result['messages_per_session']} msgs each, pipelining={'on' if result['pipelining'] else 'off'})")
+    print(f"messages: {result['messages']} in {result['elapsed_seconds']:.2f}s, failed sessions: {result['failed_sessions']}")
+    print(f"throughput: {result['messages_per_second']:.1f} msgs/s, {result['megabytes_per_second']:.2f} MB/s")
+    print(f"session latency: p50 {result['latency_p50'] * 1000:.1f} ms, p99 {result['latency_p99'] * 1000:.1f} ms")
+    print(f"server RSS: before {mb(result['server_rss_before'])}, max {mb(result['server_rss_max'])}, "
+          f"peak {mb(result['server_rss_peak'])}")
+    for error in result['errors']:
+        print(f"  error: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SMTP load generator for local_smtp_server.py')
+    parser.add_argument('--engine', action='append', choices=['threaded', 'asyncio'],
+                        help='Spawn the local server with this engine (repeatable; default: both)')
+    parser.add_argument('--host', help='Target an already running server instead of spawning one')
+    parser.add_argument('--port', type=int, default=1025, help='Port of the running server')
+    parser.add_argument('--server-pid', type=int, help='PID of the running server, for RSS reporting')
+    parser.add_argument('--sessions', type=int, default=200, help='Total sessions')
+    parser.add_argument('--concurrency', '-n', type=int, default=100, help='Concurrent sessions')
+    parser.add_argument('--messages', type=int, default=5, help='Messages per session')
+    parser.add_argument('--size', type=parse_size, action='append',
+                        help='Message size, e.g. 2k or 1m (repeatable; picked at random per message)')
+    parser.add_argument('--no-pipelining', action='store_true', help='Wait for each reply before the next command')
+    parser.add_argument('--timeout', type=float, default=60, help='Per-reply timeout in seconds')
+    parser.add_argument('--json', help='Also write results to this JSON file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    sizes = args.size or [2048]
+    load = dict(sessions=args.sessions, concurrency=args.concurrency, messages_per_session=args.messages,
+                sizes=sizes, pipelining=not args.no_pipelining, timeout=args.timeout)
+
+    results = {}
+    if args.host:
+        results[f"{args.host}:{args.port}"] = asyncio.run(
+            run_load(args.host, args.port, server_pid=args.server_pid, **load))
+    else:
+        for engine in args.engine or ['threaded', 'asyncio']:
+            server = SpawnedServer(engine, max_connections=args.concurrency + 10)
+            try:
+                results[engine] = asyncio.run(
+                    run_load('localhost', server.port, server_pid=server.process.pid, **load))
+            finally:
+                server.stop()
+
+    for name, result in results.items():
+        print_report(name, result)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Paper source adapters for the paper fetcher
+Each adapter only knows how to build a request for its API and parse the
+response into Paper records; rate limiting, retries, date filtering and
+error handling are shared in SourceAdapter
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class Paper:
+    """Normalized paper record shared by every source"""
+    id: str
+    title: str
+    authors: List[str]
+    summary: str
+    published: str          # YYYY-MM-DD, or '' when the source has no date
+    url: str
+    source: str
+    pdf_url: str = ''
+    relevance: float = 0.0
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Paper':
+        return cls(
+            id=str(data.get('id', '')),
+            title=(data.get('title') or '').strip(),
+            authors=list(data.get('authors') or []),
+            summary=(data.get('summary') or data.get('abstract') or '').strip(),
+            published=data.get('published') or '',
+            url=data.get('url') or '',
+            source=data.get('source') or '',
+            pdf_url=data.get('pdf_url') or ''
+        )
+
+
+class SourceError(Exception):
+    """A source query failed after all retries"""
+
+
+class HostRateLimiter:
+    """Thread-safe minimum interval between requests to the same host"""
+
+    def __init__(self, default_interval: float = 1.0):
+        self.default_interval = default_interval
+        self.intervals: Dict[str, float] = {}
+        self.next_slot: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def set_interval(self, host: str, interval: float):
+        with self.lock:
+            self.intervals[host] = interval
+
+    def wait(self, url_or_host: str):
+        """Block until a request to the host is allowed, reserving the slot"""
+        host = urlparse(url_or_host).netloc or url_or_host
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, 0.0))
+            self.next_slot[host] = slot + self.intervals.get(host, self.default_interval)
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SourceAdapter:
+    """Base class for paper sources
+
+    Subclasses set `name` and `base_url` and implement build_request() and
+    parse(); search() wraps them with rate limiting, retries on transient
+    errors, and the shared recency filter.
+    """
+
+    name = ''
+    base_url = ''
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, http_get: Callable[..., requests.Response], rate_limiter: HostRateLimiter,
+                 days_back: int = 30, config: Dict = None):
+        self.http_get = http_get
+        self.rate_limiter = rate_limiter
+        self.days_back = days_back
+        self.config = config or {}
+        self.base_url = self.config.get('base_url', self.base_url)
+        self.max_retries = self.config.get('max_retries', 2)
+        self.retry_backoff = self.config.get('retry_backoff_seconds', 2.0)
+        self.timeout = self.config.get('timeout', 30)
+        if 'min_interval' in self.config:
+            rate_limiter.set_interval(urlparse(self.base_url).netloc, self.config['min_interval'])
+
+    def build_request(self, query: str, max_results: int) -> Tuple[str, Dict, Dict]:
+        """Return (url, params, headers) for a search query"""
+        raise NotImplementedError
+
+    def parse(self, response: requests.Response) -> Iterable[Paper]:
+        """Parse a successful response into Paper records"""
+        raise NotImplementedError
+
+    def date_threshold(self) -> datetime:
+        return datetime.now() - timedelta(days=self.days_back)
+
+    def is_recent(self, paper: Paper, threshold: datetime) -> bool:
+        """Keep undated papers; drop old or unparseable dates"""
+        if not paper.published:
+            return True
+        try:
+            return datetime.strptime(paper.published[:10], '%Y-%m-%d') >= threshold
+        except ValueError:
+            return False
+
+    def fetch(self, query: str, max_results: int) -> requests.Response:
+        """GET with rate limiting and retries on connection errors, 429 and 5xx
+
+        The rate limiter is passed to http_get as before_request, so only
+        requests that reach the network wait for a slot; cache hits do not.
+        """
+        url, params, headers = self.build_request(query, max_results)
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.http_get(url, params=params, headers=headers, timeout=self.timeout,
+                                         before_request=lambda: self.rate_limiter.wait(url))
+                if response.status_code in self.RETRY_STATUS and attempt < self.max_retries:
+                    delay = self.retry_delay(attempt, response)
+                    logger.warning(f"{self.name} returned {response.status_code}, retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    continue
+                response.raise_for_status()
+                return response
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise SourceError(f"Error searching {self.name}: {e}") from e
+                delay = self.retry_delay(attempt)
+                logger.warning(f"{self.name} request failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+            except requests.RequestException as e:
+                raise SourceError(f"Error searching {self.name}: {e}") from e
+        raise SourceError(f"Error searching {self.name}: retries exhausted")
+
+    def retry_delay(self, attempt: int, response: requests.Response = None) -> float:
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.retry_backoff * 2 ** attempt
+
+    def search(self, query: str, max_results: int = 50) -> List[Paper]:
+        """Search the source and return recent, normalized papers
+
+        Raises SourceError when the request or response parsing fails.
+        """
+        logger.info(f"Searching {self.name} for: {query}")
+        response = self.fetch(query, max_results)
+        try:
+            parsed = list(self.parse(response))
+        except (ET.ParseError, ValueError, KeyError, AttributeError) as e:
+            raise SourceError(f"Error parsing {self.name} response: {e}") from e
+
+        threshold = self.date_threshold()
+        papers = [p for p in parsed if self.is_recent(p, threshold)]
+        logger.info(f"Found {len(papers)} recent papers from {self.name} for query: {query}")
+        return papers
+
+
+class ArxivSource(SourceAdapter):
+    """arXiv Atom API"""
+
+    name = 'arXiv'
+    base_url = 'http://export.arxiv.org/api/query'
+    NAMESPACE = {'atom': 'http://www.w3.org/2005/Atom'}
+
+    def build_request(self, query: str, max_results: int) -> Tuple[str, Dict, Dict]:
+        params = {
+            'search_query': f'all:"{query}"',
+            'start': 0,
+            'max_results': max_results,
+            'sortBy': 'submittedDate',
+            'sortOrder': 'descending'
+        }
+        return self.base_url, params, {}
+
+    def parse(self, response: requests.Response) -> Iterable[Paper]:
+        root = ET.fromstring(response.content)
+        ns = self.NAMESPACE
+        for entry in root.findall('atom:entry', ns):
+            paper_id = entry.find('atom:id', ns).text
+            pdf_url = ''
+            for link in entry.findall('atom:link', ns):
+                if link.get('title') == 'pdf':
+                    pdf_url = link.get('href', '')
+            yield Paper(
+                id=paper_id,
+                title=' '.join(entry.find('atom:title', ns).text.split()),
+                authors=[a.find('atom:name', ns).text for a in entry.findall('atom:author', ns)],
+                summary=entry.find('atom:summary', ns).text.strip(),
+                published=entry.find('atom:published', ns).text[:10],
+                url=paper_id,
+                source=self.name,
+                pdf_url=pdf_url
+            )
+
+
+class SemanticScholarSource(SourceAdapter):
+    """Semantic Scholar Graph API (requires API key for full access)"""
+
+    name = 'Semantic Scholar'
+    base_url = 'https://api.semanticscholar.org/graph/v1/paper/search'
+
+    def build_request(self, query: str, max_results: int) -> Tuple[str, Dict, Dict]:
+        params = {
+            'query': query,
+            'limit': max_results,
+            'fields': 'paperId,title,authors,abstract,year,publicationDate,url,openAccessPdf',
+            'year': f'{self.date_threshold().year}-'
+        }
+        headers = {
+            'User-Agent': 'Academic Paper Fetcher (your-email@example.com)'
+        }
+        return self.base_url, params, headers
+
+    def parse(self, response: requests.Response) -> Iterable[Paper]:
+        try:
+            data = response.json()
+        except json.JSONDecodeError as e:
+            raise ValueError(str(e)) from e
+        for item in data.get('data', []):
+            yield Paper(
+                id=item.get('paperId') or '',
+                title=item.get('title') or '',
+                authors=[a.get('name', '') for a in item.get('authors') or []],
+                summary=item.get('abstract') or '',
+                published=item.get('publicationDate') or '',
+                url=item.get('url') or '',
+                source=self.name,
+                pdf_url=(item.get('openAccessPdf') or {}).get('url') or ''
+            )
+
+
+class JSONLSource(SourceAdapter):
+    """Local JSONL dump, one paper object per line
+
+    Lines use the Paper field names ('abstract' is accepted for 'summary').
+    A paper matches when every query word appears in its title or abstract.
+    """
+
+    name = 'JSONL'
+
+    def __init__(self, http_get, rate_limiter, days_back: int = 30, config: Dict = None):
+        super().__init__(http_get, rate_limiter, days_back, config)
+        self.path = self.config.get('path', 'papers.jsonl')
+        self.name = self.config.get('name', self.name)
+        self._papers: Optional[List[Tuple[Paper, str]]] = None
+
+    def load(self) -> List[Tuple[Paper, str]]:
+        if self._papers is None:
+            papers = []
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        paper = Paper.from_dict(json.loads(line))
+                        paper.source = paper.source or self.name
+                        papers.append((paper, f"{paper.title} {paper.summary}".lower()))
+            self._papers = papers
+        return self._papers
+
+    def search(self, query: str, max_results: int = 50) -> List[Paper]:
+        words = re.findall(r'\w+', query.lower())
+        try:
+            papers = self.load()
+        except (OSError, ValueError) as e:
+            raise SourceError(f"Error reading {self.path}: {e}") from e
+        threshold = self.date_threshold()
+        matches = [p for p, text in papers
+                   if all(w in text for w in words) and self.is_recent(p, threshold)]
+        matches.sort(key=lambda p: p.published, reverse=True)
+        return matches[:max_results]
+
+
+# Config key -> adapter class; register new sources here
+SOURCE_ADAPTERS = {
+    'arxiv': ArxivSource,
+    'semantic_scholar': SemanticScholarSource,
+    'jsonl': JSONLSource,
+}
+
+
+def create_sources(sources_config: Dict, http_get: Callable[..., requests.Response],
+                   rate_limiter: HostRateLimiter, days_back: int) -> Dict[str, SourceAdapter]:
+    """Instantiate the enabled adapters, keyed by display name"""
+    sources = {}
+    for key, source_config in sources_config.items():
+        if not source_config.get('enabled', True):
+            continue
+        adapter_class = SOURCE_ADAPTERS.get(source_config.get('type', key))
+        if adapter_class is None:
+            logger.warning(f"Unknown paper source: {key}")
+            continue
+        adapter = adapter_class(http_get, rate_limiter, days_back, source_config)
+        sources[adapter.name] = adapter
+    return sources
@@ -8,10 +8,13 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from paper_fetcher import PaperFetcher
+from sources import Paper
 import json
+import argparse
+from replay_server import ReplayServer
 import time
 
-def test_local_email_server():
+def test_local_email_server(replay_dir: str = None, synthetic: int = None):
     """Test the local email server with paper fetcher"""
     print("=== 测试本地邮件服务器 ===\n")
     
@@ -33,6 +36,13 @@ def test_local_email_server():
         }
     }
     
+    # Serve recorded (or synthetic) responses locally instead of the live APIs
+    replay_server = None
+    if replay_dir or synthetic:
+        replay_server = ReplayServer(replay_dir or 'fixtures', synthetic_papers=synthetic).start()
+        test_config['sources'] = replay_server.sources_config()
+        test_config['http'] = {'cache_enabled': False}
+    
     # Save test config
     with open('test_local_config.json', 'w') as f:
         json.dump(test_config, f, indent=2)
@@ -45,51 +55,46 @@ def test_local_email_server():
     
     if papers:
         print(f"✅ 找到 {len(papers)} 篇论文")
-        print(f"第一篇论文: {papers[0]['title'][:60]}...")
+        print(f"第一篇论文: {papers[0].title[:60]}...")
         
         print("\n3. 启动本地邮件服务器并发送邮件...")
+        sent_at = time.time()
         success = fetcher.send_email()
         
         if success:
             print("✅ 邮件发送成功!")
-            print("\n检查 emails/ 目录中的邮件文件:")
-            
-            # Wait a moment for file to be written
-            time.sleep(1)
+            print("\n在邮箱索引中查找刚发送的邮件:")
             
-            # List email files
-            emails_dir = "emails"
-            if os.path.exists(emails_dir):
-                files = os.listdir(emails_dir)
-                email_files = [f for f in files if f.endswith('.eml')]
-                summary_files = [f for f in files if f.endswith('_summary.txt')]
+            # Wait for the server to store and index the message
+            mailbox = fetcher.smtp_server_manager.mailbox
+            message = mailbox.wait_for(timeout=10, recipient=test_config['email']['recipient_email'], since=sent_at)
+            if message:
+                print(f"📧 {message['filename']} ({message['size']} bytes)")
+                print(f"  主题: {message['subject']}")
+                print(f"  收件人: {', '.join(message['recipients'])}")
                 
-                print(f"📧 找到 {len(email_files)} 个邮件文件:")
-                for f in email_files[-3:]:  # Show last 3
-                    print(f"  - {f}")
-                
-                if summary_files:
-                    latest_summary = sorted(summary_files)[-1]
-                    print(f"\n📄 最新邮件摘要 ({latest_summary}):")
-                    with open(os.path.join(emails_dir, latest_summary), 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        print(content[:500] + "..." if len(content) > 500 else content)
+                summary_file = message['path'].replace('.eml', '_summary.txt')
+                print(f"\n📄 邮件摘要 ({os.path.basename(summary_file)}):")
+                with open(summary_file, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                    print(content[:500] + "..." if len(content) > 500 else content)
             else:
-                print("❌ emails/ 目录不存在")
+                print("❌ 10 秒内未收到邮件")
         else:
             print("❌ 邮件发送失败")
     else:
         print("❌ 未找到论文，创建模拟邮件进行测试...")
         
         # Create fake papers for testing
-        fake_papers = [{
-            'title': '测试论文: 生成式AI推荐系统研究',
-            'authors': ['张三', '李四'],
-            'summary': '这是一篇测试论文，用于验证本地邮件服务器功能。',
-            'published': '2025-09-09',
-            'url': 'http://example.com/test-paper',
-            'source': 'Test'
-        }]
+        fake_papers = [Paper(
+            id='test-paper',
+            title='测试论文: 生成式AI推荐系统研究',
+            authors=['张三', '李四'],
+            summary='这是一篇测试论文，用于验证本地邮件服务器功能。',
+            published='2025-09-09',
+            url='http://example.com/test-paper',
+            source='Test'
+        )]
         
         fetcher.papers = fake_papers
         success = fetcher.send_email()
@@ -99,6 +104,9 @@ def test_local_email_server():
         else:
             print("❌ 模拟邮件发送失败")
     
+    if replay_server:
+        replay_server.stop()
+    
     # Clean up
     try:
         os.remove('test_local_config.json')
@@ -116,4 +124,8 @@ def test_local_email_server():
     print('  "use_local_server": false')
 
 if __name__ == "__main__":
-    test_local_email_server()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--replay', metavar='FIXTURES', help='Replay recorded responses instead of calling the live APIs')
+    parser.add_argument('--synthetic', type=int, metavar='N', help='Serve N synthetic papers per query instead of calling the live APIs')
+    args = parser.parse_args()
+    test_local_email_server(args.replay, args.synthetic)
@@ -10,8 +10,10 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from paper_fetcher import PaperFetcher
 import json
+import argparse
+from replay_server import ReplayServer
 
-def test_paper_fetcher():
+def test_paper_fetcher(replay_dir: str = None, synthetic: int = None):
     """Test the paper fetcher functionality"""
     print("Testing Paper Fetcher...")
     
@@ -29,6 +31,13 @@ def test_paper_fetcher():
         }
     }
     
+    # Serve recorded (or synthetic) responses locally instead of the live APIs
+    replay_server = None
+    if replay_dir or synthetic:
+        replay_server = ReplayServer(replay_dir or 'fixtures', synthetic_papers=synthetic).start()
+        test_config['sources'] = replay_server.sources_config()
+        test_config['http'] = {'cache_enabled': False}
+    
     # Save test config
     with open('test_config.json', 'w') as f:
         json.dump(test_config, f, indent=2)
@@ -44,11 +53,11 @@ def test_paper_fetcher():
     if papers:
         print("\nFirst paper:")
         paper = papers[0]
-        print(f"Title: {paper['title']}")
-        print(f"Authors: {', '.join(paper['authors'][:3])}")
-        print(f"Published: {paper['published']}")
-        print(f"Source: {paper['source']}")
-        print(f"Summary: {paper['summary'][:200]}...")
+        print(f"Title: {paper.title}")
+        print(f"Authors: {', '.join(paper.authors[:3])}")
+        print(f"Published: {paper.published}")
+        print(f"Source: {paper.source}")
+        print(f"Summary: {paper.summary[:200]}...")
         
         # Test HTML formatting
         print("\nTesting HTML formatting...")
@@ -62,6 +71,9 @@ def test_paper_fetcher():
     else:
         print("No papers found. This might be due to API limits or network issues.")
     
+    if replay_server:
+        replay_server.stop()
+    
     # Clean up test files
     try:
         os.remove('test_config.json')
@@ -72,4 +84,8 @@ def test_paper_fetcher():
     print("Test completed!")
 
 if __name__ == "__main__":
-    test_paper_fetcher()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--replay', metavar='FIXTURES', help='Replay recorded responses instead of calling the live APIs')
+    parser.add_argument('--synthetic', type=int, metavar='N', help='Serve N synthetic papers per query instead of calling the live APIs')
+    args = parser.parse_args()
+    test_paper_fetcher(args.replay, args.synthetic)
@@ -0,0 +1,77 @@
+import json
+import sys
+
+import pytest
+
+import paper_fetcher
+from paper_fetcher import PaperFetcher
+from sources import Paper
+
+
+def paper(pid, title):
+    return Paper(id=pid, title=title, authors=[], summary='', published='2025-01-01',
+                 url=f'http://example.org/{pid}', source='test')
+
+
+PAPERS = [paper('a', 'Generative recommendation'), paper('b', 'Traffic forecasting'),
+          paper('c', 'Recommendation survey'), paper('d', 'Image diffusion')]
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    def write(**overrides):
+        config = {
+            'search_terms': ['recommendation'],
+            'http': {'cache_enabled': False},
+            'subscribers': [{'email': 'alice@localhost', 'search_terms': ['recommendation']},
+                            {'email': 'bob@localhost', 'search_terms': ['diffusion'], 'top_n': 1}],
+            **overrides
+        }
+        path = tmp_path / 'config.json'
+        path.write_text(json.dumps(config))
+        return str(path)
+    return write
+
+
+def test_build_digests_ranks_per_subscriber(config_file):
+    fetcher = PaperFetcher(config_file())
+    fetcher.papers = list(PAPERS)
+    digests = {subscriber['email']: papers for subscriber, papers in fetcher.build_digests()}
+    assert [p.id for p in digests['alice@localhost']] == ['a', 'c']
+    assert [p.id for p in digests['bob@localhost']] == ['d']
+
+
+def test_build_digests_honours_ranking_disabled(config_file):
+    fetcher = PaperFetcher(config_file(ranking={'enabled': False}))
+    fetcher.papers = list(PAPERS)
+    for _, papers in fetcher.build_digests():
+        assert [p.id for p in papers] == ['a', 'b', 'c', 'd']
+
+
+def run_main(monkeypatch, argv, papers, sent):
+    closed = []
+
+    def fetch_papers(self):
+        self.papers = list(papers)
+        return self.papers
+
+    monkeypatch.setattr(PaperFetcher, 'fetch_papers', fetch_papers)
+    monkeypatch.setattr(PaperFetcher, 'send_email', lambda self, recipient=None: sent.append(list(self.papers)) or True)
+    monkeypatch.setattr(PaperFetcher, 'close_transport', lambda self: closed.append(True))
+    monkeypatch.setattr(sys, 'argv', ['paper_fetcher.py', *argv])
+    paper_fetcher.main()
+    return closed
+
+
+def test_email_override_ranks_when_subscribers_exist(monkeypatch, config_file):
+    sent = []
+    closed = run_main(monkeypatch, ['--config', config_file(), '--email', 'carol@localhost'], PAPERS, sent)
+    assert [p.id for p in sent[0]] == ['a', 'c']
+    assert closed == [True]
+
+
+def test_transport_is_closed_when_nothing_was_found(monkeypatch, config_file):
+    sent = []
+    closed = run_main(monkeypatch, ['--config', config_file()], [], sent)
+    assert sent == []
+    assert closed == [True]
@@ -0,0 +1,71 @@
+import smtplib
+import socket
+from email.message import EmailMessage
+
+import pytest
+
+import mail_transport
+from local_smtp_server import SMTPServerManager
+from mail_transport import MailTransport
+
+
+def make_message(body: str = "hello") -> EmailMessage:
+    msg = EmailMessage()
+    msg['From'] = 'fetcher@localhost'
+    msg['To'] = 'reader@localhost'
+    msg['Subject'] = 'digest'
+    msg.set_content(body)
+    return msg
+
+
+@pytest.fixture
+def smtp_server(tmp_path, free_port):
+    manager = SMTPServerManager('localhost', free_port, str(tmp_path), max_message_size=1000, index=False)
+    assert manager.start()
+    yield manager
+    manager.stop()
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(mail_transport.time, 'sleep', sleeps.append)
+    return sleeps
+
+
+def test_oversized_message_fails_once_without_reconnecting(smtp_server, no_sleep):
+    transport = MailTransport('localhost', smtp_server.port)
+    with pytest.raises(smtplib.SMTPSenderRefused) as excinfo:
+        transport.send(make_message("x" * 5000))
+    assert excinfo.value.smtp_code == 552
+    assert transport.stats == {'connections': 1, 'messages': 0, 'reconnects': 0}
+    assert no_sleep == []
+    assert transport.server is not None
+    transport.close()
+
+
+def test_session_is_reused_after_a_permanent_error(smtp_server, no_sleep):
+    with MailTransport('localhost', smtp_server.port) as transport:
+        transport.send(make_message())
+        with pytest.raises(smtplib.SMTPSenderRefused):
+            transport.send(make_message("x" * 5000))
+        transport.send(make_message())
+        assert transport.stats == {'connections': 1, 'messages': 2, 'reconnects': 0}
+
+
+def test_dropped_connection_reconnects_and_retries(smtp_server, no_sleep):
+    with MailTransport('localhost', smtp_server.port) as transport:
+        transport.send(make_message())
+        # Simulate the server dropping the idle session
+        transport.server.sock.shutdown(socket.SHUT_RDWR)
+        transport.send(make_message())
+        assert transport.stats == {'connections': 2, 'messages': 2, 'reconnects': 1}
+        assert len(no_sleep) == 1
+
+
+def test_reconnects_give_up_after_the_configured_attempts(free_port, no_sleep):
+    transport = MailTransport('localhost', free_port, timeout=1, reconnect_attempts=2)
+    with pytest.raises(OSError):
+        transport.send(make_message())
+    assert transport.stats['reconnects'] == 2
+    assert transport.server is None
@@ -0,0 +1,39 @@
+import sqlite3
+
+from mailbox_index import MailboxIndex
+
+
+def write_eml(directory, name, to='alice@localhost', subject='Digest'):
+    path = directory / name
+    path.write_text(f"From: fetcher@localhost\nTo: {to}\nSubject: {subject}\n\nbody\n")
+    return str(path)
+
+
+def recipient_rows(index):
+    conn = sqlite3.connect(index.db_path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM recipients').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_reindex_and_query_by_recipient_and_subject(tmp_path):
+    write_eml(tmp_path, 'a.eml')
+    write_eml(tmp_path, 'b.eml', to='Bob@Localhost', subject='Weekly digest')
+    index = MailboxIndex(str(tmp_path / 'mailbox.db'))
+    assert index.reindex() == 2
+    assert [m['recipients'] for m in index.query(recipient='bob@localhost')] == [['Bob@Localhost']]
+    assert len(index.query(subject='dig')) == 2
+    assert index.reindex() == 0
+
+
+def test_reindexing_a_message_replaces_its_recipients(tmp_path):
+    index = MailboxIndex(str(tmp_path / 'mailbox.db'))
+    path = write_eml(tmp_path, 'a.eml')
+    index.add(path, 'fetcher@localhost', ['alice@localhost', 'carol@localhost'])
+    index.add(path, 'fetcher@localhost', ['alice@localhost'])
+    index.add(path, 'fetcher@localhost', ['alice@localhost'])
+
+    assert recipient_rows(index) == 1
+    assert len(index.query(recipient='alice@localhost')) == 1
+    assert index.query(recipient='carol@localhost') == []
@@ -0,0 +1,82 @@
+import os
+import smtplib
+from email.message import EmailMessage
+
+from scheduler import Outbox
+
+
+class FakeTransport:
+    """Fails each message according to its subject"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.sent = []
+
+    def send(self, msg):
+        error = self.failures.get(msg['Subject'])
+        if error is not None:
+            raise error
+        self.sent.append(msg['Subject'])
+
+
+class FakeFetcher:
+    def __init__(self, transport):
+        self.config = {'email': {}}
+        self.transport = transport
+        self.closed = False
+
+    def get_transport(self):
+        return self.transport
+
+    def close_transport(self):
+        self.closed = True
+
+
+def fill(outbox, subjects):
+    for subject in subjects:
+        msg = EmailMessage()
+        msg['To'] = 'reader@localhost'
+        msg['Subject'] = subject
+        msg.set_content(subject)
+        outbox.put(msg)
+
+
+def leftovers(outbox, suffix):
+    return sorted(f for f in os.listdir(outbox.outbox_dir) if f.endswith(suffix))
+
+
+def test_permanent_rejections_are_parked_and_the_queue_continues(tmp_path):
+    outbox = Outbox(str(tmp_path))
+    fill(outbox, ['too-large', 'refused', 'data-error', 'ok'])
+    transport = FakeTransport({
+        'too-large': smtplib.SMTPSenderRefused(552, b'Message size exceeds fixed maximum', 'fetcher@localhost'),
+        'refused': smtplib.SMTPRecipientsRefused({'reader@localhost': (550, b'No such user')}),
+        'data-error': smtplib.SMTPDataError(554, b'Transaction failed'),
+    })
+    fetcher = FakeFetcher(transport)
+
+    assert outbox.flush(fetcher) == 1
+    assert transport.sent == ['ok']
+    assert outbox.pending() == []
+    assert len(leftovers(outbox, '.rejected')) == 3
+    assert fetcher.closed
+
+
+def test_transient_errors_stop_the_flush_and_keep_the_messages(tmp_path):
+    outbox = Outbox(str(tmp_path))
+    fill(outbox, ['first', 'busy', 'later'])
+    transport = FakeTransport({'busy': smtplib.SMTPDataError(451, b'Try again later')})
+
+    assert outbox.flush(FakeFetcher(transport)) == 1
+    assert transport.sent == ['first']
+    assert len(outbox.pending()) == 2
+    assert leftovers(outbox, '.rejected') == []
+
+
+def test_connection_errors_stop_the_flush(tmp_path):
+    outbox = Outbox(str(tmp_path))
+    fill(outbox, ['a', 'b'])
+    transport = FakeTransport({'a': smtplib.SMTPServerDisconnected('Connection unexpectedly closed')})
+
+    assert outbox.flush(FakeFetcher(transport)) == 0
+    assert len(outbox.pending()) == 2
@@ -0,0 +1,71 @@
+from ranking import BM25Index, rank_papers, tokenize
+from sources import Paper
+
+
+def paper(pid, title, summary=''):
+    return Paper(id=pid, title=title, authors=[], summary=summary, published='2025-01-01',
+                 url=f'http://example.org/{pid}', source='test')
+
+
+PAPERS = [
+    paper('a', 'Generative recommendation with large language models', 'LLM-based generative recommendation.'),
+    paper('b', 'Graph neural networks for traffic forecasting', 'Spatio-temporal graphs.'),
+    paper('c', 'A survey of recommender systems', 'Collaborative filtering and recommendation.'),
+    paper('d', 'Diffusion models for image synthesis', 'Denoising score matching.'),
+]
+
+
+class FakeReranker:
+    """Blends like EmbeddingReranker, with fixed similarities"""
+
+    weight = 0.5
+
+    def __init__(self, similarities):
+        self.similarities = similarities
+
+    def rerank(self, candidates, queries):
+        max_bm25 = max(score for _, score in candidates) or 1.0
+        reranked = [(p, 0.5 * score / max_bm25 + 0.5 * self.similarities[p.id]) for p, score in candidates]
+        return sorted(reranked, key=lambda item: item[1], reverse=True)
+
+
+def test_tokenize_drops_stopwords_and_folds_plurals():
+    assert tokenize('The LLMs for Recommender Systems') == ['llm', 'recommender', 'system']
+
+
+def test_bm25_prefers_matching_titles():
+    scores = BM25Index(PAPERS).score('generative recommendation')
+    assert scores.index(max(scores)) == 0
+    assert scores[1] == 0.0 and scores[3] == 0.0
+
+
+def test_bm25_sums_scores_over_queries():
+    index = BM25Index(PAPERS)
+    combined = index.score_queries(['recommendation', 'diffusion'])
+    separate = [a + b for a, b in zip(index.score('recommendation'), index.score('diffusion'))]
+    assert combined == separate
+
+
+def test_rank_papers_filters_sorts_and_truncates():
+    ranked = rank_papers(PAPERS, ['recommendation'], {'top_n': 1})
+    assert [p.id for p in ranked] == ['a']
+    assert ranked[0].relevance > 0
+    assert [p.id for p in rank_papers(PAPERS, ['recommendation'], {})] == ['a', 'c']
+
+
+def test_rank_papers_does_not_modify_shared_papers():
+    first = rank_papers(PAPERS, ['recommendation'], {})
+    second = rank_papers(PAPERS, ['diffusion'], {})
+    assert all(p.relevance == 0.0 for p in PAPERS)
+    assert first[0].relevance > 0 and second[0].id == 'd'
+    assert first[0].relevance != second[0].relevance
+
+
+def test_rerank_tail_stays_on_the_blended_scale_below_the_head():
+    queries = ['recommendation', 'graph', 'diffusion']
+    config = {'embedding_rerank': {'candidates': 2}}
+    ranked = rank_papers(PAPERS, queries, config, reranker=FakeReranker({'a': 0.1, 'b': 0.0, 'c': 0.9, 'd': 0.0}))
+    head, tail = ranked[:2], ranked[2:]
+    assert tail
+    assert all(0.0 <= p.relevance <= 1.0 for p in ranked)
+    assert min(p.relevance for p in head) >= max(p.relevance for p in tail)
@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+from local_smtp_server import MAX_COMMAND_LENGTH, SMTPSession
+
+ENVELOPE = b"EHLO test\r\nMAIL FROM:<a@example.com>\r\nRCPT TO:<b@example.com>\r\nDATA\r\n"
+
+
+def codes(replies):
+    return [line[:3] for line in replies.split(b"\r\n") if line and line[3:4] != b"-"]
+
+
+def start_data(session):
+    assert codes(session.feed(ENVELOPE)) == [b"250", b"250", b"250", b"354"]
+
+
+def test_pipelined_commands_split_across_feeds():
+    session = SMTPSession()
+    replies = b""
+    for chunk in (b"EHLO te", b"st\r\nNOOP\r", b"\nRSET\r\nQU", b"IT\r\n"):
+        replies += session.feed(chunk)
+    assert codes(replies) == [b"250", b"250", b"250", b"221"]
+    assert session.closed
+
+
+def test_data_is_dot_unstuffed():
+    session = SMTPSession()
+    start_data(session)
+    assert session.feed(b"Subject: dots\r\n\r\n..leading dot\r\n.\r\n") == b""
+
+    mail_from, rcpt_to, body = session.pending
+    assert mail_from == "a@example.com" and rcpt_to == ["b@example.com"]
+    assert bytes(body) == b"Subject: dots\r\n\r\n.leading dot\r\n"
+
+
+def test_terminator_split_across_feeds():
+    session = SMTPSession()
+    start_data(session)
+    for chunk in (b"line one\r\n", b".", b"\r", b"\n"):
+        assert session.pending is None
+        session.feed(chunk)
+    assert bytes(session.pending[2]) == b"line one\r\n"
+
+
+def test_commands_after_data_wait_for_delivered():
+    session = SMTPSession()
+    start_data(session)
+    assert session.feed(b"body\r\n.\r\nNOOP\r\nQUIT\r\n") == b""
+    assert session.pending is not None and not session.closed
+
+    assert codes(session.delivered()) == [b"250", b"250", b"221"]
+    assert session.pending is None and session.closed
+
+
+def test_failed_save_is_reported():
+    session = SMTPSession()
+    start_data(session)
+    session.feed(b"body\r\n.\r\n")
+    assert session.delivered(ok=False).startswith(b"451 ")
+
+
+def test_oversized_message_is_rejected():
+    session = SMTPSession(max_message_size=100)
+    start_data(session)
+    assert codes(session.feed(b"x" * 200 + b"\r\n.\r\nNOOP\r\n")) == [b"552", b"250"]
+    assert session.pending is None and not session.in_transaction
+
+
+def test_declared_size_over_the_limit_is_rejected():
+    session = SMTPSession(max_message_size=100)
+    assert codes(session.feed(b"MAIL FROM:<a@example.com> SIZE=101\r\n")) == [b"552"]
+    assert not session.in_transaction
+
+
+def test_overlong_command_line_is_discarded():
+    session = SMTPSession()
+    replies = session.feed(b"x" * (MAX_COMMAND_LENGTH + 1))
+    replies += session.feed(b"y" * MAX_COMMAND_LENGTH)
+    replies += session.feed(b"\r\nNOOP\r\n")
+    assert codes(replies) == [b"500", b"250"]
+
+
+@pytest.mark.parametrize("data", [b"HELO\r\nDATA\r\n", b"RCPT TO:<b@example.com>\r\n"])
+def test_commands_out_of_order(data):
+    session = SMTPSession()
+    assert codes(session.feed(data))[-1] == b"503"
+
+
+def test_spooled_body_is_written_to_a_file(tmp_path):
+    session = SMTPSession(spool_dir=str(tmp_path))
+    start_data(session)
+    session.feed(b"..spooled\r\n.\r\n")
+    body = session.pending[2]
+    body.close()
+    with open(body.name, "rb") as f:
+        assert f.read() == b".spooled\r\n"
+
+
+def test_abandoned_spooled_body_is_removed(tmp_path):
+    session = SMTPSession(spool_dir=str(tmp_path))
+    start_data(session)
+    session.feed(b"partial line\r\n")
+    session.close()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+FAISS index backends for the artist similarity graph.
+- flat:  exact inner-product search (IndexFlatIP), O(n) per query
+- hnsw:  graph-based approximate search (IndexHNSWFlat)
+- ivfpq: inverted lists over product-quantized codes (IndexIVFPQ),
+         the smallest index; its candidates are re-ranked with exact
+         similarities read from the memory-mapped embedding matrix
+
+All backends use inner product on L2-normalized vectors, i.e. cosine
+similarity. Built indexes are saved to output/indexes/ and reused while
+the embedding store is unchanged. Running this module reports recall and
+latency of each backend against the flat index.
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import time
+from typing import Any, Dict, List
+
+import faiss
+import numpy as np
+
+BACKENDS = ["flat", "hnsw", "ivfpq"]
+
+DEFAULT_PARAMS = {
+    "flat": {},
+    "hnsw": {"M": 32, "ef_construction": 200, "ef_search": 128},
+    "ivfpq": {"nlist": None, "m": None, "nbits": 8, "nprobe": 16, "rerank": 8}
+}
+
+# Query-time parameters; everything else requires rebuilding the index
+SEARCH_PARAMS = ("ef_search", "nprobe", "rerank")
+
+RERANK_BLOCK_ROWS = 256
+
+ADD_BLOCK_ROWS = 65536
+
+
+def ensure_output_directory():
+    """
+    Ensure the output directory exists in the same directory as the script
+    """
+    output_dir = os.path.join(os.path.dirname(__file__), 'output')
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
+
+
+def index_path(backend: str) -> str:
+    """
+    Where the index for a backend is saved
+    """
+    index_dir = os.path.join(ensure_output_directory(), 'indexes')
+    os.makedirs(index_dir, exist_ok=True)
+    return os.path.join(index_dir, f"artists_{backend}.faiss")
+
+
+def metadata_path(path: str) -> str:
+    """
+    The id-to-metadata table saved next to an index: line i describes id i
+    """
+    return path + ".meta.ndjson"
+
+
+def load_index_metadata(path: str) -> List[Dict[str, Any]]:
+    """
+    Metadata rows for the ids of a saved index
+    """
+    with open(metadata_path(path), 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def resolve_params(backend: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Backend defaults overridden by the given (non-None) params
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown index backend: {backend} (choose from {', '.join(BACKENDS)})")
+    merged = dict(DEFAULT_PARAMS[backend])
+    merged.update({key: value for key, value in (params or {}).items() if value is not None})
+    return merged
+
+
+def _pq_subquantizers(dim: int) -> int:
+    """
+    Largest sub-quantizer count that divides dim, aiming at 16-dimensional sub-vectors
+    """
+    for m in (64, 48, 32, 24, 16, 8, 4, 2, 1):
+        if dim % m == 0 and dim // m >= 8 or m == 1:
+            return m
+
+
+def _add_in_blocks(index, embeddings: np.ndarray):
+    for start in range(0, len(embeddings), ADD_BLOCK_ROWS):
+        index.add(np.ascontiguousarray(embeddings[start:start + ADD_BLOCK_ROWS], dtype='float32'))
+
+
+def build_index(embeddings: np.ndarray, backend: str = "flat", params: Dict[str, Any] = None):
+    """
+    Build an index of the given backend over the (normalized) embedding matrix
+    """
+    params = resolve_params(backend, params)
+    n, dim = embeddings.shape
+
+    if backend == "flat":
+        index = faiss.IndexFlatIP(dim)
+
+    elif backend == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["M"], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = params["ef_construction"]
+
+    else:
+        nlist = params["nlist"] or max(1, min(int(4 * math.sqrt(n)), n // 39))
+        m = params["m"] or _pq_subquantizers(dim)
+        # 8-bit codes need a few thousand training points; small sets use fewer bits
+        nbits = min(params["nbits"], max(1, int(math.log2(max(2, n // 39)))))
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, m, nbits, faiss.METRIC_INNER_PRODUCT)
+        sample_size = min(n, max(256 * nlist, 2 ** nbits * 64))
+        sample = np.random.default_rng(0).choice(n, size=sample_size, replace=False)
+        sample.sort()
+        index.train(np.ascontiguousarray(embeddings[sample], dtype='float32'))
+
+    _add_in_blocks(index, embeddings)
+    return index
+
+
+def build_params(backend: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    The resolved parameters that determine the index contents
+    """
+    return {key: value for key, value in resolve_params(backend, params).items() if key not in SEARCH_PARAMS}
+
+
+class RerankedIndex:
+    """
+    Wraps an approximate index: search() fetches rerank * k candidates and
+    re-scores them exactly against the embedding matrix, so results and
+    similarity scores match the flat index whenever the true neighbours
+    are among the candidates. Only the candidate rows of the (memory-mapped)
+    matrix are read.
+    """
+
+    def __init__(self, index, embeddings: np.ndarray, rerank: int):
+        self.index = index
+        self.embeddings = embeddings
+        self.rerank = rerank
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    @property
+    def d(self) -> int:
+        return self.index.d
+
+    def search(self, queries: np.ndarray, k: int):
+        _, candidates = self.index.search(queries, min(self.ntotal, k * self.rerank))
+        similarities = np.full((len(queries), k), -np.inf, dtype='float32')
+        indices = np.full((len(queries), k), -1, dtype='int64')
+        for start in range(0, len(queries), RERANK_BLOCK_ROWS):
+            ids = candidates[start:start + RERANK_BLOCK_ROWS]
+            valid = ids >= 0
+            vectors = self.embeddings[np.where(valid, ids, 0).ravel()].reshape(*ids.shape, -1)
+            scores = np.einsum('qd,qkd->qk', queries[start:start + RERANK_BLOCK_ROWS], vectors)
+            scores[~valid] = -np.inf
+            top = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+            width = top.shape[1]
+            similarities[start:start + len(ids), :width] = np.take_along_axis(scores, top, axis=1)
+            indices[start:start + len(ids), :width] = np.where(
+                np.take_along_axis(valid, top, axis=1), np.take_along_axis(ids, top, axis=1), -1)
+        return similarities, indices
+
+
+def set_search_params(index, ef_search: int = None, nprobe: int = None, rerank: int = None):
+    """
+    Apply query-time knobs: efSearch for HNSW, nprobe for IVF indexes.
+    rerank is handled by wrap_rerank.
+    """
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+    if nprobe is not None:
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = min(nprobe, ivf.nlist)
+
+
+def save_index(index, path: str, info: Dict[str, Any] = None):
+    """
+    Write the index atomically, with an optional JSON sidecar describing it
+    """
+    tmp_path = path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+    if info is not None:
+        with open(path + ".json", 'w', encoding='utf-8') as f:
+            json.dump(info, f, indent=2)
+
+
+def load_index_info(path: str) -> Dict[str, Any]:
+    """
+    The sidecar written by save_index, or {} if there is none
+    """
+    try:
+        with open(path + ".json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_index(path: str, mmap: bool = False):
+    """
+    Read a saved index, optionally memory-mapping its data instead of loading it
+    """
+    return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0)
+
+
+def prepare_for_search(index, embeddings: np.ndarray, backend: str, params: Dict[str, Any] = None):
+    """
+    Apply the backend's search-time parameters, wrapping the index for re-ranking if requested
+    """
+    resolved = resolve_params(backend, params)
+    set_search_params(index, **{key: resolved[key] for key in SEARCH_PARAMS if key in resolved})
+    if resolved.get("rerank"):
+        return RerankedIndex(index, embeddings, resolved["rerank"])
+    return index
+
+
+def get_index(embeddings: np.ndarray, backend: str = "flat", params: Dict[str, Any] = None,
+              source_path: str = None, rebuild: bool = False, metadata_source: str = None):
+    """
+    Load the saved index for a backend if it was built with the same
+    parameters, is newer than source_path (the embedding matrix) and has
+    the same number of rows; otherwise build and save it. When a new index
+    is saved, metadata_source (the store's metadata table) is copied next
+    to it as the id-to-metadata mapping.
+    """
+    path = index_path(backend)
+    info = load_index_info(path)
+    if (not rebuild and os.path.exists(path) and info.get("params") == build_params(backend, params)
+            and (source_path is None or os.path.getmtime(path) >= os.path.getmtime(source_path))):
+        index = load_index(path)
+        if (index.ntotal == len(embeddings) and index.d == embeddings.shape[1]
+                and (metadata_source is None or os.path.exists(metadata_path(path)))):
+            print(f"Loaded {backend} index from {path}")
+            return prepare_for_search(index, embeddings, backend, params)
+
+    start = time.perf_counter()
+    index = build_index(embeddings, backend, params)
+    print(f"Built {backend} index over {index.ntotal} vectors in {time.perf_counter() - start:.1f}s")
+    if metadata_source:
+        shutil.copyfile(metadata_source, metadata_path(path) + ".tmp")
+        os.replace(metadata_path(path) + ".tmp", metadata_path(path))
+    save_index(index, path, {"backend": backend, "params": build_params(backend, params),
+                             "vectors": index.ntotal, "dim": index.d})
+    return prepare_for_search(index, embeddings, backend, params)
+
+
+def evaluate_index(index, flat_index, embeddings: np.ndarray, k: int = 10, sample: int = 1000,
+                   seed: int = 0) -> Dict[str, float]:
+    """
+    Recall@k of `index` against the exact flat index on a sample of stored
+    vectors used as queries, plus batched and single-query latency
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(embeddings), size=min(sample, len(embeddings)), replace=False))
+    queries = np.ascontiguousarray(embeddings[rows], dtype='float32')
+    k = min(k, len(embeddings))
+
+    _, truth = flat_index.search(queries, k)
+
+    start = time.perf_counter()
+    _, found = index.search(queries, k)
+    batched = time.perf_counter() - start
+
+    hits = sum(len(set(t[t >= 0]) & set(f[f >= 0])) for t, f in zip(truth, found))
+    recall = hits / max(1, int((truth >= 0).sum()))
+
+    single = []
+    for query in queries[:min(200, len(queries))]:
+        start = time.perf_counter()
+        index.search(query[None, :], k)
+        single.append(time.perf_counter() - start)
+
+    return {
+        "recall_at_k": recall,
+        "batched_ms_per_query": batched / len(queries) * 1000,
+        "single_query_p50_ms": float(np.percentile(single, 50)) * 1000,
+        "single_query_p99_ms": float(np.percentile(single, 99)) * 1000
+    }
+
+
+def compare_backends(embeddings: np.ndarray, backends: List[str], k: int = 10, sample: int = 1000,
+                     params: Dict[str, Dict[str, Any]] = None, source_path: str = None,
+                     rebuild: bool = False, metadata_source: str = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Build (or load) each backend and measure it against the flat index
+    """
+    params = params or {}
+    flat_index = get_index(embeddings, "flat", source_path=source_path, rebuild=rebuild,
+                           metadata_source=metadata_source)
+    report = {}
+    for backend in backends:
+        start = time.perf_counter()
+        index = flat_index if backend == "flat" else get_index(
+            embeddings, backend, params.get(backend), source_path=source_path, rebuild=rebuild,
+            metadata_source=metadata_source)
+        setup_seconds = time.perf_counter() - start
+        result = evaluate_index(index, flat_index, embeddings, k, sample)
+        result["setup_seconds"] = setup_seconds
+        result["index_bytes"] = os.path.getsize(index_path(backend))
+        result["params"] = resolve_params(backend, params.get(backend))
+        report[backend] = result
+    return report
+
+
+def print_report(report: Dict[str, Dict[str, Any]], k: int):
+    print(f"\n{'backend':<8} {'recall@' + str(k):>10} {'batch ms/q':>11} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'index MB':>9} {'setup s':>8}")
+    for backend, result in report.items():
+        print(f"{backend:<8} {result['recall_at_k']:>10.4f} {result['batched_ms_per_query']:>11.3f} "
+              f"{result['single_query_p50_ms']:>8.3f} {result['single_query_p99_ms']:>8.3f} "
+              f"{result['index_bytes'] / 1024 ** 2:>9.1f} {result['setup_seconds']:>8.1f}")
+
+
+if __name__ == "__main__":
+    from embedding_store import EmbeddingStore
+
+    parser = argparse.ArgumentParser(description="Recall/latency report of the ANN backends against the flat index")
+    parser.add_argument('--backend', action='append', choices=BACKENDS,
+                        help='Backend to evaluate (repeatable; default: all)')
+    parser.add_argument('--k', type=int, default=10, help='Neighbours per query (default: 10)')
+    parser.add_argument('--sample', type=int, default=1000, help='Number of sampled queries (default: 1000)')
+    parser.add_argument('--hnsw-m', type=int, help='HNSW graph degree')
+    parser.add_argument('--ef-search', type=int, help='HNSW efSearch')
+    parser.add_argument('--nlist', type=int, help='IVF-PQ number of inverted lists')
+    parser.add_argument('--pq-m', type=int, help='IVF-PQ number of sub-quantizers')
+    parser.add_argument('--nprobe', type=int, help='IVF-PQ lists probed per query')
+    parser.add_argument('--rerank', type=int, help='IVF-PQ candidates re-ranked exactly, as a multiple of k (0: off)')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild indexes even if saved ones are current')
+    args = parser.parse_args()
+
+    store = EmbeddingStore(os.path.join(ensure_output_directory(), 'embedding_store'))
+    embeddings = store.load_vectors(mmap=True)
+    if len(embeddings) == 0:
+        raise SystemExit("The embedding store is empty; run artist_embeddings.py first")
+
+    backend_params = {
+        "hnsw": {"M": args.hnsw_m, "ef_search": args.ef_search},
+        "ivfpq": {"nlist": args.nlist, "m": args.pq_m, "nprobe": args.nprobe, "rerank": args.rerank}
+    }
+    report = compare_backends(embeddings, args.backend or BACKENDS, args.k, args.sample, backend_params,
+                              source_path=store.vectors_path, rebuild=args.rebuild,
+                              metadata_source=store.metadata_path)
+    print_report(report, args.k)
+
+    report_path = os.path.join(ensure_output_directory(), 'ann_report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump({"vectors": len(embeddings), "k": args.k, "backends": report}, f, indent=2)
+    print(f"\nReport saved to {report_path}")
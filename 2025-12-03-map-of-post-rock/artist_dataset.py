@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Compact one-row-per-artist dataset built from the artist.getinfo pages.
+Columns: name, mbid, url, summary, tags. Stored as NDJSON, or as Parquet
+when pyarrow is installed, so later stages can stream just the columns
+they need instead of loading and walking whole detail pages.
+"""
+
+import glob
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet is optional; NDJSON needs nothing extra
+    pa = None
+    pq = None
+
+COLUMNS = ["name", "mbid", "url", "summary", "tags"]
+NDJSON_FILE = "artists.ndjson"
+PARQUET_FILE = "artists.parquet"
+PARQUET_BATCH_ROWS = 10000
+
+
+def ensure_output_directory():
+    """
+    Ensure the output directory exists in the same directory as the script
+    """
+    output_dir = os.path.join(os.path.dirname(__file__), 'output')
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
+
+
+def artist_row(details: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Flatten one artist.getinfo response into a dataset row, or None for error records
+    """
+    artist = details.get("artist") if isinstance(details, dict) else None
+    if not isinstance(artist, dict) or "name" not in artist:
+        return None
+    bio = artist.get("bio") or {}
+    tags = (artist.get("tags") or {}).get("tag") or []
+    if isinstance(tags, dict):
+        # Last.fm returns a bare object instead of a list when there is a single tag
+        tags = [tags]
+    return {
+        "name": artist["name"],
+        "mbid": artist.get("mbid") or None,
+        "url": artist.get("url"),
+        "summary": (bio.get("summary") or "").strip(),
+        "tags": [tag["name"] for tag in tags if isinstance(tag, dict) and "name" in tag]
+    }
+
+
+def iter_detail_pages(output_dir: str = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield the artist_details_page_N.json files one at a time, in page order
+    """
+    output_dir = output_dir or ensure_output_directory()
+    paths = glob.glob(os.path.join(output_dir, "artist_details_page_*.json"))
+    paths.sort(key=lambda path: int(re.search(r'_(\d+)\.json$', path).group(1)))
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            yield json.load(f)
+
+
+def iter_rows_from_pages(output_dir: str = None) -> Iterator[Dict[str, Any]]:
+    """
+    Dataset rows from the detail pages, skipping error records and duplicate names
+    """
+    seen = set()
+    for page in iter_detail_pages(output_dir):
+        for details in page:
+            row = artist_row(details)
+            if row is not None and row["name"] not in seen:
+                seen.add(row["name"])
+                yield row
+
+
+def _batches(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_dataset(rows: Iterable[Dict[str, Any]], output_dir: str = None, fmt: str = "auto") -> str:
+    """
+    Write rows to artists.parquet (fmt 'parquet', or 'auto' with pyarrow
+    installed) or artists.ndjson. The file is written atomically and the
+    dataset in the other format is removed so readers never see a stale copy.
+    Returns the path written.
+    """
+    if fmt == "auto":
+        fmt = "parquet" if pq is not None else "ndjson"
+    if fmt == "parquet" and pq is None:
+        raise ImportError("pyarrow is required for the Parquet dataset format")
+    if fmt not in ("parquet", "ndjson"):
+        raise ValueError(f"Unknown dataset format: {fmt}")
+
+    output_dir = output_dir or ensure_output_directory()
+    filename, other = (PARQUET_FILE, NDJSON_FILE) if fmt == "parquet" else (NDJSON_FILE, PARQUET_FILE)
+    path = os.path.join(output_dir, filename)
+    tmp_path = path + ".tmp"
+    count = 0
+
+    if fmt == "parquet":
+        schema = pa.schema([("name", pa.string()), ("mbid", pa.string()), ("url", pa.string()),
+                            ("summary", pa.string()), ("tags", pa.list_(pa.string()))])
+        with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+            for batch in _batches(rows, PARQUET_BATCH_ROWS):
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+    else:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps({column: row.get(column) for column in COLUMNS}, ensure_ascii=False) + "\n")
+                count += 1
+
+    os.replace(tmp_path, path)
+    other_path = os.path.join(output_dir, other)
+    if os.path.exists(other_path):
+        os.remove(other_path)
+    print(f"Wrote {count} artists to {filename}")
+    return path
+
+
+def build_dataset(output_dir: str = None, fmt: str = "auto") -> str:
+    """
+    Rebuild the dataset from the artist_details_page_N.json files
+    """
+    return write_dataset(iter_rows_from_pages(output_dir), output_dir, fmt)
+
+
+def dataset_path(output_dir: str = None) -> Optional[str]:
+    """
+    Path of the current dataset, or None if it has not been built
+    """
+    output_dir = output_dir or ensure_output_directory()
+    for filename in (PARQUET_FILE, NDJSON_FILE):
+        path = os.path.join(output_dir, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def iter_dataset(columns: List[str] = None, path: str = None,
+                 batch_rows: int = PARQUET_BATCH_ROWS) -> Iterator[Dict[str, Any]]:
+    """
+    Stream dataset rows as dicts holding only `columns` (default: all).
+    Parquet is read batch by batch and only the requested columns are
+    decoded; NDJSON is read line by line.
+    """
+    path = path or dataset_path()
+    if path is None:
+        raise FileNotFoundError("Artist dataset not found; run get_artists.py or artist_dataset.py first")
+    columns = columns or COLUMNS
+
+    if path.endswith(".parquet"):
+        if pq is None:
+            raise ImportError("pyarrow is required to read the Parquet dataset")
+        for batch in pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=batch_rows, columns=columns):
+            yield from batch.to_pylist()
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    yield {column: row.get(column) for column in columns}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the one-row-per-artist dataset from the detail pages")
+    parser.add_argument('--format', choices=['auto', 'ndjson', 'parquet'], default='auto',
+                        help='Dataset format (auto: Parquet when pyarrow is installed)')
+    args = parser.parse_args()
+    build_dataset(fmt=args.format)
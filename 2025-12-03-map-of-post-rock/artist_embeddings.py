@@ -4,12 +4,31 @@ from typing import List, Dict, Optional
 import logging
 import numpy as np
 import os
-import pickle
 import glob
+import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import openai
 from openai import OpenAI
-import faiss
 from sklearn.metrics.pairwise import cosine_similarity
 
+from artist_dataset import dataset_path, iter_dataset
+from embedding_cache import EmbeddingCache, open_cache, text_hash
+from embedding_store import EmbeddingStore
+from ann_index import BACKENDS, get_index
+from rate_limit import TokenBucket
+
+EMBEDDING_MODEL = "BAAI/bge-m3"  # Using a multi-language embedding model
+SILICONFLOW_BASE_URL = "https://api.siliconflow.cn/v1"
+# Requests per second and concurrent requests against the embeddings API
+EMBEDDING_RATE_LIMIT = float(os.getenv("SILICONFLOW_RATE_LIMIT", "2"))
+EMBEDDING_MAX_IN_FLIGHT = int(os.getenv("SILICONFLOW_MAX_IN_FLIGHT", "4"))
+# Batches start at MAX_BATCH_SIZE texts (and at most MAX_BATCH_CHARS characters),
+# shrink when the API rejects a batch as too large and grow back after successes
+MAX_BATCH_SIZE = 32
+MAX_BATCH_CHARS = 60000
+MAX_RATE_LIMIT_RETRIES = 8
+
 
 def ensure_output_directory():
     """
@@ -71,164 +90,273 @@ def extract_summary_field(artists: List[Dict]) -> List[Dict]:
 
     return artist_summaries
 
-def calculate_embeddings_siliconflow(artist_summaries: List[Dict], api_key: str, output_file: str = 'artist_embeddings.pkl') -> str:
+def iter_dataset_summaries(chunk_size: int = 1000):
     """
-    Use SiliconFlow API to calculate embeddings for summary strings and save to file
+    Stream artists with a summary from the artist dataset in chunks,
+    reading only the columns the embedding stage needs
+    """
+    chunk = []
+    for row in iter_dataset(columns=['name', 'mbid', 'url', 'summary']):
+        if row['summary']:
+            chunk.append({
+                'name': row['name'],
+                'mbid': row['mbid'],
+                'summary': row['summary'],
+                'url': row['url']
+            })
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+class AdaptiveBatcher:
+    """
+    Cuts pending texts into request batches. The batch size halves when
+    the API rejects a batch as too large and doubles back (up to
+    max_size) after a run of successful batches.
     """
-    try:
-        # Initialize OpenAI client with SiliconFlow
-        client = OpenAI(
-            api_key=api_key,
-            base_url="https://api.siliconflow.cn/v1"
-        )
-
-        # Prepare texts for embedding (in batches to avoid API limits)
-        batch_size = 10  # Adjust based on API limits
-        all_embeddings = []
-
-        # Change default file extension to .pkl if using default name
-        if output_file == 'artist_embeddings.pkl':
-            output_file = 'artist_embeddings.pkl'
-
-        # If custom filename provided, ensure it has .pkl extension
-        if not output_file.endswith('.pkl'):
-            output_file = output_file.rsplit('.', 1)[0] + '.pkl'
-
-        output_dir = ensure_output_directory()
-        filepath = os.path.join(output_dir, output_file)
 
-        for i in range(0, len(artist_summaries), batch_size):
-            batch = artist_summaries[i:i + batch_size]
-            texts = [artist['summary'] for artist in batch]
+    def __init__(self, max_size: int = MAX_BATCH_SIZE, max_chars: int = MAX_BATCH_CHARS, grow_after: int = 4):
+        self.max_size = max_size
+        self.max_chars = max_chars
+        self.grow_after = grow_after
+        self.size = max_size
+        self.successes = 0
+
+    def take(self, pending: deque) -> List[tuple]:
+        batch, chars = [], 0
+        while pending and len(batch) < self.size:
+            key, text = pending[0]
+            if batch and chars + len(text) > self.max_chars:
+                break
+            batch.append(pending.popleft())
+            chars += len(text)
+        return batch
 
-            # Call the embeddings API
-            response = client.embeddings.create(
-                model="BAAI/bge-m3",  # Using a multi-language embedding model
-                input=texts
-            )
+    def succeeded(self):
+        self.successes += 1
+        if self.successes >= self.grow_after and self.size < self.max_size:
+            self.size = min(self.max_size, self.size * 2)
+            self.successes = 0
 
-            # Collect embeddings
-            for j, embedding_data in enumerate(response.data):
-                all_embeddings.append(embedding_data.embedding)
+    def too_large(self, batch_len: int):
+        # Several in-flight batches may be rejected together; shrink relative to each, not cumulatively
+        self.size = min(self.size, max(1, batch_len // 2))
+        self.successes = 0
 
-            print(f"Processed batch {i//batch_size + 1}/{(len(artist_summaries) - 1)//batch_size + 1}")
-            import time
-            time.sleep(2)
 
+def embed_texts(client: OpenAI, texts: List[str], model: str = EMBEDDING_MODEL,
+                cache: Optional[EmbeddingCache] = None, rate_limiter: Optional[TokenBucket] = None,
+                max_in_flight: int = EMBEDDING_MAX_IN_FLIGHT) -> List[np.ndarray]:
+    """
+    Embed texts, sending only those missing from the cache. Identical texts
+    are embedded once; up to max_in_flight batches run concurrently, each
+    taking a token from the shared rate limiter. New vectors are written
+    to the cache as each batch completes, so an interrupted run keeps its
+    progress.
+    """
+    rate_limiter = rate_limiter or TokenBucket(EMBEDDING_RATE_LIMIT)
+    keys = [text_hash(text) for text in texts]
+    vectors = cache.get_many(model, keys) if cache is not None else {}
+
+    pending = deque()
+    queued = set()
+    for key, text in zip(keys, texts):
+        if key not in vectors and key not in queued:
+            pending.append((key, text))
+            queued.add(key)
+    print(f"{len(texts)} texts: {sum(1 for key in keys if key in vectors)} cached, {len(pending)} to embed")
+
+    def embed_batch(batch):
+        rate_limiter.acquire()
+        response = client.embeddings.create(model=model, input=[text for _, text in batch])
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    batcher = AdaptiveBatcher()
+    total = len(pending)
+    rate_limit_retries = 0
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        while pending or in_flight:
+            while pending and len(in_flight) < max_in_flight:
+                batch = batcher.take(pending)
+                in_flight[executor.submit(embed_batch, batch)] = batch
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = in_flight.pop(future)
+                try:
+                    embeddings = future.result()
+                except openai.RateLimitError:
+                    # The client already retried; back off every worker and requeue the batch
+                    rate_limit_retries += 1
+                    if rate_limit_retries > MAX_RATE_LIMIT_RETRIES:
+                        raise
+                    delay = min(2 ** rate_limit_retries, 60) * (0.5 + random.random() / 2)
+                    print(f"Rate limited, pausing {delay:.1f}s")
+                    rate_limiter.pause(delay)
+                    pending.extendleft(reversed(batch))
+                    continue
+                except (openai.BadRequestError, openai.APIStatusError) as e:
+                    if len(batch) == 1 or getattr(e, 'status_code', None) not in (400, 413):
+                        raise
+                    # Batch too large for the API: split it and shrink later batches
+                    batcher.too_large(len(batch))
+                    print(f"Batch of {len(batch)} rejected ({e.status_code}), batch size now {batcher.size}")
+                    pending.extendleft(reversed(batch))
+                    continue
+
+                if len(embeddings) != len(batch):
+                    raise ValueError(f"Expected {len(batch)} embeddings, got {len(embeddings)}")
+                batcher.succeeded()
+                rate_limit_retries = 0
+                if cache is not None:
+                    cache.put_many(model, [(key, embedding) for (key, _), embedding in zip(batch, embeddings)])
+                for (key, _), embedding in zip(batch, embeddings):
+                    vectors[key] = np.asarray(embedding, dtype='float32')
+                print(f"Embedded {total - len(pending) - sum(len(b) for b in in_flight.values())}/{total}")
+
+    return [vectors[key] for key in keys]
+
+
+def open_store() -> EmbeddingStore:
+    """
+    Open the embedding store in the output directory
+    """
+    return EmbeddingStore(os.path.join(ensure_output_directory(), 'embedding_store'))
 
-        # Add embeddings to artist data
-        for i, artist in enumerate(artist_summaries):
-            artist['embedding'] = all_embeddings[i]
+def calculate_embeddings_siliconflow(artist_summaries: List[Dict], api_key: str, store: EmbeddingStore) -> int:
+    """
+    Use SiliconFlow API to calculate embeddings for summary strings and append them to the store.
+    Summaries already in the embedding cache are not sent again. Returns the number of rows added.
+    API errors are raised and leave the store unchanged; batches embedded before the
+    error are in the cache, so a rerun resumes from there.
+    """
+    metadata = [{'name': artist['name'], 'mbid': artist['mbid'], 'url': artist['url']} for artist in artist_summaries]
+    cache = open_cache(ensure_output_directory())
+    try:
+        # Initialize OpenAI client with SiliconFlow
+        client = OpenAI(
+            api_key=api_key,
+            base_url=SILICONFLOW_BASE_URL
+        )
 
-        # Save the artist summaries with embeddings to a pickle file
-        with open(filepath, 'wb') as f:
-            pickle.dump(artist_summaries, f)
+        # Errors propagate: nothing is appended unless every summary was embedded
+        all_embeddings = embed_texts(client, [artist['summary'] for artist in artist_summaries], cache=cache)
+        store.append(np.stack(all_embeddings) if all_embeddings else [], metadata)
 
-        print(f"Embeddings saved to {filepath}")
-        return filepath
+        print(f"Embeddings appended to {store.directory} ({len(store)} rows)")
+        return len(metadata)
+    finally:
+        cache.close()
 
-    except Exception as e:
-        print(f"Error calculating embeddings: {str(e)}")
-        # For demonstration purposes, we'll return random embeddings if API is not available
-        print("Using random embeddings for demonstration...")
-        for artist in artist_summaries:
-            # Generate a random embedding vector of 512 dimensions
-            artist['embedding'] = np.random.random(512).tolist()
-
-        # Change default file extension to .pkl if using default name
-        if output_file == 'artist_embeddings.pkl':
-            output_file = 'artist_embeddings.pkl'
-        # If custom filename provided, ensure it has .pkl extension
-        if not output_file.endswith('.pkl'):
-            output_file = output_file.rsplit('.', 1)[0] + '.pkl'
-
-        output_dir = ensure_output_directory()
-        filepath = os.path.join(output_dir, output_file)
-
-        # Save the artist summaries with random embeddings to a pickle file
-        with open(filepath, 'wb') as f:
-            pickle.dump(artist_summaries, f)
-
-        print(f"Random embeddings saved to {filepath}")
-        return filepath
-
-def create_vector_database(artist_with_embeddings: List[Dict]):
+def create_vector_database(embeddings: np.ndarray, backend: str = 'flat', params: Dict = None,
+                           source_path: str = None, metadata_source: str = None):
     """
-    Create a vector database using FAISS to store artist embeddings
+    Create a vector database using FAISS to store artist embeddings.
+    backend is 'flat' (exact), 'hnsw' or 'ivfpq' (approximate, see ann_index.py);
+    the index is saved and reused while the embeddings are unchanged.
     """
-    if not artist_with_embeddings:
+    if len(embeddings) == 0:
         print("No artists with embeddings to store")
-        return None, []
+        return None
 
-    # Extract embeddings as numpy array
-    embeddings_matrix = np.array([artist['embedding'] for artist in artist_with_embeddings]).astype('float32')
+    # The store's vectors are already L2-normalized, so inner product is cosine similarity
+    return get_index(embeddings, backend, params, source_path=source_path, metadata_source=metadata_source)
 
-    # Create FAISS index
-    dimension = len(artist_with_embeddings[0]['embedding'])
-    index = faiss.IndexFlatIP(dimension)  # Inner product for cosine similarity (after normalization)
-
-    # Normalize embeddings for cosine similarity
-    faiss.normalize_L2(embeddings_matrix)
-
-    # Add embeddings to the index
-    index.add(embeddings_matrix)
-
-    # Return the index and artist metadata list
-    return index, artist_with_embeddings
-
-def find_similar_artists(input_file: str = 'artist_embeddings.pkl', threshold: float = 0.3, top_k: int = 10):
+def knn_graph(index, embeddings: np.ndarray, top_k: int, threshold: float = None, block_rows: int = 2048):
     """
-    Find similar artists based on cosine similarity of embeddings loaded from a file
+    All-pairs kNN: search every row of the (normalized) matrix against the
+    index in blocks of block_rows queries, letting FAISS parallelize each
+    block. Each row's own hit is removed and neighbours at or below
+    threshold are masked. Returns (similarities, indices), both of shape
+    (n, top_k), sorted by similarity, with index -1 where there is no
+    neighbour.
     """
-    # Load embeddings from the pickle file in the output directory
-    output_dir = ensure_output_directory()
-    filepath = os.path.join(output_dir, input_file)
-    print(f"Loading embeddings from {filepath}")
-    with open(filepath, 'rb') as f:
-        artist_with_embeddings = pickle.load(f)
+    n = len(embeddings)
+    all_similarities = np.full((n, top_k), -np.inf, dtype='float32')
+    all_indices = np.full((n, top_k), -1, dtype='int64')
+    search_k = min(top_k + 1, index.ntotal)
+
+    for start in range(0, n, block_rows):
+        block = np.ascontiguousarray(embeddings[start:start + block_rows], dtype='float32')
+        similarities, indices = index.search(block, search_k)  # +1 to exclude the artist itself
+
+        rows = np.arange(start, start + len(block))[:, None]
+        drop = indices == rows
+        # Rows whose own vector was not returned (e.g. exact ties) drop their weakest hit instead
+        drop[:, -1] |= ~drop.any(axis=1)
+        drop |= indices < 0
+        # Stable sort moves dropped hits to the end while keeping the similarity order
+        order = np.argsort(drop, axis=1, kind='stable')[:, :top_k]
+        similarities = np.take_along_axis(similarities, order, axis=1)
+        indices = np.take_along_axis(indices, order, axis=1)
+        invalid = np.take_along_axis(drop, order, axis=1)
+        if threshold is not None:
+            invalid |= similarities <= threshold
+        similarities[invalid] = -np.inf
+        indices[invalid] = -1
+
+        width = similarities.shape[1]
+        all_similarities[start:start + len(block), :width] = similarities
+        all_indices[start:start + len(block), :width] = indices
+
+    return all_similarities, all_indices
+
+def save_knn_graph(similarities: np.ndarray, indices: np.ndarray, threshold: float, backend: str,
+                   filename: str = 'knn_graph.npz'):
+    """
+    Save the kNN arrays (row i = neighbours of store row i) for the map stage,
+    with the top_k, threshold and index backend they were computed with
+    """
+    filepath = os.path.join(ensure_output_directory(), filename)
+    tmp_path = filepath + '.tmp.npz'
+    np.savez(tmp_path, similarities=similarities, indices=indices.astype('int32'),
+             top_k=np.int32(indices.shape[1]),
+             threshold=np.float32(threshold if threshold is not None else -1.0),
+             backend=np.str_(backend))
+    os.replace(tmp_path, filepath)
+
+def find_similar_artists(store: EmbeddingStore = None, threshold: float = 0.3, top_k: int = 10,
+                         backend: str = 'flat', index_params: Dict = None):
+    """
+    Find similar artists based on cosine similarity of embeddings loaded from the store
+    """
+    if store is None:
+        store = open_store()
+    print(f"Loading embeddings from {store.directory}")
+    embeddings = store.load_vectors(mmap=True)
+    artist_metadata = store.load_metadata()
 
-    if not artist_with_embeddings:
+    if len(embeddings) == 0:
         print("No artists with embeddings to compare")
         return []
 
     # Create vector database
-    index, artist_metadata = create_vector_database(artist_with_embeddings)
+    index = create_vector_database(embeddings, backend, index_params, source_path=store.vectors_path,
+                                   metadata_source=store.metadata_path)
 
     if index is None:
         return []
 
-    similar_artists_results = []
-
-    # For each artist, find the top_k most similar artists
-    for i, artist in enumerate(artist_with_embeddings):
-        # Get the embedding of the current artist
-        current_embedding = np.array(artist['embedding']).astype('float32').reshape(1, -1)
-
-        # Normalize the embedding
-        faiss.normalize_L2(current_embedding)
+    similarities, indices = knn_graph(index, embeddings, top_k, threshold)
+    save_knn_graph(similarities, indices, threshold, backend)
 
-        # Search in the index for similar vectors
-        similarities, indices = index.search(current_embedding, top_k + 1)  # +1 to exclude the artist itself
+    similar_artists_results = []
 
+    for i, artist in enumerate(artist_metadata):
         similar_list = []
-        for j, (similarity, idx) in enumerate(zip(similarities[0], indices[0])):
-            # Skip the artist itself (highest similarity)
-            if idx == i:
-                continue
-
-            # Only include if similarity is above threshold
-            if similarity > threshold:
-                similar_artist = {
-                    'name': artist_metadata[idx]['name'],
-                    'similarity': float(similarity),
-                    'mbid': artist_metadata[idx]['mbid'],
-                    'url': artist_metadata[idx]['url']
-                }
-                similar_list.append(similar_artist)
-
-            # Stop when we have enough similar artists
-            if len(similar_list) >= top_k:
+        for similarity, idx in zip(similarities[i], indices[i]):
+            if idx < 0:
+                # Remaining neighbours were below the threshold
                 break
+            similar_list.append({
+                'name': artist_metadata[idx]['name'],
+                'similarity': float(similarity),
+                'mbid': artist_metadata[idx]['mbid'],
+                'url': artist_metadata[idx]['url']
+            })
 
         # Log results
         result_entry = {
@@ -262,23 +390,12 @@ def get_artist_detail_files():
     artist_details_files.sort()  # Sort to process in order (page_1, page_2, etc.)
     return artist_details_files
 
-def calculate_embeddings_4_detail_file(file_path: str, siliconflow_api_key: str):
+def calculate_embeddings_4_detail_file(file_path: str, siliconflow_api_key: str, store: EmbeddingStore) -> int:
     """
-    Process a single artist file to compute embeddings
+    Process a single artist file to compute embeddings and append them to the store
     """
     print(f"\nProcessing {os.path.basename(file_path)}...")
 
-    # Extract page number from filename to create corresponding output filename
-    filename_pattern = r'artist_details_page_(\d+)\.json'
-    import re
-    match = re.search(filename_pattern, os.path.basename(file_path))
-    if match:
-        page_num = match.group(1)
-        output_pickle_file = f"artist_embeddings_page_{page_num}.pkl"
-    else:
-        # Fallback if filename format doesn't match expected pattern
-        output_pickle_file = f"artist_embeddings_{os.path.basename(file_path).replace('.json', '.pkl')}"
-
     # Read and process the JSON file
     artists = read_json_file(os.path.basename(file_path))  # Use just the filename
     print(f"Found {len(artists)} artists in {os.path.basename(file_path)}")
@@ -287,61 +404,60 @@ def calculate_embeddings_4_detail_file(file_path: str, siliconflow_api_key: str)
     artist_summaries = extract_summary_field(artists)
     print(f"Found {len(artist_summaries)} artists with summary information")
 
-    # Calculate embeddings using SiliconFlow API (using first 30 for testing)
-    embeddings_file = calculate_embeddings_siliconflow(artist_summaries[0:30], siliconflow_api_key, output_file=output_pickle_file)
-
-    print(f"Embeddings saved to {os.path.basename(embeddings_file)}")
-    return embeddings_file
-
-
-def combine_all_embeddings(generated_pickle_files: List[str]):
-    """
-    Load data from all pickle files and combine them
-    """
-    print(f"\nCombining data from {len(generated_pickle_files)} pickle files...")
-    all_artist_data = []
-
-    for pickle_file in generated_pickle_files:
-        print(f"Loading data from {os.path.basename(pickle_file)}...")
-        # Load from the output directory
-        output_dir = ensure_output_directory()
-        pickle_file_path = os.path.join(output_dir, os.path.basename(pickle_file))
-        with open(pickle_file_path, 'rb') as f:
-            artist_data = pickle.load(f)
-            all_artist_data.extend(artist_data)  # Combine all artist data
-
-    print(f"Total artists in combined dataset: {len(all_artist_data)}")
-
-    # Save combined dataset to a single pickle file for similarity calculation
-    output_dir = ensure_output_directory()
-    combined_pickle_file = os.path.join(output_dir, 'artist_embeddings_combined.pkl')
-    with open(combined_pickle_file, 'wb') as f:
-        pickle.dump(all_artist_data, f)
-
-    print(f"Combined embeddings saved to {os.path.basename(combined_pickle_file)}")
-    return combined_pickle_file
+    # Calculate embeddings using SiliconFlow API
+    return calculate_embeddings_siliconflow(artist_summaries, siliconflow_api_key, store)
 
 
 
 if __name__ == "__main__":
-    # Get all artist detail files
-    artist_details_files = get_artist_detail_files()
-    print(f"Found {len(artist_details_files)} artist details files: {[os.path.basename(f) for f in artist_details_files]}")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Embed artist summaries and find similar artists")
+    parser.add_argument('--backend', choices=BACKENDS, default='flat',
+                        help='Index used for the kNN graph: exact flat, or approximate hnsw/ivfpq (default: flat)')
+    parser.add_argument('--ef-search', type=int, help='HNSW efSearch (recall/latency trade-off)')
+    parser.add_argument('--nprobe', type=int, help='IVF-PQ lists probed per query (recall/latency trade-off)')
+    parser.add_argument('--threshold', type=float, default=0.3, help='Minimum cosine similarity (default: 0.3)')
+    parser.add_argument('--top-k', type=int, default=10, help='Similar artists per artist (default: 10)')
+    parser.add_argument('--similarity-only', action='store_true',
+                        help='Skip embedding and reuse the existing embedding store')
+    args = parser.parse_args()
 
-    # Process each artist details file
     siliconflow_api_key = os.getenv("SILICONFLOW_API_KEY", "YOUR_API_KEY_HERE")
-    generated_pickle_files = []
+    store = open_store()
 
-    for file_path in artist_details_files:
-        embeddings_file = calculate_embeddings_4_detail_file(file_path, siliconflow_api_key)
-        generated_pickle_files.append(embeddings_file)
+    try:
+        if args.similarity_only:
+            print(f"Using existing embedding store ({len(store)} rows)")
+        elif dataset_path():
+            # Rebuild the store from scratch; unchanged summaries come from the embedding cache
+            store.reset()
+            # Stream the one-row-per-artist dataset written by get_artists.py
+            print(f"Reading artists from {os.path.basename(dataset_path())}")
+            for chunk_num, artist_summaries in enumerate(iter_dataset_summaries(), 1):
+                print(f"\nProcessing chunk {chunk_num} ({len(artist_summaries)} artists with summary information)...")
+                calculate_embeddings_siliconflow(artist_summaries, siliconflow_api_key, store)
+        else:
+            store.reset()
+            # Get all artist detail files
+            artist_details_files = get_artist_detail_files()
+            print(f"Found {len(artist_details_files)} artist details files: {[os.path.basename(f) for f in artist_details_files]}")
+
+            # Process each artist details file
+            for file_path in artist_details_files:
+                calculate_embeddings_4_detail_file(file_path, siliconflow_api_key, store)
+    except Exception as e:
+        # Never fill the store with placeholder vectors: the kNN graph, index and map are built from it
+        raise SystemExit(f"Error calculating embeddings: {e}\n"
+                         "Batches embedded so far are cached; rerun to continue.")
 
-    # Combine all embeddings and calculate similarities
-    combined_pickle_file = combine_all_embeddings(generated_pickle_files)
+    print(f"Total artists in embedding store: {len(store)}")
 
-    # Calculate similarity using the combined embeddings file
+    # Calculate similarity using the store
     print("Calculating similarities on combined dataset...")
-    artist_similarity_results = find_similar_artists(os.path.basename(combined_pickle_file), threshold=0.3, top_k=10)
+    artist_similarity_results = find_similar_artists(
+        store, threshold=args.threshold, top_k=args.top_k, backend=args.backend,
+        index_params={'ef_search': args.ef_search, 'nprobe': args.nprobe})
 
     # Save results to JSON
     save_artist_similarity_results(artist_similarity_results)
@@ -349,4 +465,4 @@ if __name__ == "__main__":
     # Print a few examples
     for i, artist in enumerate(artist_similarity_results[:5]):  # Show more examples
         print(f"\nArtist {i+1}: {artist['artist']}")
-        print(f"Similar artists: {[s['name'] for s in artist['similar_artists']]}")
\ No newline at end of file
+        print(f"Similar artists: {[s['name'] for s in artist['similar_artists']]}")
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Map stage: cluster the artist similarity graph and lay it out in 2D.
+1. Build a symmetric sparse (CSR) similarity graph from the kNN results
+2. Leiden community detection at two nested levels: communities at a fine
+   resolution, grouped into regions at a coarse resolution (leidenalg and
+   python-igraph are optional; without them label propagation is used)
+3. 2D layout: spectral initialisation refined by UMAP-style stochastic
+   gradient descent over the edges with negative sampling, so an epoch
+   costs O(edges) rather than O(n^2)
+4. Compact columnar JSON for the map front end (output/post_rock_map.json)
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import ArpackNoConvergence, eigsh
+from scipy.spatial import ConvexHull, QhullError
+
+try:
+    import igraph as ig
+    import leidenalg as la
+except ImportError:  # Optional: fall back to label propagation
+    ig = None
+    la = None
+
+from artist_dataset import dataset_path, iter_dataset
+from embedding_store import EmbeddingStore
+
+# UMAP curve parameters for min_dist=0.1, spread=1.0
+UMAP_A = 1.577
+UMAP_B = 0.895
+MAP_SIZE = 1000.0
+
+
+def ensure_output_directory():
+    """
+    Ensure the output directory exists in the same directory as the script
+    """
+    output_dir = os.path.join(os.path.dirname(__file__), 'output')
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
+
+
+def load_knn(store: EmbeddingStore, top_k: int, threshold: float, backend: str = 'flat',
+             recompute: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The kNN arrays saved by find_similar_artists, narrowed to top_k and
+    threshold. They are recomputed if they are missing, older than the
+    embedding store, for a different row count or backend, or saved with a
+    smaller top_k or a higher threshold than requested.
+    """
+    path = os.path.join(ensure_output_directory(), 'knn_graph.npz')
+    if not recompute and os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(store.vectors_path):
+        data = np.load(path)
+        saved_k = int(data['top_k'])
+        saved_threshold = float(data['threshold'])
+        # -1 marks a graph saved without a threshold; float32 storage needs a tolerance
+        covers_threshold = saved_threshold == -1.0 or (threshold is not None and saved_threshold <= threshold + 1e-6)
+        if (len(data['indices']) == len(store) and str(data['backend']) == backend
+                and saved_k >= top_k and covers_threshold):
+            similarities = data['similarities'][:, :top_k].copy()
+            indices = data['indices'][:, :top_k].astype('int64')
+            if threshold is not None:
+                below = similarities <= threshold
+                similarities[below] = -np.inf
+                indices[below] = -1
+            print(f"Loaded {backend} kNN graph from {path} (saved with top_k={saved_k}, "
+                  f"threshold={'none' if saved_threshold == -1.0 else f'{saved_threshold:g}'})")
+            return similarities, indices
+        print(f"Saved kNN graph does not cover backend={backend}, top_k={top_k}, threshold={threshold}; recomputing")
+
+    from artist_embeddings import create_vector_database, knn_graph, save_knn_graph
+
+    start = time.perf_counter()
+    embeddings = store.load_vectors(mmap=True)
+    index = create_vector_database(embeddings, backend, source_path=store.vectors_path,
+                                   metadata_source=store.metadata_path)
+    similarities, indices = knn_graph(index, embeddings, top_k, threshold)
+    save_knn_graph(similarities, indices, threshold, backend)
+    print(f"Computed kNN graph with the {backend} index in {time.perf_counter() - start:.1f}s")
+    return similarities, indices
+
+
+def build_graph(similarities: np.ndarray, indices: np.ndarray, min_similarity: float = None) -> sp.csr_matrix:
+    """
+    Symmetric weighted adjacency matrix: an edge i-j exists if either is in
+    the other's kNN list, weighted by their cosine similarity
+    """
+    n, k = indices.shape
+    rows = np.repeat(np.arange(n), k)
+    cols = indices.ravel()
+    weights = similarities.ravel().astype('float32')
+    keep = (cols >= 0) & (cols != rows)
+    if min_similarity is not None:
+        keep &= weights > min_similarity
+    graph = sp.csr_matrix((weights[keep], (rows[keep], cols[keep])), shape=(n, n))
+    graph = graph.maximum(graph.T).tocsr()
+    graph.eliminate_zeros()
+    return graph
+
+
+def relabel_by_size(labels: np.ndarray) -> np.ndarray:
+    """
+    Renumber labels 0..m-1, largest group first
+    """
+    unique, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    rank = np.empty(len(unique), dtype='int64')
+    rank[np.argsort(-counts, kind='stable')] = np.arange(len(unique))
+    return rank[inverse]
+
+
+def leiden_two_level(graph: sp.csr_matrix, fine_resolution: float, coarse_resolution: float,
+                     seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Leiden communities at fine_resolution, then Leiden on the graph of
+    those communities at coarse_resolution, so every community lies in
+    exactly one region. Uses the RB configuration (modularity) model.
+    """
+    upper = sp.triu(graph, k=1).tocoo()
+    g = ig.Graph(n=graph.shape[0], edges=np.column_stack([upper.row, upper.col]).tolist(),
+                 edge_attrs={'weight': upper.data.astype(float).tolist()})
+
+    fine = la.find_partition(g, la.RBConfigurationVertexPartition, weights='weight',
+                             resolution_parameter=fine_resolution, n_iterations=-1, seed=seed)
+    aggregate = fine.aggregate_partition()
+    aggregate.resolution_parameter = coarse_resolution
+    optimiser = la.Optimiser()
+    optimiser.set_rng_seed(seed)
+    optimiser.optimise_partition(aggregate, n_iterations=-1)
+
+    communities = np.asarray(fine.membership)
+    regions = np.asarray(aggregate.membership)[communities]
+    return relabel_by_size(communities), relabel_by_size(regions)
+
+
+def label_propagation(graph: sp.csr_matrix, seed: int = 42, max_iterations: int = 50) -> np.ndarray:
+    """
+    Weighted label propagation: each node repeatedly takes the label with the
+    largest total edge weight among its neighbours. Half the nodes, chosen at
+    random, update per round, which stops synchronous oscillation.
+    """
+    rng = np.random.default_rng(seed)
+    n = graph.shape[0]
+    labels = np.arange(n)
+    has_edges = np.diff(graph.indptr) > 0
+    for _ in range(max_iterations):
+        membership = sp.csr_matrix((np.ones(n, dtype='float32'), (np.arange(n), labels)), shape=(n, n))
+        best = np.asarray((graph @ membership).argmax(axis=1)).ravel()
+        update = has_edges & (rng.random(n) < 0.5) & (best != labels)
+        if update.sum() < max(1, n // 1000):
+            break
+        labels[update] = best[update]
+    return labels
+
+
+def propagation_two_level(graph: sp.csr_matrix, seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fallback without leidenalg: label propagation on the graph, then on
+    the graph of the resulting communities
+    """
+    communities = relabel_by_size(label_propagation(graph, seed))
+    m = communities.max() + 1
+    membership = sp.csr_matrix((np.ones(len(communities)), (np.arange(len(communities)), communities)),
+                               shape=(len(communities), m))
+    community_graph = (membership.T @ graph @ membership).tocsr()
+    community_graph.setdiag(0)
+    community_graph.eliminate_zeros()
+    regions = relabel_by_size(label_propagation(community_graph, seed))
+    return communities, regions[communities]
+
+
+def spectral_init(graph: sp.csr_matrix, seed: int = 42) -> np.ndarray:
+    """
+    Initial coordinates from the 2nd and 3rd leading eigenvectors of the
+    normalized adjacency matrix, scaled to a 10x10 box. Falls back to
+    random positions if ARPACK does not converge.
+    """
+    rng = np.random.default_rng(seed)
+    n = graph.shape[0]
+    degree = np.asarray(graph.sum(axis=1)).ravel()
+    scale = np.zeros(n)
+    scale[degree > 0] = 1 / np.sqrt(degree[degree > 0])
+    normalized = sp.diags(scale) @ graph @ sp.diags(scale)
+    try:
+        values, vectors = eigsh(normalized, k=3, which='LA', tol=1e-4, v0=rng.random(n), maxiter=max(1000, n))
+        coords = vectors[:, np.argsort(-values)[1:3]]
+    except (ArpackNoConvergence, ValueError):
+        print("Spectral initialisation did not converge, using random initialisation")
+        coords = rng.random((n, 2))
+    coords = coords - coords.min(axis=0)
+    coords = 10 * coords / np.maximum(coords.max(axis=0), 1e-12)
+    # Jitter separates nodes with identical eigenvector entries (e.g. isolated ones)
+    coords += rng.normal(scale=1e-2, size=coords.shape)
+    isolated = degree == 0
+    coords[isolated] = rng.random((isolated.sum(), 2)) * 10
+    return coords.astype('float32')
+
+
+def umap_layout(graph: sp.csr_matrix, init: np.ndarray, epochs: int = 200, negative_samples: int = 5,
+                seed: int = 42, verbose: bool = True) -> np.ndarray:
+    """
+    UMAP-style force layout on the graph. Each epoch samples edges with
+    probability proportional to their weight, pulls their endpoints
+    together and pushes each endpoint away from negative_samples random
+    nodes. Updates are applied per epoch in vectorized form (the per-node
+    step is averaged over its updates and clipped), with a learning rate
+    decaying linearly to zero.
+    """
+    rng = np.random.default_rng(seed)
+    n = graph.shape[0]
+    upper = sp.triu(graph, k=1).tocoo()
+    heads, tails = upper.row.astype('int64'), upper.col.astype('int64')
+    probability = upper.data / upper.data.max() if len(upper.data) else upper.data
+    coords = init.astype('float32').copy()
+    a, b = UMAP_A, UMAP_B
+    start = time.perf_counter()
+
+    for epoch in range(epochs):
+        learning_rate = 1.0 - epoch / epochs
+        sampled = rng.random(len(heads)) < probability
+        head, tail = heads[sampled], tails[sampled]
+
+        # Attraction along sampled edges
+        diff = coords[head] - coords[tail]
+        dist2 = np.einsum('ij,ij->i', diff, diff)
+        attract = np.zeros_like(dist2)
+        positive = dist2 > 0
+        attract[positive] = (-2 * a * b * dist2[positive] ** (b - 1)) / (1 + a * dist2[positive] ** b)
+        grad = np.clip(attract[:, None] * diff, -4, 4)
+
+        # Repulsion from random nodes, for both endpoints
+        sources = np.repeat(np.concatenate([head, tail]), negative_samples)
+        others = rng.integers(0, n, size=len(sources))
+        ndiff = coords[sources] - coords[others]
+        ndist2 = np.einsum('ij,ij->i', ndiff, ndiff)
+        repulse = (2 * b) / ((0.001 + ndist2) * (1 + a * ndist2 ** b))
+        repulse[sources == others] = 0
+        ngrad = np.clip(repulse[:, None] * ndiff, -4, 4)
+
+        step = np.zeros_like(coords)
+        for dim in range(2):
+            step[:, dim] = (np.bincount(head, grad[:, dim], n) - np.bincount(tail, grad[:, dim], n)
+                            + np.bincount(sources, ngrad[:, dim], n))
+        updates = (np.bincount(head, minlength=n) + np.bincount(tail, minlength=n)) * (1 + negative_samples)
+        step /= np.maximum(updates, 1)[:, None]
+        coords += learning_rate * np.clip(step, -4, 4)
+
+        if verbose and (epoch + 1) % 50 == 0:
+            print(f"  layout epoch {epoch + 1}/{epochs} ({time.perf_counter() - start:.1f}s)")
+
+    return coords
+
+
+def load_tags(names: List[str]) -> Optional[List[List[str]]]:
+    """
+    Tags per artist from the artist dataset, or None if it is not available
+    """
+    if not dataset_path():
+        return None
+    try:
+        tags_by_name = {row['name']: row['tags'] or [] for row in iter_dataset(columns=['name', 'tags'])}
+    except ImportError:
+        return None
+    return [tags_by_name.get(name, []) for name in names]
+
+
+def describe_groups(labels: np.ndarray, coords: np.ndarray, degree: np.ndarray, names: List[str],
+                    tags: Optional[List[List[str]]], common_tags: set, hulls: bool,
+                    parent: np.ndarray = None) -> List[Dict]:
+    """
+    Per-group summary: size, centroid, best-connected artist as label, most
+    distinctive tags and, for regions, a convex-hull boundary around the
+    central 90% of the members
+    """
+    order = np.argsort(labels, kind='stable')
+    bounds = np.searchsorted(labels[order], np.arange(labels.max() + 2))
+    groups = []
+    for group in range(labels.max() + 1):
+        members = order[bounds[group]:bounds[group + 1]]
+        points = coords[members]
+        centroid = points.mean(axis=0)
+        entry = {
+            'id': int(group),
+            'size': int(len(members)),
+            'x': round(float(centroid[0]), 2),
+            'y': round(float(centroid[1]), 2),
+            'label': names[members[np.argmax(degree[members])]]
+        }
+        if parent is not None:
+            entry['region'] = int(parent[members[0]])
+        if tags is not None:
+            counts = Counter(tag for member in members for tag in tags[member] if tag not in common_tags)
+            entry['tags'] = [tag for tag, _ in counts.most_common(3)]
+        if hulls and len(members) >= 3:
+            distance = np.linalg.norm(points - centroid, axis=1)
+            core = points[distance <= np.percentile(distance, 90)]
+            try:
+                hull = ConvexHull(core)
+                entry['hull'] = np.round(core[hull.vertices], 1).tolist()
+            except (QhullError, ValueError):
+                pass
+        groups.append(entry)
+    return groups
+
+
+def build_map(store: EmbeddingStore, top_k: int = 10, threshold: float = 0.3, backend: str = 'flat',
+              fine_resolution: float = 3.0, coarse_resolution: float = 1.0, epochs: int = 200,
+              edges_per_node: int = 3, seed: int = 42, recompute_knn: bool = False) -> Dict:
+    """
+    Run the whole map stage and return the JSON document
+    """
+    timings = {}
+    names = [row['name'] for row in store.load_metadata()]
+    n = len(names)
+
+    start = time.perf_counter()
+    similarities, indices = load_knn(store, top_k, threshold, backend, recompute_knn)
+    graph = build_graph(similarities, indices, threshold)
+    timings['graph'] = time.perf_counter() - start
+    print(f"Graph: {n} artists, {graph.nnz // 2} edges")
+
+    start = time.perf_counter()
+    if la is not None:
+        communities, regions = leiden_two_level(graph, fine_resolution, coarse_resolution, seed)
+        method = 'leiden'
+    else:
+        print("leidenalg/python-igraph not installed, using label propagation (resolutions are ignored)")
+        communities, regions = propagation_two_level(graph, seed)
+        method = 'label_propagation'
+    timings['clustering'] = time.perf_counter() - start
+    print(f"Clustering ({method}): {communities.max() + 1} communities in {regions.max() + 1} regions")
+
+    start = time.perf_counter()
+    coords = umap_layout(graph, spectral_init(graph, seed), epochs=epochs, seed=seed)
+    low, high = np.percentile(coords, 0.5, axis=0), np.percentile(coords, 99.5, axis=0)
+    coords = np.clip((coords - low) / np.maximum(high - low, 1e-12), 0, 1).astype('float64') * MAP_SIZE
+    timings['layout'] = time.perf_counter() - start
+
+    degree = np.diff(graph.indptr)
+    tags = load_tags(names)
+    common_tags = set()
+    if tags is not None:
+        tag_counts = Counter(tag for artist_tags in tags for tag in set(artist_tags))
+        common_tags = {tag for tag, count in tag_counts.items() if count > n / 2}
+
+    # Strongest edges per node, for drawing
+    strongest = np.where(indices[:, :edges_per_node] >= 0, indices[:, :edges_per_node], -1)
+    rows = np.repeat(np.arange(n), strongest.shape[1])
+    cols = strongest.ravel()
+    keep = cols >= 0
+    pairs = np.unique(np.sort(np.column_stack([rows[keep], cols[keep]]), axis=1), axis=0)
+    pair_weights = np.asarray(graph[pairs[:, 0], pairs[:, 1]]).ravel() if len(pairs) else np.zeros(0)
+
+    return {
+        'version': 1,
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': {'top_k': top_k, 'threshold': threshold, 'backend': backend, 'clustering': method,
+                   'fine_resolution': fine_resolution, 'coarse_resolution': coarse_resolution,
+                   'epochs': epochs, 'seed': seed, 'map_size': MAP_SIZE},
+        'timings_seconds': {key: round(value, 2) for key, value in timings.items()},
+        'artists': {
+            'name': names,
+            'x': np.round(coords[:, 0], 1).tolist(),
+            'y': np.round(coords[:, 1], 1).tolist(),
+            'community': communities.tolist(),
+            'region': regions.tolist(),
+            'degree': degree.tolist()
+        },
+        'edges': {
+            'source': pairs[:, 0].tolist(),
+            'target': pairs[:, 1].tolist(),
+            'weight': np.round(pair_weights, 3).tolist()
+        },
+        'communities': describe_groups(communities, coords, degree, names, tags, common_tags,
+                                       hulls=False, parent=regions),
+        'regions': describe_groups(regions, coords, degree, names, tags, common_tags, hulls=True)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cluster the artist similarity graph and compute the 2D map")
+    parser.add_argument('--top-k', type=int, default=10, help='Neighbours per artist (default: 10)')
+    parser.add_argument('--threshold', type=float, default=0.3, help='Minimum cosine similarity (default: 0.3)')
+    parser.add_argument('--backend', default='flat', choices=['flat', 'hnsw', 'ivfpq'],
+                        help='Index used if the kNN graph has to be recomputed (default: flat)')
+    parser.add_argument('--recompute-knn', action='store_true', help='Ignore the saved kNN graph')
+    parser.add_argument('--fine-resolution', type=float, default=3.0,
+                        help='Leiden resolution for communities (default: 3.0)')
+    parser.add_argument('--coarse-resolution', type=float, default=1.0,
+                        help='Leiden resolution for regions, 1.0 is plain modularity (default: 1.0)')
+    parser.add_argument('--epochs', type=int, default=200, help='Layout epochs (default: 200)')
+    parser.add_argument('--edges-per-node', type=int, default=3, help='Strongest edges per artist in the output')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--output', default='post_rock_map.json', help='Output file name in output/')
+    args = parser.parse_args()
+
+    store = EmbeddingStore(os.path.join(ensure_output_directory(), 'embedding_store'))
+    if len(store) == 0:
+        raise SystemExit("The embedding store is empty; run artist_embeddings.py first")
+
+    total_start = time.perf_counter()
+    document = build_map(store, args.top_k, args.threshold, args.backend, args.fine_resolution,
+                         args.coarse_resolution, args.epochs, args.edges_per_node, args.seed, args.recompute_knn)
+
+    output_path = os.path.join(ensure_output_directory(), args.output)
+    with open(output_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(output_path + '.tmp', output_path)
+    print(f"Map with {len(store)} artists saved to {output_path} "
+          f"({os.path.getsize(output_path) / 1024 ** 2:.1f} MB) in {time.perf_counter() - total_start:.1f}s")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Append-only NDJSON journal of the Last.fm crawl.
+Every fetched artist is written (and flushed) as one line the moment it
+arrives, so an interrupted crawl can be resumed: a rerun replays the
+journal, skips artists that are already done and retries only the ones
+recorded as errors.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Record status values
+STATUS_OK = "ok"            # artist.getinfo returned the artist
+STATUS_MISSING = "missing"  # Last.fm error 6, artist not found; not retried
+STATUS_ERROR = "error"      # request or API call failed after all retries; retried on the next run
+
+# Last.fm error code for an unknown artist
+ERROR_NOT_FOUND = 6
+
+
+def artist_status(data: Dict[str, Any]) -> str:
+    """
+    Status of an artist.getinfo result. Only "artist not found" is
+    permanent; any other API error (rate limit, temporary failure, ...)
+    or a failed request is an error to retry.
+    """
+    if "artist" in data:
+        return STATUS_OK
+    if "exception" not in data and data.get("error") == ERROR_NOT_FOUND:
+        return STATUS_MISSING
+    return STATUS_ERROR
+
+
+class CrawlJournal:
+    """
+    Durable crawl state backed by an append-only NDJSON file.
+
+    Two kinds of lines are written:
+      {"kind": "listing", "pages": N, ...}       when the tag listing is complete
+      {"kind": "artist", "name": ..., "page": p, "status": ..., "fetched_at": ..., "data": {...}}
+
+    Later lines win, so retries and refreshes simply append. A torn last
+    line left by a crash is ignored on load.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.artists: Dict[str, Dict[str, Any]] = {}
+        self.listing: Optional[Dict[str, Any]] = None
+        self.load()
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def load(self):
+        """
+        Replay the journal into memory
+        """
+        if not os.path.exists(self.path):
+            return
+        valid_bytes = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn write from a crash: keep everything before it
+                    break
+                valid_bytes += len(line)
+                if record.get("kind") == "listing":
+                    self.listing = record
+                elif record.get("kind") == "artist":
+                    self.artists[record["name"]] = record
+        if valid_bytes < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_bytes)
+
+    def _append(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+    def record_listing(self, pages: int, **extra):
+        """
+        Mark the tag listing (step 1) as complete with `pages` pages
+        """
+        record = {"kind": "listing", "pages": pages, "fetched_at": time.time(), **extra}
+        self._append(record)
+        self.listing = record
+
+    def record_artist(self, name: str, page: int, data: Dict[str, Any]):
+        """
+        Journal one artist.getinfo result (or the error record that replaced it).
+        A failed refetch does not overwrite an earlier good record.
+        """
+        status = artist_status(data)
+        if status == STATUS_ERROR and self.is_done(name):
+            return
+        record = {"kind": "artist", "name": name, "page": page, "status": status,
+                  "fetched_at": time.time(), "data": data}
+        self._append(record)
+        with self.lock:
+            self.artists[name] = record
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.artists.get(name)
+
+    def is_done(self, name: str) -> bool:
+        """
+        True if the artist has a result that does not need refetching
+        """
+        record = self.artists.get(name)
+        return record is not None and record["status"] != STATUS_ERROR
+
+    def is_stale(self, name: str, max_age: float, now: float = None) -> bool:
+        """
+        True if the artist's latest record is older than max_age seconds
+        """
+        record = self.artists.get(name)
+        if record is None:
+            return False
+        return (now or time.time()) - record["fetched_at"] > max_age
+
+    def compact(self):
+        """
+        Rewrite the journal with only the latest record per artist
+        """
+        with self.lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                if self.listing:
+                    f.write(json.dumps(self.listing, ensure_ascii=False) + "\n")
+                for record in self.artists.values():
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.file.close()
+            os.replace(tmp_path, self.path)
+            self.file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        self.file.close()
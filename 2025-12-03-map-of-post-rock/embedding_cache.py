@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Persistent embedding cache keyed by model name and the SHA-256 of the
+input text, so re-running the embedding stage only pays for summaries
+that are new or have changed
+"""
+
+import hashlib
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# SQLite limits the number of bound parameters per statement
+LOOKUP_CHUNK = 500
+
+
+def text_hash(text: str) -> str:
+    """
+    Cache key for a text: hex SHA-256 of its UTF-8 bytes
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    SQLite table of float32 vectors, one row per (model, text hash).
+    Vectors are stored as raw little-endian float32 bytes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+        """)
+        self.conn.commit()
+
+    def get_many(self, model: str, hashes: Iterable[str]) -> Dict[str, np.ndarray]:
+        """
+        Cached vectors for the given hashes; missing hashes are left out
+        """
+        hashes = list(dict.fromkeys(hashes))
+        found = {}
+        for start in range(0, len(hashes), LOOKUP_CHUNK):
+            chunk = hashes[start:start + LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model, *chunk])
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype='<f4')
+        return found
+
+    def put_many(self, model: str, items: List[Tuple[str, List[float]]]):
+        """
+        Store (hash, vector) pairs, replacing existing entries
+        """
+        rows = []
+        for key, vector in items:
+            array = np.asarray(vector, dtype='<f4')
+            rows.append((model, key, len(array), array.tobytes()))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector) VALUES (?, ?, ?, ?)", rows)
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+def open_cache(output_dir: str) -> EmbeddingCache:
+    """
+    Open the embedding cache in the output directory
+    """
+    return EmbeddingCache(os.path.join(output_dir, 'embedding_cache.db'))
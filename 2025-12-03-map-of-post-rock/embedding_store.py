@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Append-only embedding store: one contiguous float32 .npy matrix plus an
+NDJSON metadata table with one line per row. The matrix is opened with
+np.load(mmap_mode='r'), so similarity search can use millions of vectors
+without loading or copying them, and adding a page of embeddings is an
+append rather than a rewrite.
+"""
+
+import json
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+
+VECTORS_FILE = "vectors.npy"
+METADATA_FILE = "metadata.ndjson"
+DTYPE = np.dtype('<f4')
+
+
+class EmbeddingStore:
+    """
+    Row i of vectors.npy belongs to line i of metadata.ndjson.
+    Vectors are L2-normalized on append, so inner product is cosine similarity.
+
+    An append writes the new rows, then the metadata lines, and finally
+    rewrites the .npy header with the new row count. The header is the
+    commit point: rows or metadata lines past it (left by a crash) are
+    truncated the next time the store is opened.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, VECTORS_FILE)
+        self.metadata_path = os.path.join(directory, METADATA_FILE)
+        self.rows = 0
+        self.dim = None
+        self.header_size = None
+        self._recover()
+
+    def _read_header(self):
+        with open(self.vectors_path, 'rb') as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            header_size = f.tell()
+        if dtype != DTYPE or fortran_order or len(shape) != 2:
+            raise ValueError(f"{self.vectors_path} is not a C-ordered float32 matrix")
+        return shape, header_size
+
+    def _write_header(self, f, rows: int):
+        f.seek(0)
+        np.lib.format.write_array_header_1_0(
+            f, {'descr': np.lib.format.dtype_to_descr(DTYPE), 'fortran_order': False, 'shape': (rows, self.dim)})
+        if f.tell() != self.header_size:
+            raise RuntimeError("Array header changed size; cannot update it in place")
+
+    def _recover(self):
+        """
+        Load the committed row count and drop anything written after it
+        """
+        if not os.path.exists(self.vectors_path):
+            if os.path.exists(self.metadata_path):
+                os.remove(self.metadata_path)
+            return
+        (self.rows, self.dim), self.header_size = self._read_header()
+
+        committed_bytes = self.header_size + self.rows * self.dim * DTYPE.itemsize
+        if os.path.getsize(self.vectors_path) > committed_bytes:
+            with open(self.vectors_path, 'r+b') as f:
+                f.truncate(committed_bytes)
+
+        lines, valid_bytes = 0, 0
+        if not os.path.exists(self.metadata_path):
+            open(self.metadata_path, 'w').close()
+        with open(self.metadata_path, 'rb') as f:
+            for line in f:
+                if lines == self.rows or not line.endswith(b"\n"):
+                    break
+                lines += 1
+                valid_bytes += len(line)
+        if lines < self.rows:
+            raise ValueError(f"{self.metadata_path} has {lines} rows but {self.vectors_path} has {self.rows}")
+        if os.path.getsize(self.metadata_path) > valid_bytes:
+            with open(self.metadata_path, 'r+b') as f:
+                f.truncate(valid_bytes)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def reset(self):
+        """
+        Delete all rows
+        """
+        for path in (self.vectors_path, self.metadata_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.rows = 0
+        self.dim = None
+        self.header_size = None
+
+    def append(self, vectors: np.ndarray, metadata: List[Dict[str, Any]]):
+        """
+        Append rows of embeddings with one metadata dict per row
+        """
+        vectors = np.array(vectors, dtype=DTYPE, ndmin=2)
+        if len(vectors) != len(metadata):
+            raise ValueError(f"Got {len(vectors)} vectors but {len(metadata)} metadata rows")
+        if len(vectors) == 0:
+            return
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms > 0, norms, 1)
+
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            with open(self.vectors_path, 'wb') as f:
+                np.lib.format.write_array_header_1_0(
+                    f, {'descr': np.lib.format.dtype_to_descr(DTYPE), 'fortran_order': False, 'shape': (0, self.dim)})
+                self.header_size = f.tell()
+            open(self.metadata_path, 'w').close()
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+        with open(self.vectors_path, 'r+b') as f:
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(vectors).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+            with open(self.metadata_path, 'a', encoding='utf-8') as meta:
+                for row in metadata:
+                    meta.write(json.dumps(row, ensure_ascii=False) + "\n")
+                meta.flush()
+                os.fsync(meta.fileno())
+            # Commit: publish the new row count
+            self._write_header(f, self.rows + len(vectors))
+            f.flush()
+        self.rows += len(vectors)
+
+    def load_vectors(self, mmap: bool = True) -> np.ndarray:
+        """
+        The (rows, dim) float32 matrix, memory-mapped read-only by default
+        """
+        if self.rows == 0:
+            return np.zeros((0, self.dim or 0), dtype=DTYPE)
+        return np.load(self.vectors_path, mmap_mode='r' if mmap else None)
+
+    def load_metadata(self) -> List[Dict[str, Any]]:
+        """
+        Metadata rows, in vector order
+        """
+        rows = []
+        with open(self.metadata_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if len(rows) == self.rows:
+                    break
+                rows.append(json.loads(line))
+        return rows
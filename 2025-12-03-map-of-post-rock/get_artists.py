@@ -5,11 +5,23 @@ Script to get artist information data following the spec:
 2. Get detailed info for each artist
 """
 
+import argparse
+import glob
 import os
+import re
 import requests
 import json
 import time
-from typing import List, Dict, Any
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from requests.adapters import HTTPAdapter
+
+from artist_dataset import build_dataset
+from crawl_journal import CrawlJournal, STATUS_ERROR
+from rate_limit import TokenBucket
 
 
 def ensure_output_directory():
@@ -30,6 +42,92 @@ BASE_URL = "http://ws.audioscrobbler.com/2.0/"
 TAG = "post-rock"
 LIMIT = 1000
 
+# Last.fm allows about 5 requests per second per API key; all workers share one bucket
+RATE_LIMIT = float(os.getenv("LASTFM_RATE_LIMIT", "5"))
+MAX_WORKERS = int(os.getenv("LASTFM_WORKERS", "8"))
+MAX_RETRIES = 5
+REQUEST_TIMEOUT = 30
+
+# HTTP statuses and Last.fm error codes worth retrying:
+# 8 operation failed, 11 service offline, 16 temporarily unavailable, 29 rate limit exceeded
+RETRY_STATUS = {429, 500, 502, 503, 504}
+RETRY_API_ERRORS = {8, 11, 16, 29}
+
+rate_limiter = TokenBucket(RATE_LIMIT)
+_thread_local = threading.local()
+
+
+def get_session() -> requests.Session:
+    """
+    One pooled keep-alive session per worker thread
+    """
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _thread_local.session = session
+    return session
+
+
+def retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """
+    Exponential backoff with jitter, or the server's Retry-After when given
+    """
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+    return min(2 ** attempt, 30) * (0.5 + random.random() / 2)
+
+
+def lastfm_request(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Rate-limited Last.fm API call, retried with backoff on 429, 5xx,
+    connection errors and transient API error codes
+    """
+    params = dict(params, api_key=API_KEY, format="json")
+    for attempt in range(MAX_RETRIES + 1):
+        rate_limiter.acquire()
+        rate_limited = False
+        try:
+            response = get_session().get(BASE_URL, params=params, timeout=REQUEST_TIMEOUT)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt >= MAX_RETRIES:
+                raise
+            delay = retry_delay(attempt)
+            reason = str(e)
+        else:
+            if response.status_code in RETRY_STATUS:
+                if attempt >= MAX_RETRIES:
+                    response.raise_for_status()
+                delay = retry_delay(attempt, response.headers.get("Retry-After"))
+                reason = f"HTTP {response.status_code}"
+                rate_limited = response.status_code == 429
+            else:
+                # Last.fm reports some failures, including rate limiting, as JSON errors
+                try:
+                    data = response.json()
+                except ValueError:
+                    response.raise_for_status()
+                    raise
+                error_code = data.get("error") if isinstance(data, dict) else None
+                if error_code in RETRY_API_ERRORS and attempt < MAX_RETRIES:
+                    delay = retry_delay(attempt)
+                    reason = f"API error {error_code}: {data.get('message')}"
+                    rate_limited = error_code == 29
+                else:
+                    response.raise_for_status()
+                    return data
+
+        if rate_limited:
+            # Rate limited: hold back every worker, not just this one
+            rate_limiter.pause(delay)
+        print(f"    Retrying in {delay:.1f}s ({reason})")
+        time.sleep(delay)
+
 def get_top_artists_by_tag(tag: str, page: int = 1) -> Dict[str, Any]:
     """
     Get top artists for a given tag
@@ -37,16 +135,11 @@ def get_top_artists_by_tag(tag: str, page: int = 1) -> Dict[str, Any]:
     params = {
         "method": "tag.gettopartists",
         "tag": tag,
-        "api_key": API_KEY,
-        "format": "json",
         "limit": LIMIT,
         "page": page
     }
     
-    response = requests.get(BASE_URL, params=params)
-    response.raise_for_status()
-    
-    return response.json()
+    return lastfm_request(params)
 
 def get_artist_info(artist_name: str) -> Dict[str, Any]:
     """
@@ -54,15 +147,26 @@ def get_artist_info(artist_name: str) -> Dict[str, Any]:
     """
     params = {
         "method": "artist.getinfo",
-        "artist": artist_name,
-        "api_key": API_KEY,
-        "format": "json"
+        "artist": artist_name
     }
     
-    response = requests.get(BASE_URL, params=params)
-    response.raise_for_status()
-    
-    return response.json()
+    return lastfm_request(params)
+
+def load_json(filename: str) -> Optional[Any]:
+    """
+    Load a JSON file from the output directory, or None if it does not exist
+    """
+    filepath = os.path.join(ensure_output_directory(), filename)
+    if not os.path.exists(filepath):
+        return None
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def open_journal() -> CrawlJournal:
+    """
+    Open the crawl journal in the output directory
+    """
+    return CrawlJournal(os.path.join(ensure_output_directory(), "crawl_journal.ndjson"))
 
 def save_json(data: Any, filename: str):
     """
@@ -70,124 +174,280 @@ def save_json(data: Any, filename: str):
     """
     output_dir = ensure_output_directory()
     filepath = os.path.join(output_dir, filename)
-    with open(filepath, 'w', encoding='utf-8') as f:
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, filepath)
 
-def get_all_artists_by_tag():
+def get_all_artists_by_tag(journal: CrawlJournal, refetch: bool = False):
     """
-    Step 1: Get all artists by tag through multiple requests
+    Step 1: Get all artists by tag through multiple requests.
+    Pages already saved by an interrupted run are reused, and once the
+    listing is complete it is recorded in the journal and not refetched.
+    With refetch=True every page is fetched again (refresh mode).
     """
     print("Step 1: Getting top artists by tag...")
-    
+
+    if journal.listing and not refetch:
+        num_pages = journal.listing["pages"]
+        print(f"Listing already complete in the crawl journal ({num_pages} pages), skipping.")
+        return num_pages
+
     page = 1
-    all_artists_data = []
-    
+
     while True:
-        print(f"Fetching page {page}...")
-        
-        try:
-            data = get_top_artists_by_tag(TAG, page)
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching page {page}: {e}")
-            break
-        
-        # Save the raw response to a file
         filename = f"top_artists_page_{page}.json"
-        save_json(data, filename)
-        print(f"Saved {filename}")
-        
+        data = None if refetch else load_json(filename)
+        if isinstance(data, dict) and "error" in data:
+            # An error response saved by an older run is not a listing page
+            data = None
+
+        if data is not None:
+            print(f"Page {page} already saved, reusing {filename}")
+        else:
+            print(f"Fetching page {page}...")
+
+            try:
+                data = get_top_artists_by_tag(TAG, page)
+            except requests.exceptions.RequestException as e:
+                print(f"Error fetching page {page}: {e}")
+                # Listing is incomplete; the next run resumes from this page
+                return page - 1
+
+            if "error" in data:
+                # Last.fm error JSON left after the retries ran out: a failed
+                # fetch, not the end of the listing
+                print(f"Error fetching page {page}: API error {data['error']}: {data.get('message')}")
+                return page - 1
+
+            # Save the raw response to a file
+            save_json(data, filename)
+            print(f"Saved {filename}")
+
         # Check if we have more artists to fetch
         if "topartists" not in data or "artist" not in data["topartists"]:
             print("No more artists found.")
             break
-            
+
         artists = data["topartists"]["artist"]
-        
+
         # If the number of artists is less than the limit, we've reached the end
         if len(artists) < LIMIT:
             print(f"Got {len(artists)} artists on page {page}, which is less than limit {LIMIT}. Stopping.")
             break
-        
+
         page += 1
-        # Be respectful to the API
-        time.sleep(0.5)
-    
+
+    journal.record_listing(page, tag=TAG)
     print(f"Completed Step 1. Got {page} pages of artists.")
     return page
 
-def get_artist_details_for_pages(num_pages: int):
+def fetch_one_artist(artist_name: str) -> Dict[str, Any]:
     """
-    Step 2: Get detailed info for each artist from all pages
+    Fetch one artist's info, turning a failed request into an error record
+    """
+    try:
+        return get_artist_info(artist_name)
+    except requests.exceptions.RequestException as e:
+        print(f"    Error getting info for '{artist_name}': {e}")
+        # Append error info instead of failing completely
+        return {
+            "error": f"Failed to get info for {artist_name}",
+            "artist_name": artist_name,
+            "exception": str(e)
+        }
+
+
+def get_artist_names(artists: List[Dict[str, Any]]) -> List[str]:
     """
+    Artist names from a tag.gettopartists page, in listing order
+    """
+    names = []
+    for artist in artists:
+        if isinstance(artist, dict) and "name" in artist:
+            names.append(artist["name"])
+        else:
+            print(f"  Invalid artist data: {artist}")
+    return names
+
+
+def fetch_artist_details(names: List[str], journal: CrawlJournal, page: int, max_workers: int = None):
+    """
+    Fetch artist.getinfo for the given artists concurrently. The shared
+    token bucket keeps the combined request rate at RATE_LIMIT; each
+    result is journaled as soon as it arrives.
+    """
+    def fetch_and_record(name: str):
+        journal.record_artist(name, page, fetch_one_artist(name))
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS) as executor:
+        futures = [executor.submit(fetch_and_record, name) for name in names]
+        for done, future in enumerate(futures, 1):
+            future.result()
+            if done % 50 == 0 or done == len(names):
+                elapsed = time.monotonic() - start
+                print(f"  Got info for {done}/{len(names)} artists ({done / elapsed:.1f} req/s)")
+
+
+def load_listing(num_pages: int = None) -> Dict[int, List[str]]:
+    """
+    Artist names of the stored tag.gettopartists pages, by page number
+    """
+    listing = {}
+    if num_pages is None:
+        pattern = os.path.join(ensure_output_directory(), "top_artists_page_*.json")
+        pages = sorted(int(re.search(r'_(\d+)\.json$', path).group(1)) for path in glob.glob(pattern))
+    else:
+        pages = range(1, num_pages + 1)
+    for page_num in pages:
+        page_data = load_json(f"top_artists_page_{page_num}.json")
+        if page_data and "topartists" in page_data and "artist" in page_data["topartists"]:
+            listing[page_num] = [artist["name"] for artist in page_data["topartists"]["artist"]
+                                 if isinstance(artist, dict) and "name" in artist]
+    return listing
+
+
+def remove_pages_after(num_pages: int):
+    """
+    Delete listing and detail files for pages the current listing no longer has
+    """
+    output_dir = ensure_output_directory()
+    for prefix in ("top_artists_page_", "artist_details_page_"):
+        for path in glob.glob(os.path.join(output_dir, f"{prefix}*.json")):
+            match = re.search(r'_(\d+)\.json$', path)
+            if match and int(match.group(1)) > num_pages:
+                os.remove(path)
+                print(f"Removed {os.path.basename(path)}")
+
+
+def get_artist_details_for_pages(num_pages: int, journal: CrawlJournal, refetch: set = None):
+    """
+    Step 2: Get detailed info for each artist from all pages.
+    Artists already in the journal are skipped and only recorded errors
+    are retried, plus any artist named in `refetch` (refresh mode);
+    each page file is rebuilt from the journal.
+    """
+    refetch = refetch or set()
     print("Step 2: Getting detailed artist info...")
-    
+
     for page_num in range(1, num_pages + 1):
         print(f"Processing artists from page {page_num}...")
-        
+
         # Load the artist data for this page
         filename = f"top_artists_page_{page_num}.json"
-        
-        try:
-            # First try to read from output directory, then from script directory
-            output_dir = ensure_output_directory()
-            filepath = os.path.join(output_dir, filename)
-
-            with open(filepath, 'r', encoding='utf-8') as f:
-                page_data = json.load(f)
-        except FileNotFoundError:
-            print(f"File {filename} not found in either output or script directory, skipping...")
+        page_data = load_json(filename)
+        if page_data is None:
+            print(f"File {filename} not found in output directory, skipping...")
             continue
-        
+
         if "topartists" not in page_data or "artist" not in page_data["topartists"]:
             print(f"No artists found in {filename}, skipping...")
             continue
-        
-        artists = page_data["topartists"]["artist"]
-        artist_details_list = []
-        
-        for idx, artist in enumerate(artists):
-            if isinstance(artist, dict) and "name" in artist:
-                artist_name = artist["name"]
-                print(f"  Getting info for '{artist_name}' ({idx + 1}/{len(artists)})...")
-                
-                try:
-                    artist_info = get_artist_info(artist_name)
-                    artist_details_list.append(artist_info)
-                    
-                    # Be respectful to the API
-                    time.sleep(0.5)
-                except requests.exceptions.RequestException as e:
-                    print(f"    Error getting info for '{artist_name}': {e}")
-                    # Append error info instead of failing completely
-                    artist_details_list.append({
-                        "error": f"Failed to get info for {artist_name}",
-                        "artist_name": artist_name,
-                        "exception": str(e)
-                    })
-            else:
-                print(f"  Invalid artist data: {artist}")
-        
-        # Save artist details for this page
+
+        names = get_artist_names(page_data["topartists"]["artist"])
+        todo = [name for name in names if not journal.is_done(name) or name in refetch]
+        retries = sum(1 for name in todo if journal.get(name) and not journal.is_done(name))
+        stale = sum(1 for name in todo if journal.is_done(name))
+        if len(todo) < len(names):
+            print(f"  {len(names) - len(todo)} artists already in the journal, "
+                  f"fetching {len(todo)} ({retries} earlier errors, {stale} stale)")
+        if todo:
+            fetch_artist_details(todo, journal, page_num)
+
+        # Save artist details for this page, in listing order
+        artist_details_list = [journal.get(name)["data"] for name in names]
         details_filename = f"artist_details_page_{page_num}.json"
         save_json(artist_details_list, details_filename)
-        print(f"  Saved {details_filename}")
-    
+        errors = sum(1 for name in names if journal.get(name)["status"] == STATUS_ERROR)
+        print(f"  Saved {details_filename}" + (f" ({errors} errors, retried on the next run)" if errors else ""))
+
     print("Completed Step 2.")
 
+def refresh(journal: CrawlJournal, ttl_days: float, max_stale: int = None):
+    """
+    Refresh mode: refetch the tag listing, compare it with the stored one
+    and call artist.getinfo only for new artists, recorded errors and
+    records older than ttl_days (the oldest max_stale of them, if given)
+    """
+    old_names = {name for names in load_listing().values() for name in names}
+
+    started = time.time()
+    num_pages = get_all_artists_by_tag(journal, refetch=True)
+    if num_pages == 0:
+        print("Could not fetch the listing, nothing refreshed.")
+        return
+    if journal.listing and journal.listing["fetched_at"] >= started:
+        remove_pages_after(num_pages)
+    else:
+        print("Listing is incomplete, keeping the stored pages beyond it.")
+
+    listing = load_listing(num_pages)
+    new_names = {name for names in listing.values() for name in names}
+    added = new_names - old_names
+    removed = old_names - new_names
+
+    now = time.time()
+    max_age = ttl_days * 86400
+    stale = sorted((name for name in new_names if journal.is_done(name) and journal.is_stale(name, max_age, now)),
+                   key=lambda name: journal.get(name)["fetched_at"])
+    if max_stale is not None:
+        stale = stale[:max_stale]
+    unfetched = sum(1 for name in new_names if not journal.is_done(name))
+
+    print(f"Listing: {len(new_names)} artists, {len(added)} new, {len(removed)} no longer listed")
+    print(f"Refreshing {unfetched} new or failed and {len(stale)} stale artists "
+          f"(TTL {ttl_days:g} days), {len(new_names) - unfetched - len(stale)} up to date")
+
+    get_artist_details_for_pages(num_pages, journal, refetch=set(stale))
+    journal.compact()
+
+
 def main():
     """
-    Main function that executes both steps
+    Main function that executes both steps. Progress is kept in
+    output/crawl_journal.ndjson, so rerunning after a crash resumes.
     """
+    global rate_limiter, MAX_WORKERS
+
+    parser = argparse.ArgumentParser(description=f"Fetch {TAG} artists and their details from Last.fm")
+    parser.add_argument('--refresh', action='store_true',
+                        help='Refetch the listing and update only new, failed and stale artists')
+    parser.add_argument('--ttl-days', type=float, default=30,
+                        help='In refresh mode, refetch artists whose record is older than this (default: 30)')
+    parser.add_argument('--max-stale', type=int,
+                        help='In refresh mode, refetch at most this many stale artists, oldest first')
+    parser.add_argument('--dataset-format', choices=['auto', 'ndjson', 'parquet'], default='auto',
+                        help='Format of the artist dataset (auto: Parquet when pyarrow is installed)')
+    parser.add_argument('--rate-limit', type=float, default=RATE_LIMIT,
+                        help=f'Requests per second (default: {RATE_LIMIT:g})')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS,
+                        help=f'Concurrent requests (default: {MAX_WORKERS})')
+    args = parser.parse_args()
+
+    rate_limiter = TokenBucket(args.rate_limit)
+    MAX_WORKERS = args.workers
+
     print("Starting the artist data retrieval process...")
-    
-    # Step 1: Get all artists by tag
-    num_pages = get_all_artists_by_tag()
-    
-    if num_pages > 0:
-        # Step 2: Get detailed info for each artist
-        get_artist_details_for_pages(num_pages)
-    
+
+    journal = open_journal()
+    try:
+        if args.refresh:
+            refresh(journal, args.ttl_days, args.max_stale)
+        else:
+            # Step 1: Get all artists by tag
+            num_pages = get_all_artists_by_tag(journal)
+
+            if num_pages > 0:
+                # Step 2: Get detailed info for each artist
+                get_artist_details_for_pages(num_pages, journal)
+    finally:
+        journal.close()
+
+    # One row per artist for the embedding and similarity stages
+    build_dataset(fmt=args.dataset_format)
+
     print("Process completed!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
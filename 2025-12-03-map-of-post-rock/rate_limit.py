@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Thread-safe token-bucket rate limiter shared by the crawler and the
+embedding client, so concurrent workers together stay at the API limit
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second, holding at most
+    `capacity` tokens. acquire() blocks until enough tokens are available,
+    so any number of threads sharing one bucket issue at most `rate`
+    requests per second on average, with bursts up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens: float = 1.0):
+        """
+        Take `tokens` from the bucket, sleeping until they are available
+        """
+        if tokens > self.capacity:
+            raise ValueError("cannot acquire more tokens than the bucket capacity")
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """
+        Drain the bucket and hold it empty for `seconds`, e.g. after the
+        server answers 429 with Retry-After, so every worker backs off
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, -seconds * self.rate)
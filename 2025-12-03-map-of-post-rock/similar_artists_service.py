@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Query service for "artists like X" lookups.
+Loads a saved FAISS index (optionally memory-mapped) and its id-to-metadata
+table once, then answers top-k queries by artist name or by free text,
+either from the command line, an interactive prompt or a small HTTP API:
+
+    GET /similar?artist=Mogwai&k=10
+    GET /similar?text=slow+instrumental+crescendos&k=10
+"""
+
+import argparse
+import difflib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from openai import OpenAI
+
+from ann_index import (BACKENDS, RerankedIndex, ensure_output_directory, index_path, load_index,
+                       load_index_info, load_index_metadata, metadata_path, resolve_params, set_search_params)
+from embedding_cache import open_cache
+from embedding_store import EmbeddingStore
+
+EMBEDDING_MODEL = "BAAI/bge-m3"
+SILICONFLOW_BASE_URL = "https://api.siliconflow.cn/v1"
+MAX_K = 100
+
+
+class ArtistNotFound(Exception):
+    """The queried artist name is not in the index"""
+
+    def __init__(self, name: str, suggestions: List[str]):
+        super().__init__(f"Artist not found: {name}")
+        self.name = name
+        self.suggestions = suggestions
+
+
+class SimilarArtistService:
+    """
+    A saved index plus its metadata, kept in memory for repeated queries
+    """
+
+    def __init__(self, backend: str = "flat", mmap: bool = False, api_key: str = None,
+                 ef_search: int = None, nprobe: int = None):
+        path = index_path(backend)
+        if not os.path.exists(path) or not os.path.exists(metadata_path(path)):
+            raise FileNotFoundError(f"{path} or its metadata not found; "
+                                    f"run artist_embeddings.py --similarity-only --backend {backend} first")
+
+        start = time.perf_counter()
+        self.backend = backend
+        self.index = load_index(path, mmap=mmap)
+        self.metadata = load_index_metadata(path)
+        if len(self.metadata) != self.index.ntotal:
+            raise ValueError(f"{path} has {self.index.ntotal} vectors but {len(self.metadata)} metadata rows")
+
+        params = resolve_params(backend, {"ef_search": ef_search, "nprobe": nprobe})
+        set_search_params(self.index, ef_search=params.get("ef_search"), nprobe=params.get("nprobe"))
+        if params.get("rerank"):
+            # Exact re-ranking reads candidate rows from the embedding store
+            store = EmbeddingStore(os.path.join(ensure_output_directory(), 'embedding_store'))
+            if len(store) != self.index.ntotal:
+                raise ValueError("The embedding store no longer matches the saved index; "
+                                 f"run artist_embeddings.py --similarity-only --backend {backend}")
+            self.vectors = store.load_vectors(mmap=True)
+            self.searcher = RerankedIndex(self.index, self.vectors, params["rerank"])
+        else:
+            self.vectors = None
+            self.searcher = self.index
+
+        self.by_lower_name: Dict[str, int] = {}
+        for idx, row in enumerate(self.metadata):
+            self.by_lower_name.setdefault(row["name"].casefold(), idx)
+
+        self.api_key = api_key or os.getenv("SILICONFLOW_API_KEY")
+        self.client = None
+        self.client_lock = threading.Lock()
+        info = load_index_info(path)
+        print(f"Loaded {backend} index with {self.index.ntotal} artists in {time.perf_counter() - start:.2f}s"
+              f"{' (memory-mapped)' if mmap else ''}, params {info.get('params', {})}")
+
+    def vector_for(self, idx: int) -> np.ndarray:
+        if self.vectors is not None:
+            return np.asarray(self.vectors[idx], dtype='float32')
+        return self.index.reconstruct(int(idx))
+
+    def search(self, vector: np.ndarray, k: int, exclude: int = None) -> List[Dict[str, Any]]:
+        """
+        Top-k neighbours of a normalized vector, skipping id `exclude`
+        """
+        similarities, indices = self.searcher.search(vector.reshape(1, -1).astype('float32'), k + 1)
+        results = []
+        for similarity, idx in zip(similarities[0], indices[0]):
+            if idx < 0 or idx == exclude:
+                continue
+            row = self.metadata[idx]
+            results.append({"name": row["name"], "similarity": float(similarity),
+                            "mbid": row.get("mbid"), "url": row.get("url")})
+            if len(results) >= k:
+                break
+        return results
+
+    def similar_to_artist(self, name: str, k: int = 10) -> Dict[str, Any]:
+        """
+        Artists most similar to a known artist (name matched case-insensitively)
+        """
+        idx = self.by_lower_name.get(name.strip().casefold())
+        if idx is None:
+            suggestions = difflib.get_close_matches(name.strip().casefold(), self.by_lower_name, n=5, cutoff=0.6)
+            raise ArtistNotFound(name, [self.metadata[self.by_lower_name[s]]["name"] for s in suggestions])
+        return {"artist": self.metadata[idx]["name"], "similar_artists": self.search(self.vector_for(idx), k, idx)}
+
+    def similar_to_text(self, text: str, k: int = 10) -> Dict[str, Any]:
+        """
+        Artists whose summaries are closest to a free-text description
+        """
+        from artist_embeddings import embed_texts
+
+        with self.client_lock:
+            if self.client is None:
+                self.client = OpenAI(api_key=self.api_key, base_url=SILICONFLOW_BASE_URL)
+        cache = open_cache(ensure_output_directory())
+        try:
+            vector = embed_texts(self.client, [text], model=EMBEDDING_MODEL, cache=cache, max_in_flight=1)[0]
+        finally:
+            cache.close()
+        vector = vector / (np.linalg.norm(vector) or 1)
+        return {"text": text, "similar_artists": self.search(vector, k)}
+
+
+class SimilarArtistsHandler(BaseHTTPRequestHandler):
+    """GET /similar?artist=...|text=...&k=..."""
+
+    service: SimilarArtistService = None
+
+    def send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/similar":
+            return self.send_json(404, {"error": "Not found"})
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        try:
+            k = max(1, min(MAX_K, int(query.get("k", 10))))
+        except ValueError:
+            return self.send_json(400, {"error": "k must be an integer"})
+
+        start = time.perf_counter()
+        try:
+            if "artist" in query:
+                result = self.service.similar_to_artist(query["artist"], k)
+            elif "text" in query:
+                result = self.service.similar_to_text(query["text"], k)
+            else:
+                return self.send_json(400, {"error": "Pass artist=<name> or text=<description>"})
+        except ArtistNotFound as e:
+            return self.send_json(404, {"error": str(e), "suggestions": e.suggestions})
+        except Exception as e:
+            return self.send_json(502, {"error": f"Query failed: {e}"})
+        result["elapsed_ms"] = (time.perf_counter() - start) * 1000
+        self.send_json(200, result)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def print_result(result: Dict[str, Any]):
+    for rank, artist in enumerate(result["similar_artists"], 1):
+        print(f"{rank:3d}. {artist['name']}  ({artist['similarity']:.3f})")
+
+
+def run_query(service: SimilarArtistService, query: str, k: int, as_text: bool):
+    start = time.perf_counter()
+    try:
+        result = service.similar_to_text(query, k) if as_text else service.similar_to_artist(query, k)
+    except ArtistNotFound as e:
+        print(str(e) + (f". Did you mean: {', '.join(e.suggestions)}?" if e.suggestions else ""))
+        return
+    print_result(result)
+    print(f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find artists similar to an artist or a description")
+    parser.add_argument('query', nargs='?', help='Artist name (or description with --text); omit for a prompt')
+    parser.add_argument('--text', action='store_true', help='Treat the query as free text and embed it')
+    parser.add_argument('--k', type=int, default=10, help='Number of similar artists (default: 10)')
+    parser.add_argument('--backend', choices=BACKENDS, default='flat', help='Saved index to load (default: flat)')
+    parser.add_argument('--mmap', action='store_true', help='Memory-map the index instead of loading it')
+    parser.add_argument('--ef-search', type=int, help='HNSW efSearch')
+    parser.add_argument('--nprobe', type=int, help='IVF-PQ lists probed per query')
+    parser.add_argument('--serve', action='store_true', help='Run the HTTP API instead of answering one query')
+    parser.add_argument('--host', default='127.0.0.1', help='HTTP host (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='HTTP port (default: 8000)')
+    args = parser.parse_args()
+
+    service = SimilarArtistService(args.backend, mmap=args.mmap, ef_search=args.ef_search, nprobe=args.nprobe)
+
+    if args.serve:
+        SimilarArtistsHandler.service = service
+        server = ThreadingHTTPServer((args.host, args.port), SimilarArtistsHandler)
+        print(f"Serving on http://{args.host}:{args.port}/similar?artist=<name>  (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    elif args.query:
+        run_query(service, args.query, args.k, args.text)
+    else:
+        print("Enter an artist name, or 'text: <description>'; empty line to quit")
+        while True:
+            try:
+                line = input("> ").strip()
+            except EOFError:
+                break
+            if not line:
+                break
+            if line.lower().startswith("text:"):
+                run_query(service, line[5:].strip(), args.k, True)
+            else:
+                run_query(service, line, args.k, False)
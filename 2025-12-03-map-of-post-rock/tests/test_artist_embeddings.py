@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+import artist_embeddings
+from embedding_store import EmbeddingStore
+
+
+class FakeEmbeddings:
+    def __init__(self, fail):
+        self.fail = fail
+        self.calls = 0
+
+    def create(self, model, input):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("API unreachable")
+        data = [type('Item', (), {'index': i, 'embedding': [float(len(text)), 1.0, 0.0]})()
+                for i, text in enumerate(input)]
+        return type('Response', (), {'data': data})()
+
+
+@pytest.fixture
+def fake_api(tmp_path, monkeypatch):
+    embeddings = FakeEmbeddings(fail=False)
+    client = type('Client', (), {'embeddings': embeddings})()
+    monkeypatch.setattr(artist_embeddings, 'OpenAI', lambda **kwargs: client)
+    monkeypatch.setattr(artist_embeddings, 'ensure_output_directory', lambda: str(tmp_path))
+    return embeddings
+
+
+ARTISTS = [{'name': 'Mogwai', 'mbid': '', 'url': '', 'summary': 'Scottish post-rock band'},
+           {'name': 'Slint', 'mbid': '', 'url': '', 'summary': 'Louisville band'}]
+
+
+def test_api_errors_are_raised_without_touching_the_store(tmp_path, fake_api):
+    store = EmbeddingStore(str(tmp_path / 'store'))
+    fake_api.fail = True
+    with pytest.raises(ConnectionError):
+        artist_embeddings.calculate_embeddings_siliconflow(ARTISTS, 'key', store)
+    assert len(store) == 0
+
+
+def test_embeddings_are_appended_and_cached(tmp_path, fake_api):
+    store = EmbeddingStore(str(tmp_path / 'store'))
+    assert artist_embeddings.calculate_embeddings_siliconflow(ARTISTS, 'key', store) == 2
+    assert [row['name'] for row in store.load_metadata()] == ['Mogwai', 'Slint']
+    assert np.allclose(np.linalg.norm(store.load_vectors(), axis=1), 1.0)
+
+    calls = fake_api.calls
+    artist_embeddings.calculate_embeddings_siliconflow(ARTISTS, 'key', store)
+    assert fake_api.calls == calls
+    assert len(store) == 4
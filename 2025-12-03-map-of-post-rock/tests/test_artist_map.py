@@ -0,0 +1,65 @@
+import os
+
+import faiss
+import numpy as np
+import pytest
+
+import artist_embeddings
+import artist_map
+from artist_embeddings import knn_graph, save_knn_graph
+from embedding_store import EmbeddingStore
+
+
+def unit_rows(matrix):
+    matrix = np.asarray(matrix, dtype='float32')
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def flat_index(vectors):
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    return index
+
+
+@pytest.fixture
+def knn_output(tmp_path, monkeypatch):
+    for module in (artist_embeddings, artist_map):
+        monkeypatch.setattr(module, 'ensure_output_directory', lambda: str(tmp_path))
+    store = EmbeddingStore(str(tmp_path / 'store'))
+    vectors = unit_rows(np.random.default_rng(2).normal(size=(200, 8)))
+    store.append(vectors, [{'name': str(i)} for i in range(200)])
+    similarities, indices = knn_graph(flat_index(vectors), vectors, top_k=10, threshold=0.2)
+    save_knn_graph(similarities, indices, 0.2, 'flat')
+    computed = []
+    monkeypatch.setattr(artist_embeddings, 'create_vector_database',
+                        lambda embeddings, backend, **kwargs: computed.append(backend) or flat_index(
+                            np.ascontiguousarray(embeddings)))
+    return store, similarities, indices, computed
+
+
+def test_saved_graph_is_narrowed_to_the_request(knn_output):
+    store, similarities, indices, computed = knn_output
+    narrow_similarities, narrow_indices = artist_map.load_knn(store, top_k=4, threshold=0.5, backend='flat')
+    assert computed == []
+    expected = np.where(similarities[:, :4] > 0.5, indices[:, :4], -1)
+    assert np.array_equal(narrow_indices, expected)
+
+
+@pytest.mark.parametrize('top_k, threshold, backend', [(20, 0.2, 'flat'), (10, 0.1, 'flat'), (10, 0.2, 'hnsw')])
+def test_graph_is_recomputed_when_the_saved_one_does_not_cover_the_request(knn_output, top_k, threshold, backend):
+    store, _, _, computed = knn_output
+    _, indices = artist_map.load_knn(store, top_k=top_k, threshold=threshold, backend=backend)
+    assert computed == [backend]
+    assert indices.shape == (200, top_k)
+    saved = np.load(os.path.join(artist_map.ensure_output_directory(), 'knn_graph.npz'))
+    assert int(saved['top_k']) == top_k and str(saved['backend']) == backend
+
+
+def test_build_graph_is_symmetric_without_self_loops():
+    indices = np.array([[1, -1], [2, 0], [0, 1]])
+    similarities = np.array([[0.9, -np.inf], [0.8, 0.9], [0.4, 0.8]], dtype='float32')
+    graph = artist_map.build_graph(similarities, indices, min_similarity=0.5)
+    dense = graph.toarray()
+    assert np.allclose(dense, dense.T)
+    assert np.allclose(np.diag(dense), 0)
+    assert dense[0, 1] == pytest.approx(0.9) and dense[1, 2] == pytest.approx(0.8) and dense[0, 2] == 0
@@ -0,0 +1,76 @@
+import json
+
+from crawl_journal import STATUS_ERROR, STATUS_MISSING, STATUS_OK, CrawlJournal
+
+
+def reopen(journal):
+    journal.close()
+    return CrawlJournal(journal.path)
+
+
+def test_results_survive_a_restart(tmp_path):
+    journal = CrawlJournal(str(tmp_path / "journal.ndjson"))
+    journal.record_listing(3, tag="post-rock")
+    journal.record_artist("Mogwai", 1, {"artist": {"name": "Mogwai"}})
+    journal.record_artist("Nobody", 1, {"error": 6, "message": "The artist you supplied could not be found"})
+    journal.record_artist("Flaky", 2, {"error": "Failed to get info for Flaky", "exception": "timeout"})
+
+    journal = reopen(journal)
+    assert journal.listing["pages"] == 3
+    assert journal.get("Mogwai")["status"] == STATUS_OK
+    assert journal.get("Nobody")["status"] == STATUS_MISSING
+    assert journal.get("Flaky")["status"] == STATUS_ERROR
+    assert journal.is_done("Mogwai") and journal.is_done("Nobody")
+    assert not journal.is_done("Flaky") and not journal.is_done("Unknown")
+    journal.close()
+
+
+def test_transient_api_errors_are_retried(tmp_path):
+    journal = CrawlJournal(str(tmp_path / "journal.ndjson"))
+    for code in (8, 11, 16, 29):
+        journal.record_artist(f"artist-{code}", 1, {"error": code, "message": "try again"})
+        assert journal.get(f"artist-{code}")["status"] == STATUS_ERROR
+        assert not journal.is_done(f"artist-{code}")
+    journal.close()
+
+
+def test_failed_refetch_keeps_the_good_record(tmp_path):
+    journal = CrawlJournal(str(tmp_path / "journal.ndjson"))
+    journal.record_artist("Mogwai", 1, {"artist": {"name": "Mogwai"}})
+    journal.record_artist("Mogwai", 1, {"error": 29, "message": "Rate limit exceeded"})
+    journal = reopen(journal)
+    assert journal.get("Mogwai")["status"] == STATUS_OK
+    journal.close()
+
+
+def test_torn_last_line_is_truncated_on_load(tmp_path):
+    path = tmp_path / "journal.ndjson"
+    journal = CrawlJournal(str(path))
+    journal.record_artist("Mogwai", 1, {"artist": {"name": "Mogwai"}})
+    journal.close()
+    intact = path.read_bytes()
+    with open(path, "ab") as f:
+        f.write(b'{"kind": "artist", "name": "Explosions in the')
+
+    journal = CrawlJournal(str(path))
+    assert path.read_bytes() == intact
+    assert list(journal.artists) == ["Mogwai"]
+    journal.record_artist("Godspeed You! Black Emperor", 1, {"artist": {}})
+    journal = reopen(journal)
+    assert set(journal.artists) == {"Mogwai", "Godspeed You! Black Emperor"}
+    journal.close()
+
+
+def test_compact_keeps_the_latest_record_per_artist(tmp_path):
+    path = tmp_path / "journal.ndjson"
+    journal = CrawlJournal(str(path))
+    journal.record_listing(1)
+    journal.record_artist("Mogwai", 1, {"error": "failed", "exception": "timeout"})
+    journal.record_artist("Mogwai", 1, {"artist": {"name": "Mogwai"}})
+    journal.compact()
+    journal.record_artist("Slint", 1, {"artist": {"name": "Slint"}})
+    journal.close()
+
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [line["kind"] for line in lines] == ["listing", "artist", "artist"]
+    assert lines[1]["status"] == STATUS_OK
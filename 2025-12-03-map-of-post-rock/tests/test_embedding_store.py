@@ -0,0 +1,77 @@
+import json
+
+import numpy as np
+import pytest
+
+from embedding_store import EmbeddingStore
+
+
+def rows(*names):
+    return [{"name": name, "mbid": "", "url": f"https://www.last.fm/music/{name}"} for name in names]
+
+
+def test_append_normalizes_and_survives_reopen(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.append(np.array([[3.0, 4.0], [0.0, 0.0]]), rows("Mogwai", "Silent"))
+    store.append(np.array([[0.0, 2.0]]), rows("Envy"))
+
+    store = EmbeddingStore(str(tmp_path))
+    assert len(store) == 3
+    vectors = store.load_vectors()
+    assert isinstance(vectors, np.memmap)
+    assert vectors.dtype == np.float32 and vectors.shape == (3, 2)
+    np.testing.assert_allclose(vectors, [[0.6, 0.8], [0.0, 0.0], [0.0, 1.0]], rtol=1e-6)
+    assert [row["name"] for row in store.load_metadata()] == ["Mogwai", "Silent", "Envy"]
+
+
+def test_uncommitted_append_is_rolled_back(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.append(np.eye(2), rows("Mogwai", "Envy"))
+    # A crash after the rows and part of the metadata were written, before the header update
+    with open(store.vectors_path, "ab") as f:
+        f.write(np.ones((2, 2), dtype=np.float32).tobytes())
+    with open(store.metadata_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(rows("Lost")[0]) + "\n" + '{"name": "Tor')
+
+    store = EmbeddingStore(str(tmp_path))
+    assert len(store) == 2
+    np.testing.assert_array_equal(store.load_vectors(mmap=False), np.eye(2, dtype=np.float32))
+    assert [row["name"] for row in store.load_metadata()] == ["Mogwai", "Envy"]
+
+    store.append(np.array([[1.0, 1.0]]), rows("Caspian"))
+    store = EmbeddingStore(str(tmp_path))
+    assert [row["name"] for row in store.load_metadata()] == ["Mogwai", "Envy", "Caspian"]
+    assert store.load_vectors().shape == (3, 2)
+
+
+def test_missing_metadata_rows_are_an_error(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.append(np.eye(2), rows("Mogwai", "Envy"))
+    with open(store.metadata_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(rows("Mogwai")[0]) + "\n")
+
+    with pytest.raises(ValueError):
+        EmbeddingStore(str(tmp_path))
+
+
+def test_append_rejects_mismatched_input(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.append(np.eye(2), rows("Mogwai", "Envy"))
+
+    with pytest.raises(ValueError):
+        store.append(np.ones((1, 3)), rows("Caspian"))
+    with pytest.raises(ValueError):
+        store.append(np.ones((2, 2)), rows("Caspian"))
+    assert len(EmbeddingStore(str(tmp_path))) == 2
+
+
+def test_reset_empties_the_store(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.append(np.eye(2), rows("Mogwai", "Envy"))
+    store.reset()
+    assert len(store) == 0
+    assert store.load_vectors().shape == (0, 0)
+
+    store.append(np.ones((1, 4)), rows("Caspian"))
+    store = EmbeddingStore(str(tmp_path))
+    assert store.load_vectors().shape == (1, 4)
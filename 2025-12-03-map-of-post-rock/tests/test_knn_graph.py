@@ -0,0 +1,45 @@
+import faiss
+import numpy as np
+
+from artist_embeddings import knn_graph
+
+
+def unit_rows(matrix):
+    matrix = np.asarray(matrix, dtype='float32')
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def flat_index(vectors):
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    return index
+
+
+def test_rows_never_list_themselves():
+    vectors = unit_rows(np.random.default_rng(0).normal(size=(500, 16)))
+    similarities, indices = knn_graph(flat_index(vectors), vectors, top_k=5, block_rows=64)
+    assert indices.shape == similarities.shape == (500, 5)
+    assert not (indices == np.arange(500)[:, None]).any()
+    assert (np.diff(similarities, axis=1) <= 1e-6).all()
+
+
+def test_blocked_search_matches_brute_force():
+    vectors = unit_rows(np.random.default_rng(1).normal(size=(300, 8)))
+    similarities, indices = knn_graph(flat_index(vectors), vectors, top_k=3, block_rows=7)
+    exact = vectors @ vectors.T
+    np.fill_diagonal(exact, -np.inf)
+    assert np.array_equal(indices, np.argsort(-exact, axis=1)[:, :3])
+
+
+def test_duplicate_vectors_still_exclude_the_row_itself():
+    vectors = unit_rows([[1, 0], [1, 0], [0, 1]])
+    _, indices = knn_graph(flat_index(vectors), vectors, top_k=1)
+    assert indices[:, 0].tolist()[:2] == [1, 0]
+
+
+def test_threshold_masks_weak_neighbours():
+    vectors = unit_rows([[1, 0], [0.9, 0.1], [0, 1]])
+    similarities, indices = knn_graph(flat_index(vectors), vectors, top_k=2, threshold=0.5)
+    assert indices[0].tolist() == [1, -1]
+    assert indices[2].tolist() == [-1, -1]
+    assert np.isneginf(similarities[2]).all()